@@ -1,9 +1,12 @@
 
 from flask import Blueprint, request, jsonify, send_file
-from db.connection import get_connection
+from db.connection import get_connection, get_pool_stats
+from db.session import get_db_session
+from db.queries import DASHBOARD_LATEST_SCORES, SOLDIERS_REPORT_COUNT, SOLDIERS_REPORT_CTE, SOLDIERS_REPORT_PAGE
 from services.translation_service import translate_to_hindi, translate_to_english
 from services.model_preloader_service import ModelPreloaderService
-from fpdf import FPDF
+from services.service_container import get_service_container
+from utils.startup_report import startup_report
 import logging
 from datetime import datetime
 import io
@@ -26,6 +29,28 @@ def get_model_preloader_status():
         return jsonify({'error': str(e)}), 500
 
 
+@admin_bp.route('/startup-report', methods=['GET'])
+def get_startup_report():
+    """Import time per blueprint module, time to first response and lazily constructed services"""
+    try:
+        report = startup_report.report()
+        report['services'] = get_service_container().stats()
+        return jsonify(report), 200
+    except Exception as e:
+        logger.error(f"Error getting startup report: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/db-pool-stats', methods=['GET'])
+def get_db_pool_stats():
+    """Get database connection pool statistics for sizing under survey peaks"""
+    try:
+        return jsonify(get_pool_stats()), 200
+    except Exception as e:
+        logger.error(f"Error getting database pool stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 # Translation endpoint for question (English to Hindi)
 @admin_bp.route('/translate-question', methods=['POST'])
 def translate_question():
@@ -330,142 +355,97 @@ def add_question():
 @admin_bp.route('/soldiers-report', methods=['GET'])
 def get_soldiers_report():
     """Get real soldiers report data from database with filtering and pagination"""
-    db = get_connection()
-    cursor = db.cursor()
+    from api.survey.routes import get_dynamic_risk_thresholds
+    from config.settings import settings
+
+    db = get_db_session()
+    cursor = db.cursor(dictionary=True)
     
     try:
         # Get query parameters for filtering
         risk_level = request.args.get('risk_level', 'all')  # all, low, mid, high, critical
         days_filter = request.args.get('days', '7')  # 3, 7, 30, 180
         force_id_filter = request.args.get('force_id', '')  # specific force ID filter
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
-        
-        # Calculate offset for pagination
-        offset = (page - 1) * per_page
-        
-        # Build date filter condition
-        date_conditions = {
-            '3': 'ws.completion_timestamp >= DATE_SUB(NOW(), INTERVAL 3 DAY)',
-            '7': 'ws.completion_timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY)',
-            '30': 'ws.completion_timestamp >= DATE_SUB(NOW(), INTERVAL 30 DAY)',
-            '180': 'ws.completion_timestamp >= DATE_SUB(NOW(), INTERVAL 180 DAY)'
-        }
-        date_condition = date_conditions.get(days_filter, date_conditions['7'])
+        after_force_id = request.args.get('after', '').strip()  # keyset cursor (last force_id of previous page)
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(max(1, int(request.args.get('per_page', 20))), settings.MAX_PAGE_SIZE)
         
-        # Note: Risk level filtering is now done in Python after data retrieval
-        # to ensure consistency with dynamic thresholds from database settings
+        # Calculate offset for pagination (ignored when a keyset cursor is given)
+        offset = 0 if after_force_id else (page - 1) * per_page
         
-        # Simplified and more robust query approach
-        # First, let's get all soldiers and then join with their latest sessions
+        # Whitelisted look-back windows in days
+        days = {'3': 3, '7': 7, '30': 30, '180': 180}.get(days_filter, 7)
         
-        # Get all soldiers first (with optional force_id filter)
+        # Risk banding uses the dynamic thresholds, but is evaluated in SQL so that
+        # filtering, counting and pagination never materialise the full roster
+        risk_thresholds = get_dynamic_risk_thresholds()
+        
+        # One set-based statement over the soldier_latest_assessment summary and the
+        # per-soldier CCTV aggregate (see db/queries.py)
+        params = [days, risk_thresholds['CRITICAL'], risk_thresholds['HIGH'], risk_thresholds['MEDIUM'], days]
+        
+        force_id_condition = ""
         if force_id_filter.strip():
-            soldiers_query = """
-            SELECT force_id, user_type, created_at 
-            FROM users 
-            WHERE user_type = 'soldier' AND force_id LIKE %s
-            """
-            cursor.execute(soldiers_query, (f'%{force_id_filter}%',))
-        else:
-            soldiers_query = """
-            SELECT force_id, user_type, created_at 
-            FROM users 
-            WHERE user_type = 'soldier'
-            """
-            cursor.execute(soldiers_query)
-        all_soldiers = cursor.fetchall()
-        
-        soldiers_report = []
-        
-        for soldier in all_soldiers:
-            force_id = soldier[0]
-            
-            # Get latest session for this soldier within date range
-            session_query = f"""
-            SELECT 
-                ws.session_id,
-                ws.combined_avg_score,
-                ws.nlp_avg_score,
-                ws.image_avg_score,
-                ws.completion_timestamp,
-                q.title as questionnaire_title,
-                ws.mental_state_score
-            FROM weekly_sessions ws
-            LEFT JOIN questionnaires q ON ws.questionnaire_id = q.questionnaire_id
-            WHERE ws.force_id = %s 
-            AND {date_condition}
-            ORDER BY ws.completion_timestamp DESC
-            LIMIT 1
-            """
-            
-            cursor.execute(session_query, (force_id,))
-            session_data = cursor.fetchone()
-            
-            # Get CCTV stats for this soldier
-            cctv_query = f"""
-            SELECT COUNT(*) as total_detections, AVG(ws.image_avg_score) as avg_score
-            FROM weekly_sessions ws
-            WHERE ws.force_id = %s 
-            AND {date_condition}
-            AND ws.image_avg_score > 0
-            """
-            
-            cursor.execute(cctv_query, (force_id,))
-            cctv_data = cursor.fetchone()
-            
-            # Calculate scores and mental state
-            combined_score = session_data[1] if session_data and session_data[1] else 0
-            nlp_score = session_data[2] if session_data and session_data[2] else 0
-            image_score = session_data[3] if session_data and session_data[3] else 0
-            mental_state_score = session_data[6] if session_data and session_data[6] else None
-            
-            # Determine risk level using dynamic thresholds from database
-            from api.survey.routes import get_dynamic_risk_thresholds
-            risk_thresholds = get_dynamic_risk_thresholds()
-            
-            if combined_score >= risk_thresholds['CRITICAL']:
-                risk_level_calc = 'CRITICAL'
-            elif combined_score >= risk_thresholds['HIGH']:
-                risk_level_calc = 'HIGH'
-            elif combined_score >= risk_thresholds['MEDIUM']:
-                risk_level_calc = 'MID'
-            else:
-                risk_level_calc = 'LOW'
-            
+            force_id_condition = "AND u.force_id LIKE %s"
+            params.append(f'%{force_id_filter.strip()}%')
+        report_cte = SOLDIERS_REPORT_CTE.format(force_id_condition=force_id_condition)
+        
+        # Apply risk level filtering
+        risk_filter_map = {'low': 'LOW', 'mid': 'MID', 'high': 'HIGH', 'critical': 'CRITICAL'}
+        filter_conditions = []
+        filter_params = []
+        if risk_level in risk_filter_map:
+            filter_conditions.append("risk_level = %s")
+            filter_params.append(risk_filter_map[risk_level])
+        
+        where_clause = f"WHERE {' AND '.join(filter_conditions)}" if filter_conditions else ""
+        
+        # Total rows matching the filters (independent of the page position)
+        cursor.execute(SOLDIERS_REPORT_COUNT.format(report_cte=report_cte, where_clause=where_clause),
+                       params + filter_params)
+        total_count = cursor.fetchone()['total_count']
+        
+        # Page of rows, ordered by force_id so both OFFSET and keyset paging are stable
+        page_conditions = list(filter_conditions)
+        page_params = list(filter_params)
+        if after_force_id:
+            page_conditions.append("force_id > %s")
+            page_params.append(after_force_id)
+        page_where = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+        
+        # One extra row tells whether another page follows
+        cursor.execute(SOLDIERS_REPORT_PAGE.format(report_cte=report_cte, page_where=page_where),
+                       params + page_params + [per_page + 1, offset])
+        rows = cursor.fetchall()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        
+        paginated_soldiers = []
+        for row in rows:
+            combined_score = float(row['combined_score'] or 0)
             mental_state = get_mental_state_analysis(combined_score)
             
-            soldiers_report.append({
-                "force_id": force_id,
-                "name": f"Soldier {force_id}",
-                "latest_session_id": session_data[0] if session_data else None,
+            paginated_soldiers.append({
+                "force_id": row['force_id'],
+                "name": f"Soldier {row['force_id']}",
+                "latest_session_id": row['latest_session_id'],
                 "combined_score": round(combined_score, 3),
-                "nlp_score": round(nlp_score, 3),
-                "image_score": round(image_score, 3),
-                "last_survey_date": session_data[4].strftime("%Y-%m-%d %H:%M") if session_data and session_data[4] else None,
-                "questionnaire_title": session_data[5] if session_data else "No Survey",
-                "risk_level": risk_level_calc,
-                "total_cctv_detections": int(cctv_data[0]) if cctv_data and cctv_data[0] else 0,
-                "avg_cctv_score": round(cctv_data[1], 3) if cctv_data and cctv_data[1] else 0,
+                "nlp_score": round(float(row['nlp_score'] or 0), 3),
+                "image_score": round(float(row['image_score'] or 0), 3),
+                "last_survey_date": row['last_survey_date'].strftime("%Y-%m-%d %H:%M") if row['last_survey_date'] else None,
+                "questionnaire_title": row['questionnaire_title'],
+                "risk_level": row['risk_level'],
+                "total_cctv_detections": int(row['total_cctv_detections'] or 0),
+                "avg_cctv_score": round(float(row['avg_cctv_score'] or 0), 3),
                 "mental_state": mental_state['state'],
                 "alert_level": mental_state['level'],
                 "recommendation": mental_state['recommendation'],
-                "mental_state_score": mental_state_score
+                "mental_state_score": row['mental_state_score']
             })
         
-        # Apply risk level filtering
-        if risk_level != 'all' and risk_level in ['low', 'mid', 'high', 'critical']:
-            risk_filter_map = {'low': 'LOW', 'mid': 'MID', 'high': 'HIGH', 'critical': 'CRITICAL'}
-            soldiers_report = [s for s in soldiers_report if s['risk_level'] == risk_filter_map[risk_level]]
-        
-        # Apply pagination
-        total_count = len(soldiers_report)
-        start_idx = offset
-        end_idx = offset + per_page
-        paginated_soldiers = soldiers_report[start_idx:end_idx]
-        
         # Calculate pagination info
         total_pages = (total_count + per_page - 1) // per_page
+        next_cursor = paginated_soldiers[-1]['force_id'] if has_more else None
         
         return jsonify({
             "soldiers": paginated_soldiers,
@@ -474,8 +454,10 @@ def get_soldiers_report():
                 "per_page": per_page,
                 "total_count": total_count,
                 "total_pages": total_pages,
-                "has_next": page < total_pages,
-                "has_prev": page > 1
+                "has_next": has_more,
+                # A keyset page (after=...) always follows an earlier page; page is ignored then
+                "has_prev": bool(after_force_id) or page > 1,
+                "next_cursor": next_cursor
             },
             "filters": {
                 "risk_level": risk_level,
@@ -488,15 +470,12 @@ def get_soldiers_report():
     except Exception as e:
         logger.error(f"Error fetching soldiers report: {e}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        cursor.close()
-        db.close()
 
 
 @admin_bp.route('/dashboard-stats', methods=['GET'])
 def get_dashboard_stats():
     """Get real dashboard statistics from database"""
-    db = get_connection()
+    db = get_db_session()
     cursor = db.cursor()
     
     try:
@@ -554,21 +533,7 @@ def get_dashboard_stats():
             pending_responses = max(0, total_soldiers - current_survey_responses)
         
         # 3. Get soldiers with their latest mental health scores
-        cursor.execute("""
-            SELECT u.force_id, 
-                   COALESCE(ws.combined_avg_score, 0) as latest_score,
-                   ws.completion_timestamp
-            FROM users u
-            LEFT JOIN (
-                SELECT force_id, 
-                       combined_avg_score,
-                       completion_timestamp,
-                       ROW_NUMBER() OVER (PARTITION BY force_id ORDER BY completion_timestamp DESC) as rn
-                FROM weekly_sessions 
-                WHERE completion_timestamp IS NOT NULL
-            ) ws ON u.force_id = ws.force_id AND ws.rn = 1
-            WHERE u.user_type = 'soldier'
-        """)
+        cursor.execute(DASHBOARD_LATEST_SCORES)
         soldiers_data = cursor.fetchall()
         
         # Calculate risk levels based on current settings
@@ -714,9 +679,6 @@ def get_dashboard_stats():
     except Exception as e:
         logger.error(f"Error fetching dashboard stats: {e}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        cursor.close()
-        db.close()
 
 
 @admin_bp.route('/search-soldiers', methods=['POST'])
@@ -914,6 +876,7 @@ def download_soldiers_pdf():
             return jsonify({'error': 'No soldiers data provided'}), 400
         
         # Create PDF with enhanced design
+        from fpdf import FPDF  # Only the report endpoint needs it; keep it out of app startup
         pdf = FPDF()
         pdf.add_page()
         
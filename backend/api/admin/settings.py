@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from db.connection import get_connection
 import logging
 from config.settings import settings
+from services.settings_store import bump_settings_version
 
 settings_bp = Blueprint('settings', __name__)
 logger = logging.getLogger(__name__)
@@ -151,6 +152,7 @@ def update_system_settings():
             """, (setting_name, setting_value, description))
         
         conn.commit()
+        bump_settings_version()
         
         return jsonify({
             'success': True,
@@ -217,6 +219,7 @@ def reset_settings():
         # Delete all custom settings (will fall back to defaults)
         cursor.execute("DELETE FROM system_settings")
         conn.commit()
+        bump_settings_version()
         
         return jsonify({
             'success': True,
@@ -288,6 +291,7 @@ def restore_settings():
             ))
         
         conn.commit()
+        bump_settings_version()
         
         return jsonify({
             'success': True,
@@ -326,6 +330,7 @@ def get_webcam_toggle():
                 ON DUPLICATE KEY UPDATE setting_value = 'true'
             """)
             conn.commit()
+            bump_settings_version()
         
         return jsonify({
             'success': True,
@@ -359,6 +364,7 @@ def set_webcam_toggle():
         """, (str(webcam_enabled).lower(),))
         
         conn.commit()
+        bump_settings_version()
         
         return jsonify({
             'success': True,
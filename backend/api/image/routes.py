@@ -1,20 +1,23 @@
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, Response, jsonify, request, send_file
+import io
+import json
 import logging
 import os
 import re
 import shutil
-from services.image_collection import ImageCollectionService
-from services.enhanced_face_recognition_service import EnhancedFaceRecognitionService
-from services.enhanced_emotion_detection_service import EnhancedEmotionDetectionService
-from services.cctv_monitoring_service import CCTVMonitoringService
+import numpy as np
+from services.service_container import lazy_service
+from services.survey_sessions import DEFAULT_KIOSK_ID, SurveyAdmissionError, get_survey_session_registry
 from services.face_model_manager import FaceModelManager
 from db.connection import get_connection
+from config.settings import settings
 from datetime import datetime
 
 image_bp = Blueprint('image', __name__)
-image_collection_service = ImageCollectionService()
-face_recognition_service = EnhancedFaceRecognitionService()
-monitoring_service = CCTVMonitoringService()
+# Constructed (with cv2/face_recognition/the emotion model) on first use or by the preloader
+image_collection_service = lazy_service('image_collection')
+face_recognition_service = lazy_service('face_recognition')
+monitoring_service = lazy_service('cctv_monitoring')
 
 @image_bp.route('/collect', methods=['POST'])
 def collect_images():
@@ -101,17 +104,40 @@ def train_batch():
 
 @image_bp.route('/start-monitoring', methods=['POST'])
 def start_monitoring():
-    """DISABLED: Start CCTV emotion monitoring for a day"""
-    return jsonify({
-        'error': 'Daily CCTV monitoring is temporarily disabled. Only survey emotion monitoring is active.'
-    }), 503
+    """Start CCTV emotion monitoring for a day (only with configured CCTV_CAMERAS streams)"""
+    if not settings.CCTV_CAMERAS:
+        return jsonify({
+            'error': 'Daily CCTV monitoring is temporarily disabled. Only survey emotion monitoring is active.'
+        }), 503
+    data = request.get_json(silent=True) or {}
+    date = data.get('date') or datetime.now().strftime('%Y-%m-%d')
+    try:
+        if not monitoring_service.start_monitoring(date):
+            return jsonify({'error': 'Monitoring is already running'}), 409
+        return jsonify({
+            'message': 'CCTV monitoring started',
+            'date': date,
+            'monitoring_id': monitoring_service.monitoring_id,
+            'cameras': list(monitoring_service.camera_farm.cameras) if monitoring_service.camera_farm else []
+        }), 200
+    except Exception as e:
+        logging.error(f"Error in start_monitoring: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
 @image_bp.route('/end-monitoring', methods=['POST'])
 def end_monitoring():
-    """DISABLED: End CCTV emotion monitoring for a day"""
-    return jsonify({
-        'error': 'Daily CCTV monitoring is temporarily disabled. Only survey emotion monitoring is active.'
-    }), 503
+    """End CCTV emotion monitoring for a day and store the daily averages"""
+    if not settings.CCTV_CAMERAS:
+        return jsonify({
+            'error': 'Daily CCTV monitoring is temporarily disabled. Only survey emotion monitoring is active.'
+        }), 503
+    try:
+        if not monitoring_service.stop_monitoring():
+            return jsonify({'error': 'Monitoring is not running or daily averages could not be stored'}), 400
+        return jsonify({'message': 'CCTV monitoring ended and daily averages stored'}), 200
+    except Exception as e:
+        logging.error(f"Error in end_monitoring: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
 @image_bp.route('/process-frame', methods=['POST'])
 def process_frame():
@@ -130,11 +156,13 @@ def start_survey_monitoring():
         }), 400
         
     force_id = data['force_id']
+    kiosk_id = data.get('kiosk_id', DEFAULT_KIOSK_ID)
     
     try:
         # OPTIMIZATION: Quick return if monitoring is already active for this soldier
-        if hasattr(monitoring_service, 'survey_monitoring') and monitoring_service.survey_monitoring:
-            if hasattr(monitoring_service, 'survey_force_id') and monitoring_service.survey_force_id == force_id:
+        session = get_survey_session_registry().get(force_id)
+        if session is not None and session.active:
+            if session.kiosk_id == kiosk_id:
                 return jsonify({
                     'message': 'Survey emotion monitoring already active',
                     'webcam_enabled': True,
@@ -143,17 +171,8 @@ def start_survey_monitoring():
                 }), 200
         
         # Check if webcam is enabled before starting monitoring
-        from db.connection import get_connection
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("SELECT setting_value FROM system_settings WHERE setting_name = 'webcam_enabled'")
-        result = cursor.fetchone()
-        conn.close()
-        
-        webcam_enabled = True  # Default to enabled
-        if result:
-            webcam_enabled = result['setting_value'].lower() == 'true'
+        from services.settings_store import get_settings_snapshot
+        webcam_enabled = get_settings_snapshot().webcam_enabled
         
         if not webcam_enabled:
             return jsonify({
@@ -162,8 +181,17 @@ def start_survey_monitoring():
                 'force_id': force_id
             }), 200
         
-        # Start monitoring for this specific soldier
-        if monitoring_service.start_survey_monitoring(force_id):
+        # Start monitoring for this specific soldier (admission-controlled across kiosks)
+        try:
+            started = monitoring_service.start_survey_monitoring(force_id, kiosk_id)
+        except SurveyAdmissionError as e:
+            return jsonify({
+                'error': f'Survey monitoring unavailable: {e}',
+                'webcam_enabled': True,
+                'force_id': force_id,
+                'admitted': False
+            }), 503
+        if started:
             return jsonify({
                 'message': 'Survey emotion monitoring started successfully',
                 'webcam_enabled': True,
@@ -192,7 +220,12 @@ def end_survey_monitoring():
     session_id = data.get('session_id')
     
     try:
-        # Stop monitoring and get results
+        # Stop monitoring and get results (no camera/ML services needed if no session is open)
+        if get_survey_session_registry().get(force_id) is None:
+            return jsonify({
+                'message': 'No monitoring session active',
+                'emotion_data': {'force_id': force_id, 'message': 'No monitoring session active'}
+            }), 200
         results = monitoring_service.stop_survey_monitoring(force_id, session_id)
         if results:
             return jsonify({
@@ -209,6 +242,38 @@ def end_survey_monitoring():
             'error': str(e)
         }), 500
 
+@image_bp.route('/monitoring-pipeline-stats', methods=['GET'])
+def get_monitoring_pipeline_stats():
+    """Per-stage latency and dropped-frame counters of the camera capture/inference pipeline"""
+    try:
+        stats = monitoring_service.get_pipeline_stats()
+        stats['survey_sessions'] = get_survey_session_registry().stats()
+        return jsonify(stats), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@image_bp.route('/monitoring-preview', methods=['GET'])
+def monitoring_preview():
+    """
+    MJPEG stream of the annotated monitoring feed (CCTV_PREVIEW=mjpeg; monitoring runs headless otherwise).
+    With CCTV_CAMERAS, ?camera=<id> selects the camera (default: the first one).
+    """
+    if settings.CCTV_PREVIEW.lower() != 'mjpeg':
+        return jsonify({'error': 'Monitoring preview is disabled (set CCTV_PREVIEW=mjpeg)'}), 404
+    if not monitoring_service.is_monitoring:
+        return jsonify({'error': 'Monitoring is not running'}), 409
+
+    preview = monitoring_service.preview
+    camera_farm = monitoring_service.camera_farm
+    if camera_farm:
+        camera_id = request.args.get('camera') or next(iter(camera_farm.cameras))
+        if camera_id not in camera_farm.cameras:
+            return jsonify({'error': f'Unknown camera: {camera_id}'}), 404
+        stream = preview.stream(camera_id)
+    else:
+        stream = preview.stream()  # The single-camera pipeline's feed
+    return Response(stream, mimetype=preview.mimetype, headers={'Cache-Control': 'no-cache'})
+
 @image_bp.route('/model-status', methods=['GET'])
 def get_model_status():
     """Get comprehensive face recognition model status"""
@@ -270,10 +335,9 @@ def get_soldier_training_status(force_id):
         conn.close()
         
         if result:
-            # Count encodings in PKL
+            # Count encodings in the face model
             model_manager = FaceModelManager()
-            encodings, force_ids = model_manager.load_model_with_validation()
-            encodings_count = force_ids.count(force_id) if force_ids else 0
+            encodings_count = model_manager.encoding_counts().get(force_id, 0)
             
             return jsonify({
                 'force_id': force_id,
@@ -310,39 +374,23 @@ def delete_soldier_face_data(force_id):
         cursor.close()
         conn.close()
         
-        # Delete from PKL file
+        # Delete from the face model (tombstone, no model rewrite)
         model_manager = FaceModelManager()
+        removed_count = model_manager.encoding_counts().get(force_id, 0)
         
-        # Load current model
-        encodings, force_ids = model_manager.load_model_with_validation()
-        removed_count = 0
-        
-        if encodings and force_ids:
-            # Remove soldier's encodings
-            new_encodings = []
-            new_force_ids = []
-            
-            for i, fid in enumerate(force_ids):
-                if fid == force_id:
-                    removed_count += 1
-                else:
-                    new_encodings.append(encodings[i])
-                    new_force_ids.append(fid)
+        if removed_count > 0:
+            if not model_manager.remove_soldiers([force_id]):
+                return jsonify({'error': 'Failed to update face model'}), 500
             
-            # Save updated model only if there were changes
-            if removed_count > 0:
-                if not model_manager.atomic_save_model(new_encodings, new_force_ids):
-                    return jsonify({'error': 'Failed to update PKL model'}), 500
-                
-                # Force refresh the model cache after PKL update
-                try:
-                    from services.model_refresh_service import get_model_refresh_service
-                    refresh_service = get_model_refresh_service()
-                    refresh_service.force_refresh()
-                    logging.info(f"Model cache refreshed after deleting soldier {force_id}")
-                except Exception as e:
-                    logging.warning(f"Failed to refresh model cache: {str(e)}")
-                    # Don't fail the deletion if cache refresh fails
+            # Force refresh the model cache after the model update
+            try:
+                from services.model_refresh_service import get_model_refresh_service
+                refresh_service = get_model_refresh_service()
+                refresh_service.force_refresh()
+                logging.info(f"Model cache refreshed after deleting soldier {force_id}")
+            except Exception as e:
+                logging.warning(f"Failed to refresh model cache: {str(e)}")
+                # Don't fail the deletion if cache refresh fails
         
         # Complete system-wide deletion from ALL tables
         conn = get_connection()
@@ -433,28 +481,17 @@ def batch_delete_soldiers():
         
         model_manager = FaceModelManager()
         
-        # Load current model
-        encodings, force_ids = model_manager.load_model_with_validation()
-        if not encodings or not force_ids:
+        # Encoding counts of the soldiers being removed
+        model_counts = model_manager.encoding_counts()
+        if not model_counts:
             return jsonify({'error': 'No model data found'}), 404
         
-        # Remove soldiers' encodings
-        new_encodings = []
-        new_force_ids = []
-        removed_counts = {}
-        
-        for i, fid in enumerate(force_ids):
-            if fid in force_ids_to_delete:
-                removed_counts[fid] = removed_counts.get(fid, 0) + 1
-            else:
-                new_encodings.append(encodings[i])
-                new_force_ids.append(fid)
-        
+        removed_counts = {fid: model_counts[fid] for fid in force_ids_to_delete if fid in model_counts}
         if not removed_counts:
             return jsonify({'error': 'None of the specified soldiers found in model'}), 404
         
-        # Save updated model
-        if not model_manager.atomic_save_model(new_encodings, new_force_ids):
+        # Tombstone the soldiers (no model rewrite)
+        if not model_manager.remove_soldiers(list(removed_counts)):
             return jsonify({'error': 'Failed to update model'}), 500
         
         # Force refresh the model cache after PKL update
@@ -541,7 +578,7 @@ def batch_delete_soldiers():
             'message': f'{len(force_ids_to_delete)} soldiers deleted successfully',
             'deleted_soldiers': list(removed_counts.keys()),
             'removed_encodings': removed_counts,
-            'remaining_soldiers': len(set(new_force_ids))
+            'remaining_soldiers': len(model_manager.get_soldier_ids())
         })
         
     except Exception as e:
@@ -549,16 +586,22 @@ def batch_delete_soldiers():
 
 @image_bp.route('/export-face-model', methods=['GET'])
 def export_face_model():
-    """Export the face recognition model file"""
+    """Export the face recognition model (encodings, labels and force IDs) as one .npz file"""
     try:
-        model_path = os.path.join('storage', 'models', 'face_recognition_model.pkl')
-        if not os.path.exists(model_path):
+        model_manager = FaceModelManager()
+        encodings, labels, force_ids, manifest = model_manager.load_model_arrays()
+        if encodings is None:
             return jsonify({'error': 'Model file not found'}), 404
         
+        buffer = io.BytesIO()
+        np.savez(buffer, encodings=encodings, labels=labels, force_ids=np.array(force_ids),
+                 manifest=np.array(json.dumps(manifest)))
+        buffer.seek(0)
+        
         return send_file(
-            model_path,
+            buffer,
             as_attachment=True,
-            download_name=f'face_model_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pkl',
+            download_name=f'face_model_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.npz',
             mimetype='application/octet-stream'
         )
         
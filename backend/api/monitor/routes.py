@@ -1,7 +1,6 @@
 from flask import Blueprint, jsonify, request
-from services.enhanced_face_recognition_service import EnhancedFaceRecognitionService
 from services.model_refresh_service import get_model_refresh_service
-from services.enhanced_emotion_detection_service import EnhancedEmotionDetectionService
+from services.service_container import get_service
 from db.connection import get_connection
 import logging
 from datetime import datetime, timedelta
@@ -12,7 +11,7 @@ monitor_bp = Blueprint('monitor', __name__)
 def get_face_model_status():
     """Get comprehensive face model status"""
     try:
-        service = EnhancedFaceRecognitionService()
+        service = get_service('face_recognition')
         status = service.get_comprehensive_model_status()
         return jsonify(status), 200
     except Exception as e:
@@ -65,7 +64,7 @@ def configure_auto_refresh():
 def check_model_integrity():
     """Check model file integrity"""
     try:
-        service = EnhancedFaceRecognitionService()
+        service = get_service('face_recognition')
         integrity = service.model_manager.validate_model_integrity()
         return jsonify(integrity), 200
     except Exception as e:
@@ -75,7 +74,7 @@ def check_model_integrity():
 def check_database_sync():
     """Check synchronization between PKL model and database"""
     try:
-        service = EnhancedFaceRecognitionService()
+        service = get_service('face_recognition')
         sync_status = service.validate_model_vs_database()
         return jsonify(sync_status), 200
     except Exception as e:
@@ -85,7 +84,7 @@ def check_database_sync():
 def create_model_backup():
     """Create a manual backup of the face model"""
     try:
-        service = EnhancedFaceRecognitionService()
+        service = get_service('face_recognition')
         data = request.get_json() or {}
         version = data.get('version')
         
@@ -124,7 +123,7 @@ def remove_soldier_from_model():
         if not force_id:
             return jsonify({'error': 'force_id is required'}), 400
         
-        service = EnhancedFaceRecognitionService()
+        service = get_service('face_recognition')
         success = service.model_manager.remove_soldiers([force_id])
         
         if success:
@@ -145,7 +144,7 @@ def remove_soldier_from_model():
 def get_emotion_model_status():
     """Get emotion detection model status"""
     try:
-        service = EnhancedEmotionDetectionService()
+        service = get_service('emotion_detection')
         status = service.get_model_status()
         return jsonify(status), 200
     except Exception as e:
@@ -156,11 +155,11 @@ def get_system_health():
     """Get overall system health status"""
     try:
         # Check face recognition system
-        face_service = EnhancedFaceRecognitionService()
+        face_service = get_service('face_recognition')
         face_status = face_service.get_comprehensive_model_status()
         
         # Check emotion detection system
-        emotion_service = EnhancedEmotionDetectionService()
+        emotion_service = get_service('emotion_detection')
         emotion_status = emotion_service.get_model_status()
         
         # Check database connectivity
@@ -1,5 +1,10 @@
 from flask import Blueprint, request, jsonify
 from db.connection import get_connection
+from db.session import get_db_session
+from db.assessment_summary import upsert_latest_assessment
+from services.settings_store import get_settings_snapshot
+from services.service_container import get_service
+from services.survey_sessions import get_survey_session_registry
 from services.sentiment_analysis_service import analyze_sentiment, calculate_average_score
 from config.settings import Settings
 import logging
@@ -11,37 +16,9 @@ logger = logging.getLogger(__name__)
 settings = Settings()
 
 def get_dynamic_settings():
-    """Get current settings from database with fallback to config defaults"""
-    try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get NLP and emotion weights from database
-        cursor.execute("""
-            SELECT setting_name, setting_value 
-            FROM system_settings 
-            WHERE setting_name IN ('nlp_weight', 'emotion_weight')
-        """)
-        
-        db_settings = cursor.fetchall()
-        setting_values = {}
-        
-        for setting in db_settings:
-            setting_values[setting['setting_name']] = float(setting['setting_value'])
-        
-        # Use database values if available, otherwise use config defaults
-        nlp_weight = setting_values.get('nlp_weight', settings.NLP_WEIGHT)
-        emotion_weight = setting_values.get('emotion_weight', settings.EMOTION_WEIGHT)
-        
-        conn.close()
-        logger.info(f"Dynamic settings loaded - NLP Weight: {nlp_weight}, Emotion Weight: {emotion_weight}")
-        return nlp_weight, emotion_weight
-        
-    except Exception as e:
-        logger.error(f"Error retrieving dynamic settings: {e}")
-        # Fallback to config defaults
-        logger.info(f"Using config defaults - NLP Weight: {settings.NLP_WEIGHT}, Emotion Weight: {settings.EMOTION_WEIGHT}")
-        return settings.NLP_WEIGHT, settings.EMOTION_WEIGHT
+    """Get current scoring weights from the cached system settings"""
+    snapshot = get_settings_snapshot()
+    return snapshot.nlp_weight, snapshot.emotion_weight
 
 def calculate_dynamic_combined_score(nlp_score, emotion_score):
     """Calculate weighted combined depression score using database settings"""
@@ -57,39 +34,8 @@ def calculate_dynamic_combined_score(nlp_score, emotion_score):
         return 0.0
 
 def get_dynamic_risk_thresholds():
-    """Get current risk thresholds from database with fallback to config defaults"""
-    try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get risk thresholds from database
-        cursor.execute("""
-            SELECT setting_name, setting_value 
-            FROM system_settings 
-            WHERE setting_name IN ('risk_low_threshold', 'risk_medium_threshold', 'risk_high_threshold', 'risk_critical_threshold')
-        """)
-        
-        db_settings = cursor.fetchall()
-        setting_values = {}
-        
-        for setting in db_settings:
-            setting_values[setting['setting_name']] = float(setting['setting_value'])
-        
-        # Use database values if available, otherwise use config defaults
-        risk_thresholds = {
-            'LOW': setting_values.get('risk_low_threshold', settings.RISK_THRESHOLDS['LOW']),
-            'MEDIUM': setting_values.get('risk_medium_threshold', settings.RISK_THRESHOLDS['MEDIUM']),
-            'HIGH': setting_values.get('risk_high_threshold', settings.RISK_THRESHOLDS['HIGH']),
-            'CRITICAL': setting_values.get('risk_critical_threshold', settings.RISK_THRESHOLDS['CRITICAL'])
-        }
-        
-        conn.close()
-        return risk_thresholds
-        
-    except Exception as e:
-        logger.error(f"Error retrieving dynamic risk thresholds: {e}")
-        # Fallback to config defaults
-        return settings.RISK_THRESHOLDS
+    """Get current risk thresholds from the cached system settings"""
+    return dict(get_settings_snapshot().risk_thresholds)
 
 def get_mental_state_analysis(score):
     """Determine mental state based on combined score using dynamic thresholds from database"""
@@ -175,27 +121,14 @@ def get_survey_initialization_data():
             for row in cursor.fetchall()
         ]
 
-        # Query 3: Get webcam settings (commonly needed for survey)
-        cursor.execute("""
-            SELECT setting_name, setting_value 
-            FROM system_settings 
-            WHERE setting_name IN ('webcam_enabled', 'detection_interval', 'camera_width', 'camera_height')
-        """)
-        
-        settings = {}
-        for setting_name, setting_value in cursor.fetchall():
-            if setting_name == 'webcam_enabled':
-                settings[setting_name] = setting_value.lower() == 'true'
-            elif setting_name in ['detection_interval', 'camera_width', 'camera_height']:
-                settings[setting_name] = int(setting_value)
-            else:
-                settings[setting_name] = setting_value
-
-        # Default settings if not found
-        settings.setdefault('webcam_enabled', True)
-        settings.setdefault('detection_interval', 30)
-        settings.setdefault('camera_width', 640)
-        settings.setdefault('camera_height', 480)
+        # Webcam settings (commonly needed for survey), served from the settings cache
+        snapshot = get_settings_snapshot()
+        settings = {
+            'webcam_enabled': snapshot.webcam_enabled,
+            'detection_interval': snapshot.detection_interval,
+            'camera_width': snapshot.camera_width,
+            'camera_height': snapshot.camera_height
+        }
 
         return jsonify({
             "questionnaire": {
@@ -270,7 +203,9 @@ def get_active_questionnaire():
 
 @survey_bp.route('/submit', methods=['POST'])
 def submit_survey():
-    db = get_connection()
+    # Request unit of work: credential check, session insert, emotion update and
+    # responses all share one connection and commit together after the response
+    db = get_db_session()
     cursor = db.cursor()
 
     try:
@@ -315,9 +250,9 @@ def submit_survey():
         image_avg_score = 0
         emotion_results = None
         try:
-            from services.cctv_monitoring_service import CCTVMonitoringService
-            monitoring_service = CCTVMonitoringService()
-            emotion_results = monitoring_service.stop_survey_monitoring(force_id, session_id)
+            # The soldier's session in the shared registry holds the detections collected so far
+            if get_survey_session_registry().get(force_id) is not None:
+                emotion_results = get_service('cctv_monitoring').stop_survey_monitoring(force_id, session_id)
             
             logger.info(f"Emotion monitoring results: {emotion_results}")
             
@@ -466,7 +401,9 @@ def submit_survey():
               mental_state_rating,  # Add mental state rating to weekly_sessions table
               session_id))
         
-        db.commit()
+        # Keep the per-soldier latest assessment in step with the session
+        upsert_latest_assessment(cursor, session_id)
+        
         return jsonify({
             "message": "Survey submitted successfully with weighted sentiment analysis and emotion monitoring",
             "session_id": session_id,
@@ -497,9 +434,6 @@ def submit_survey():
     except Exception as e:
         db.rollback()
         return jsonify({"error": str(e)}), 500
-    finally:
-        cursor.close()
-        db.close()
 
 @survey_bp.route('/admin/questionnaires/<int:questionnaire_id>/activate', methods=['POST'])
 def activate_questionnaire(questionnaire_id):
@@ -1,13 +1,9 @@
-from flask import Flask, jsonify
+from utils.startup_report import startup_report
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from api import api_bp
-from api.auth.routes import auth_bp
-from api.image.routes import image_bp
-from api.admin.routes import admin_bp
-from api.admin.settings import settings_bp
-from api.survey.routes import survey_bp
-from api.monitor.routes import monitor_bp
 from config.settings import settings
+from db.session import init_app as init_db_session
 from utils.session_utils import get_dynamic_session_timeout
 from datetime import timedelta
 import os
@@ -17,6 +13,18 @@ import threading
 # PHASE 2 OPTIMIZATION: Add model preloader
 from services.model_preloader_service import ModelPreloaderService
 
+# (module, blueprint, url prefix); imported through the startup report so each import is timed.
+# Route modules construct no services at import time - see services/service_container.py
+BLUEPRINTS = [
+    ('api.auth.routes', 'auth_bp', '/api/auth'),
+    ('api.image.routes', 'image_bp', '/api/image'),
+    ('api.admin.routes', 'admin_bp', '/api/admin'),
+    ('api.admin.settings', 'settings_bp', '/api/admin/settings'),
+    ('api.survey.routes', 'survey_bp', '/api/survey'),
+    ('api.survey.question_timing', 'question_timing_bp', '/api/survey'),
+    ('api.monitor.routes', 'monitor_bp', '/api/monitor'),
+]
+
 def create_app():
     app = Flask(__name__)
     
@@ -31,6 +39,9 @@ def create_app():
         
     app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(seconds=session_timeout)
     
+    # One pooled DB connection and transaction per request
+    init_db_session(app)
+    
     # Update CORS configuration using settings
     CORS(app, resources={
         r"/api/*": {
@@ -43,12 +54,14 @@ def create_app():
 
     # Register the main API blueprint
     app.register_blueprint(api_bp)
-    app.register_blueprint(auth_bp, url_prefix='/api/auth')
-    app.register_blueprint(image_bp, url_prefix='/api/image')
-    app.register_blueprint(admin_bp, url_prefix='/api/admin')
-    app.register_blueprint(settings_bp, url_prefix='/api/admin/settings')
-    app.register_blueprint(survey_bp, url_prefix='/api/survey')
-    app.register_blueprint(monitor_bp, url_prefix='/api/monitor')
+    for module_name, blueprint_name, url_prefix in BLUEPRINTS:
+        module = startup_report.import_module(module_name)
+        app.register_blueprint(getattr(module, blueprint_name), url_prefix=url_prefix)
+    
+    @app.after_request
+    def record_first_response(response):
+        startup_report.record_response(request.path)
+        return response
 
     # PHASE 2 OPTIMIZATION: Initialize model preloader in background
     def start_model_preloader():
@@ -84,6 +97,7 @@ def create_app():
     # def cleanup(error):
     #     scheduler.stop()
     
+    startup_report.mark_app_ready()
     return app
 
 app = create_app()
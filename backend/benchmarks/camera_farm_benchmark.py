@@ -0,0 +1,71 @@
+"""
+Throughput scaling of the multi-camera inference farm.
+
+Runs the camera farm on the same set of streams with 1, 2, ... worker
+processes and reports processed frames per second, backpressure drops and
+end-to-end latency; with enough cameras, throughput should grow roughly
+linearly with the worker count until the cores run out:
+
+    python -m benchmarks.camera_farm_benchmark --video clip.mp4 --cameras 8
+    python -m benchmarks.camera_farm_benchmark --sources rtsp://10.0.0.5/a,rtsp://10.0.0.6/b --workers 1,2,4
+    python -m benchmarks.camera_farm_benchmark --video clip.mp4 --cameras 8 --fps 30 --seconds 60
+
+Each camera of --video plays the same file (use a long one); --fps is set
+above what one worker can sustain so the farm runs saturated.
+"""
+import argparse
+import logging
+import os
+import time
+from services.camera_farm import CameraConfig, CameraFarm
+
+
+def run_farm(cameras, workers: int, seconds: float, slots: int) -> dict:
+    farm = CameraFarm(cameras, workers=workers, slots_per_camera=slots)
+    start = time.time()
+    farm.start()
+    load_seconds = time.time() - start
+    time.sleep(seconds)
+    stats = farm.stats()
+    farm.stop()
+
+    latencies = [c['stages']['end_to_end'].get('p50_ms') for c in stats['cameras'].values()]
+    latencies = [value for value in latencies if value is not None]
+    return {
+        'workers': len(stats['workers']),
+        'load_seconds': round(load_seconds, 1),
+        'processed_fps': stats['totals']['processed_fps'],
+        'dropped': stats['totals']['dropped_backpressure'],
+        'p50_ms': round(sum(latencies) / len(latencies), 1) if latencies else None
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark camera farm throughput against worker processes")
+    parser.add_argument('--video', help="video file played by every camera")
+    parser.add_argument('--cameras', type=int, default=4, help="cameras playing --video")
+    parser.add_argument('--sources', help="comma-separated stream URLs/files instead of --video")
+    parser.add_argument('--fps', type=float, default=25.0, help="target FPS per camera")
+    parser.add_argument('--workers', default=None, help="comma-separated worker counts (default 1..cores)")
+    parser.add_argument('--seconds', type=float, default=30.0, help="measurement time per worker count")
+    parser.add_argument('--slots', type=int, default=3, help="frame ring slots per camera")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.sources:
+        sources = args.sources.split(',')
+    elif args.video:
+        sources = [args.video] * args.cameras
+    else:
+        parser.error("--video or --sources is required")
+    cameras = [CameraConfig(f"cam{i}", source, args.fps) for i, source in enumerate(sources)]
+
+    counts = [int(n) for n in args.workers.split(',')] if args.workers else range(1, (os.cpu_count() or 1) + 1)
+    print(f"{'workers':>8} {'load s':>8} {'frames/s':>9} {'speedup':>8} {'dropped':>8} {'p50 ms':>8}")
+    baseline = None
+    for count in counts:
+        result = run_farm(cameras, count, args.seconds, args.slots)
+        baseline = baseline or result['processed_fps'] or None
+        speedup = result['processed_fps'] / baseline if baseline else 0.0
+        print(f"{result['workers']:>8} {result['load_seconds']:>8.1f} {result['processed_fps']:>9.1f} "
+              f"{speedup:>8.2f} {result['dropped']:>8} {result['p50_ms'] if result['p50_ms'] is not None else '-':>8}")
@@ -0,0 +1,95 @@
+"""
+Latency / memory benchmark of the emotion model engines.
+
+Every engine is measured in a fresh interpreter, so load time includes its
+imports (TensorFlow for Keras) and peak RSS is not shared between engines:
+
+    python -m benchmarks.emotion_engine_benchmark
+    python -m benchmarks.emotion_engine_benchmark --engines numpy --npz model/emotion_model_int8.npz
+    python -m benchmarks.emotion_engine_benchmark --batch-sizes 1,8,32 --repeats 50
+
+Convert the model first with `python -m services.emotion_numpy_engine --convert`.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+
+
+def measure(engine: str, npz: str, batch_sizes, repeats: int) -> dict:
+    """Load one engine and time forward passes (runs in the child interpreter)"""
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if engine == 'numpy':
+        from services.emotion_numpy_engine import NumpyEmotionModel
+        model = NumpyEmotionModel.load(npz)
+        forward = model
+    else:
+        from services.model_registry import load_keras_emotion_model
+        import tensorflow as tf
+        model = load_keras_emotion_model()
+        compiled = tf.function(lambda batch: model(batch, training=False))
+        forward = lambda batch: compiled(tf.convert_to_tensor(batch)).numpy()
+    load_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    latencies = {}
+    for batch_size in batch_sizes:
+        batch = rng.random((batch_size, 48, 48, 1), dtype=np.float32)
+        forward(batch)  # Warm-up (and tracing for Keras)
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            forward(batch)
+            samples.append((time.perf_counter() - start) * 1000)
+        latencies[batch_size] = {
+            'p50_ms': round(float(np.percentile(samples, 50)), 3),
+            'p95_ms': round(float(np.percentile(samples, 95)), 3),
+            'per_face_ms': round(float(np.percentile(samples, 50)) / batch_size, 3)
+        }
+
+    return {
+        'engine': engine,
+        'load_seconds': round(load_seconds, 3),
+        # ru_maxrss is in KB on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'load_rss_mb': round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+        'latency': latencies
+    }
+
+
+def run(args):
+    print(f"{'engine':>8} {'load s':>8} {'RSS MB':>8} {'batch':>6} {'p50 ms':>8} {'p95 ms':>8} {'ms/face':>8}")
+    for engine in args.engines.split(','):
+        child = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.emotion_engine_benchmark', '--child', engine,
+             '--npz', args.npz, '--batch-sizes', args.batch_sizes, '--repeats', str(args.repeats)],
+            capture_output=True, text=True
+        )
+        if child.returncode != 0:
+            print(f"{engine:>8} failed: {child.stderr.strip().splitlines()[-1] if child.stderr.strip() else child.returncode}")
+            continue
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        for batch_size, latency in result['latency'].items():
+            print(f"{engine:>8} {result['load_seconds']:>8.3f} {result['peak_rss_mb']:>8.1f} {batch_size:>6} "
+                  f"{latency['p50_ms']:>8.3f} {latency['p95_ms']:>8.3f} {latency['per_face_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    from services.emotion_numpy_engine import EMOTION_MODEL_NPZ
+
+    parser = argparse.ArgumentParser(description="Benchmark NumPy vs Keras emotion model inference")
+    parser.add_argument('--engines', default='numpy,keras', help="comma-separated engines")
+    parser.add_argument('--npz', default=EMOTION_MODEL_NPZ, help="converted NumPy model")
+    parser.add_argument('--batch-sizes', default='1,8,32')
+    parser.add_argument('--repeats', type=int, default=30)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.npz, [int(b) for b in args.batch_sizes.split(',')], args.repeats)))
+    else:
+        run(args)
@@ -0,0 +1,116 @@
+"""
+Speed / accuracy benchmark of downscaled Haar face detection.
+
+Runs the frontal face cascade at full resolution (the reference) and at each
+detection width on frames from a video file, a camera or a directory of
+images, and reports per-frame latency plus recall/precision of the
+downscaled boxes against the full-resolution ones (IoU >= 0.5):
+
+    python -m benchmarks.face_detection_benchmark --video clip.mp4
+    python -m benchmarks.face_detection_benchmark --camera 0 --frames 200 --widths 480,320,240
+    python -m benchmarks.face_detection_benchmark --images storage/images --upscale 1280x720
+
+It also times the per-frame conversions that detection feeds: the old path
+(1280x720 upscale, full-frame gray and RGB) against the ROI-only path.
+"""
+import argparse
+import glob
+import os
+import time
+import cv2
+import numpy as np
+from services.face_detection import detect_faces, iou, padded_roi
+from services.model_registry import FACE_CASCADE_PATH
+
+
+def read_frames(args):
+    """Up to args.frames BGR frames from the selected source"""
+    frames = []
+    if args.images:
+        paths = sorted(p for p in glob.glob(os.path.join(args.images, '**', '*'), recursive=True)
+                       if p.lower().endswith(('.jpg', '.jpeg', '.png')))
+        for path in paths[:args.frames]:
+            frame = cv2.imread(path)
+            if frame is not None:
+                frames.append(frame)
+    else:
+        cap = cv2.VideoCapture(args.video if args.video else args.camera)
+        while len(frames) < args.frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+
+    if args.upscale:
+        width, height = (int(v) for v in args.upscale.lower().split('x'))
+        frames = [cv2.resize(frame, (width, height)) for frame in frames]
+    return frames
+
+
+def match_boxes(reference, candidates, threshold: float = 0.5):
+    """(matched reference boxes, matched candidate boxes) at the IoU threshold"""
+    matched_ref = sum(1 for box in reference if any(iou(box, c) >= threshold for c in candidates))
+    matched_cand = sum(1 for c in candidates if any(iou(box, c) >= threshold for box in reference))
+    return matched_ref, matched_cand
+
+
+def run(args):
+    cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
+    frames = read_frames(args)
+    if not frames:
+        raise SystemExit("No frames read from the selected source")
+    widths = [int(w) for w in args.widths.split(',')]
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames of {width}x{height}")
+
+    def timed_detect(detection_width):
+        boxes, latencies = [], []
+        for frame in frames:
+            start = time.perf_counter()
+            boxes.append(detect_faces(cascade, frame, detection_width))
+            latencies.append((time.perf_counter() - start) * 1000)
+        return boxes, np.array(latencies)
+
+    reference, reference_latency = timed_detect(0)
+    reference_count = sum(len(b) for b in reference)
+    print(f"{'width':>6} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8} {'faces':>6} {'recall':>7} {'precision':>9}")
+    print(f"{'full':>6} {np.percentile(reference_latency, 50):>8.2f} {np.percentile(reference_latency, 95):>8.2f} "
+          f"{1.0:>8.2f} {reference_count:>6} {1.0:>7.3f} {1.0:>9.3f}")
+
+    for detection_width in widths:
+        boxes, latency = timed_detect(detection_width)
+        found = sum(len(b) for b in boxes)
+        matched = [match_boxes(ref, cand) for ref, cand in zip(reference, boxes)]
+        recall = sum(m[0] for m in matched) / reference_count if reference_count else float('nan')
+        precision = sum(m[1] for m in matched) / found if found else float('nan')
+        print(f"{detection_width:>6} {np.percentile(latency, 50):>8.2f} {np.percentile(latency, 95):>8.2f} "
+              f"{np.median(reference_latency) / np.median(latency):>8.2f} {found:>6} {recall:>7.3f} {precision:>9.3f}")
+
+    # Conversions around detection: whole frame (old) vs face region only (new)
+    faces = [max(b, key=lambda f: f[2] * f[3]) if b else (width // 4, height // 4, width // 4, height // 4)
+             for b in reference]
+    start = time.perf_counter()
+    for frame in frames:
+        resized = cv2.resize(frame, (1280, 720))
+        cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
+        cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+    full_ms = (time.perf_counter() - start) * 1000 / len(frames)
+    start = time.perf_counter()
+    for frame, (x, y, w, h) in zip(frames, faces):
+        cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY)
+        crop, _ = padded_roi(frame, (x, y, w, h))
+        cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+    roi_ms = (time.perf_counter() - start) * 1000 / len(frames)
+    print(f"conversions per frame: full frame {full_ms:.2f} ms, face ROI only {roi_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark downscaled vs full-resolution Haar face detection")
+    parser.add_argument('--video', help="video file to read frames from")
+    parser.add_argument('--camera', type=int, default=0, help="camera index (if no --video/--images)")
+    parser.add_argument('--images', help="directory of face images")
+    parser.add_argument('--frames', type=int, default=300, help="frames to benchmark")
+    parser.add_argument('--widths', default='480,320,240', help="comma-separated detection widths")
+    parser.add_argument('--upscale', help="resize frames first, e.g. 1280x720")
+    run(parser.parse_args())
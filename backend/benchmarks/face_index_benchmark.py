@@ -0,0 +1,101 @@
+"""
+Recall / latency benchmark of the face gallery index backends.
+
+Builds synthetic galleries shaped like the face model (N soldiers x ~12
+128-d encodings, same-soldier distances ~0.4, different soldiers ~1.4) and
+compares the centroid-prefilter and IVF backends against the exact
+brute-force index:
+
+    python -m benchmarks.face_index_benchmark
+    python -m benchmarks.face_index_benchmark --sizes 1000,10000 --nprobe 4,8,16
+
+recall@1 is the fraction of queries where a backend returns the same soldier
+as the exact index.
+"""
+import argparse
+import time
+import numpy as np
+from services.face_gallery_index import FaceGalleryIndex, CentroidPrefilterIndex
+from services.face_ann_index import IVFGalleryIndex
+
+
+def make_gallery(soldiers: int, per_soldier: int, rng):
+    """Synthetic gallery: one centre per soldier plus per-encoding noise"""
+    centres = rng.normal(0.0, 0.09, size=(soldiers, 128)).astype(np.float32)
+    encodings = np.repeat(centres, per_soldier, axis=0)
+    encodings += rng.normal(0.0, 0.025, size=encodings.shape).astype(np.float32)
+    force_ids = np.repeat(np.array([f"{100000000 + i:09d}" for i in range(soldiers)]), per_soldier)
+    return centres, encodings, force_ids
+
+
+def make_queries(centres: np.ndarray, count: int, rng):
+    targets = rng.integers(0, len(centres), size=count)
+    queries = centres[targets] + rng.normal(0.0, 0.025, size=(count, 128)).astype(np.float32)
+    return queries, targets
+
+
+def time_queries(index, queries, **kwargs):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(index.search(query, **kwargs))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def run(sizes, per_soldier, nprobes, query_count, seed):
+    rng = np.random.default_rng(seed)
+    print(f"{'soldiers':>9} {'encodings':>10} {'backend':>12} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'recall@1':>9} {'accuracy':>9}")
+
+    for soldiers in sizes:
+        centres, encodings, force_ids = make_gallery(soldiers, per_soldier, rng)
+        queries, targets = make_queries(centres, query_count, rng)
+        expected_ids = [f"{100000000 + t:09d}" for t in targets]
+
+        start = time.time()
+        exact = FaceGalleryIndex.build(encodings, force_ids)
+        exact_build = time.time() - start
+        exact_results, exact_latency = time_queries(exact, queries)
+        exact_ids = [r.force_id for r in exact_results]
+        accuracy = np.mean([a == b for a, b in zip(exact_ids, expected_ids)])
+        print(f"{soldiers:>9} {len(encodings):>10} {'exact':>12} {exact_build:>8.2f} "
+              f"{np.percentile(exact_latency, 50):>8.3f} {np.percentile(exact_latency, 95):>8.3f} "
+              f"{1.0:>9.3f} {accuracy:>9.3f}")
+
+        start = time.time()
+        prefilter = CentroidPrefilterIndex.build(encodings, force_ids)
+        prefilter_build = time.time() - start
+        prefilter_results, prefilter_latency = time_queries(prefilter, queries)
+        prefilter_ids = [r.force_id for r in prefilter_results]
+        recall = np.mean([a == b for a, b in zip(prefilter_ids, exact_ids)])
+        accuracy = np.mean([a == b for a, b in zip(prefilter_ids, expected_ids)])
+        print(f"{soldiers:>9} {len(encodings):>10} {'centroid':>12} {prefilter_build:>8.2f} "
+              f"{np.percentile(prefilter_latency, 50):>8.3f} {np.percentile(prefilter_latency, 95):>8.3f} "
+              f"{recall:>9.3f} {accuracy:>9.3f}")
+
+        start = time.time()
+        ivf = IVFGalleryIndex.build(encodings, force_ids, seed=seed)
+        ivf_build = time.time() - start
+        for nprobe in nprobes:
+            ivf_results, ivf_latency = time_queries(ivf, queries, nprobe=nprobe)
+            ivf_ids = [r.force_id if r else None for r in ivf_results]
+            recall = np.mean([a == b for a, b in zip(ivf_ids, exact_ids)])
+            accuracy = np.mean([a == b for a, b in zip(ivf_ids, expected_ids)])
+            print(f"{soldiers:>9} {len(encodings):>10} {f'ivf/{nprobe}':>12} {ivf_build:>8.2f} "
+                  f"{np.percentile(ivf_latency, 50):>8.3f} {np.percentile(ivf_latency, 95):>8.3f} "
+                  f"{recall:>9.3f} {accuracy:>9.3f}")
+
+        del exact, prefilter, ivf, encodings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark exact vs centroid-prefilter vs IVF face gallery index")
+    parser.add_argument('--sizes', default='1000,10000,100000', help="comma-separated soldier counts")
+    parser.add_argument('--per-soldier', type=int, default=12, help="encodings per soldier")
+    parser.add_argument('--nprobe', default='4,8,16', help="comma-separated nprobe values")
+    parser.add_argument('--queries', type=int, default=200, help="queries per configuration")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    run([int(s) for s in args.sizes.split(',')], args.per_soldier,
+        [int(n) for n in args.nprobe.split(',')], args.queries, args.seed)
@@ -21,6 +21,7 @@ class Settings:
     BACKEND_PORT = int(os.getenv('BACKEND_PORT', 5000))
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
     DEBUG_MODE = os.getenv('DEBUG_MODE', 'True').lower() == 'true'
+    SERVICE_WARMUP = os.getenv('SERVICE_WARMUP', 'True').lower() == 'true'  # construct ML/camera services after model preload
     
     # Security Configuration
     SESSION_TIMEOUT = int(os.getenv('SESSION_TIMEOUT', 900))  # 15 minutes in seconds
@@ -44,6 +45,49 @@ class Settings:
     CAMERA_HEIGHT = int(os.getenv('CAMERA_HEIGHT', 480))
     CAMERA_FPS = int(os.getenv('CAMERA_FPS', 10))
     DETECTION_INTERVAL = int(os.getenv('DETECTION_INTERVAL', 30))  # frames
+    FACE_DETECTION_WIDTH = int(os.getenv('FACE_DETECTION_WIDTH', 320))  # Haar detection level width in pixels, 0 = full frame
+    FACE_TRACK_IOU_THRESHOLD = float(os.getenv('FACE_TRACK_IOU_THRESHOLD', 0.3))  # detection continues a track above this
+    FACE_TRACK_REIDENTIFY_SECONDS = float(os.getenv('FACE_TRACK_REIDENTIFY_SECONDS', 10))  # re-run recognition on older tracks
+    FACE_TRACK_MAX_GAP_SECONDS = float(os.getenv('FACE_TRACK_MAX_GAP_SECONDS', 5))  # drop tracks not seen for this long
+    EMOTION_ENGINE = os.getenv('EMOTION_ENGINE', 'auto')  # numpy, keras, auto (numpy if model/emotion_model.npz exists)
+    EMOTION_BATCH_MAX_SIZE = int(os.getenv('EMOTION_BATCH_MAX_SIZE', 32))  # face crops per emotion forward pass
+    EMOTION_BATCH_MAX_WAIT_MS = float(os.getenv('EMOTION_BATCH_MAX_WAIT_MS', 5))  # latency budget for filling a batch
+    CCTV_INFERENCE_WORKERS = int(os.getenv('CCTV_INFERENCE_WORKERS', 1))  # threads running detection per camera
+    CCTV_FRAME_QUEUE_SIZE = int(os.getenv('CCTV_FRAME_QUEUE_SIZE', 1))  # frames waiting for inference (oldest dropped)
+    CCTV_FRAME_RING = os.getenv('CCTV_FRAME_RING', 'True').lower() == 'true'  # decode sampled frames into preallocated ring slots
+    CCTV_PREVIEW = os.getenv('CCTV_PREVIEW', 'none')  # none (headless), mjpeg (stream at /api/image/monitoring-preview), window
+    CCTV_PREVIEW_FPS = float(os.getenv('CCTV_PREVIEW_FPS', 5))  # max annotated preview frames per second
+    CCTV_PREVIEW_WIDTH = int(os.getenv('CCTV_PREVIEW_WIDTH', 640))  # preview frames are downscaled to this width, 0 = native
+    MOTION_GATE_ENABLED = os.getenv('MOTION_GATE_ENABLED', 'True').lower() == 'true'  # skip face detection on unchanged scenes
+    MOTION_GATE_WIDTH = int(os.getenv('MOTION_GATE_WIDTH', 80))  # width of the gray frame compared with the background
+    MOTION_GATE_PIXEL_THRESHOLD = int(os.getenv('MOTION_GATE_PIXEL_THRESHOLD', 25))  # gray-level change of a changed pixel
+    MOTION_GATE_MIN_AREA = float(os.getenv('MOTION_GATE_MIN_AREA', 0.01))  # share of changed pixels that counts as motion
+    MOTION_GATE_HOLD_SECONDS = float(os.getenv('MOTION_GATE_HOLD_SECONDS', 2))  # keep detecting this long after motion stops
+    MOTION_GATE_IDLE_REFRESH_SECONDS = float(os.getenv('MOTION_GATE_IDLE_REFRESH_SECONDS', 10))  # one detection per interval while idle, 0 = none
+    MOTION_GATE_SPEEDUP = int(os.getenv('MOTION_GATE_SPEEDUP', 2))  # detection interval divisor while there is motion
+    CCTV_CAMERAS = os.getenv('CCTV_CAMERAS', '')  # id=RTSP URL/file/index[@fps], comma-separated; empty = local webcam
+    CCTV_CAMERA_FPS = float(os.getenv('CCTV_CAMERA_FPS', 5))  # default per-camera target FPS
+    CCTV_FARM_WORKERS = int(os.getenv('CCTV_FARM_WORKERS', 0))  # inference processes, 0 = one per core (max one per camera)
+    CCTV_FARM_SLOTS_PER_CAMERA = int(os.getenv('CCTV_FARM_SLOTS_PER_CAMERA', 3))  # shared-memory frame ring slots per camera (min 2)
+    SURVEY_MAX_SESSIONS = int(os.getenv('SURVEY_MAX_SESSIONS', 4))  # concurrent kiosk surveys admitted per server
+    SURVEY_INFERENCE_WORKERS = int(os.getenv('SURVEY_INFERENCE_WORKERS', 2))  # frames analysed at once across all kiosks
+    SURVEY_ADMISSION_MAX_WAIT_MS = float(os.getenv('SURVEY_ADMISSION_MAX_WAIT_MS', 500))  # reject new surveys above this p95 inference wait, 0 = off
+    SURVEY_KIOSK_CAMERAS = os.getenv('SURVEY_KIOSK_CAMERAS', '')  # kiosk_id=camera index or URL, comma-separated
+    
+    # Face Gallery Index Configuration
+    FACE_INDEX_BACKEND = os.getenv('FACE_INDEX_BACKEND', 'auto')  # exact, centroid, ivf, auto
+    FACE_INDEX_CENTROID_MIN_ENCODINGS = int(os.getenv('FACE_INDEX_CENTROID_MIN_ENCODINGS', 5000))
+    FACE_INDEX_CENTROID_SHORTLIST = int(os.getenv('FACE_INDEX_CENTROID_SHORTLIST', 16))  # soldiers
+    FACE_INDEX_IVF_MIN_ENCODINGS = int(os.getenv('FACE_INDEX_IVF_MIN_ENCODINGS', 50000))
+    FACE_INDEX_IVF_NPROBE = int(os.getenv('FACE_INDEX_IVF_NPROBE', 8))
+    
+    # Face Model Segment Store
+    FACE_MODEL_MAX_SEGMENTS = int(os.getenv('FACE_MODEL_MAX_SEGMENTS', 8))  # compact above this many segments
+    FACE_MODEL_COMPACT_DEAD_RATIO = float(os.getenv('FACE_MODEL_COMPACT_DEAD_RATIO', 0.2))  # or this share of tombstoned rows
+    FACE_MODEL_COMPACTION_INTERVAL = int(os.getenv('FACE_MODEL_COMPACTION_INTERVAL', 60))  # seconds
+    FACE_MODEL_SEGMENT_GRACE_SECONDS = int(os.getenv('FACE_MODEL_SEGMENT_GRACE_SECONDS', 900))  # keep replaced segments
+    FACE_MODEL_WATCH_MODE = os.getenv('FACE_MODEL_WATCH_MODE', 'poll')  # poll, inotify, off (other processes' writes)
+    FACE_MODEL_WATCH_INTERVAL = float(os.getenv('FACE_MODEL_WATCH_INTERVAL', 1.0))  # seconds
     
     # Notification Configuration
     EMAIL_ENABLED = os.getenv('EMAIL_ENABLED', 'False').lower() == 'true'
@@ -55,6 +99,11 @@ class Settings:
     MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
     CACHE_TTL = int(os.getenv('CACHE_TTL', 300))  # 5 minutes
     
+    # System Settings Cache
+    # Version stamp shared by all workers; admin writes bump it to invalidate cached settings
+    SETTINGS_VERSION_FILE = os.getenv('SETTINGS_VERSION_FILE', str(backend_dir / 'storage' / 'settings.version'))
+    SETTINGS_VERSION_CHECK_INTERVAL = float(os.getenv('SETTINGS_VERSION_CHECK_INTERVAL', 1.0))  # seconds
+    
     # Survey Configuration
     MAX_SURVEY_TIME = int(os.getenv('MAX_SURVEY_TIME', 1800))  # 30 minutes
     AUTO_SAVE_INTERVAL = int(os.getenv('AUTO_SAVE_INTERVAL', 30))  # seconds
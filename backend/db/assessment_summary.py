@@ -0,0 +1,110 @@
+"""
+Maintenance of the soldier_latest_assessment summary table.
+
+The table holds one row per soldier with the scores of their most recent
+completed weekly session, so dashboards and reports read O(soldiers) rows
+instead of ranking the whole weekly_sessions history on every request.
+
+Writers call upsert_latest_assessment() in the same transaction that writes
+the session. Existing deployments are backfilled by migration 2
+(latest_assessment_backfill.sql, run by db/init_db.py);
+rebuild_latest_assessments() recomputes the table from scratch:
+
+    python -m db.assessment_summary
+"""
+import logging
+import time
+
+# Copies the session into the summary unless the soldier already has a newer
+# completed session. completion_timestamp is assigned last because MySQL
+# evaluates ON DUPLICATE KEY UPDATE assignments left to right.
+_UPSERT_SQL = """
+    INSERT INTO soldier_latest_assessment
+        (force_id, session_id, questionnaire_id, completion_timestamp,
+         nlp_avg_score, image_avg_score, combined_avg_score, mental_state_score)
+    SELECT force_id, session_id, questionnaire_id, completion_timestamp,
+           nlp_avg_score, image_avg_score, combined_avg_score, mental_state_score
+    FROM weekly_sessions
+    WHERE session_id = %s AND completion_timestamp IS NOT NULL
+    ON DUPLICATE KEY UPDATE
+        questionnaire_id = IF(VALUES(session_id) = session_id OR VALUES(completion_timestamp) >= completion_timestamp,
+                              VALUES(questionnaire_id), questionnaire_id),
+        nlp_avg_score = IF(VALUES(session_id) = session_id OR VALUES(completion_timestamp) >= completion_timestamp,
+                           VALUES(nlp_avg_score), nlp_avg_score),
+        image_avg_score = IF(VALUES(session_id) = session_id OR VALUES(completion_timestamp) >= completion_timestamp,
+                             VALUES(image_avg_score), image_avg_score),
+        combined_avg_score = IF(VALUES(session_id) = session_id OR VALUES(completion_timestamp) >= completion_timestamp,
+                                VALUES(combined_avg_score), combined_avg_score),
+        mental_state_score = IF(VALUES(session_id) = session_id OR VALUES(completion_timestamp) >= completion_timestamp,
+                                VALUES(mental_state_score), mental_state_score),
+        session_id = IF(VALUES(session_id) = session_id OR VALUES(completion_timestamp) >= completion_timestamp,
+                        VALUES(session_id), session_id),
+        completion_timestamp = IF(VALUES(session_id) = session_id OR VALUES(completion_timestamp) >= completion_timestamp,
+                                  VALUES(completion_timestamp), completion_timestamp)
+"""
+
+_REBUILD_SQL = """
+    INSERT INTO soldier_latest_assessment
+        (force_id, session_id, questionnaire_id, completion_timestamp,
+         nlp_avg_score, image_avg_score, combined_avg_score, mental_state_score)
+    SELECT force_id, session_id, questionnaire_id, completion_timestamp,
+           nlp_avg_score, image_avg_score, combined_avg_score, mental_state_score
+    FROM (
+        SELECT ws.*,
+               ROW_NUMBER() OVER (PARTITION BY ws.force_id
+                                  ORDER BY ws.completion_timestamp DESC, ws.session_id DESC) AS rn
+        FROM weekly_sessions ws
+        WHERE ws.completion_timestamp IS NOT NULL
+    ) ranked
+    WHERE rn = 1
+"""
+
+
+def upsert_latest_assessment(cursor, session_id: int):
+    """
+    Refresh the summary row for the soldier owning session_id.
+
+    Args:
+        cursor: Cursor on the connection/transaction that wrote the session
+        session_id: Weekly session that was created or re-scored
+    """
+    cursor.execute(_UPSERT_SQL, (session_id,))
+
+
+def rebuild_latest_assessments(conn) -> int:
+    """
+    Recompute the whole summary table from weekly_sessions in one transaction.
+
+    Args:
+        conn: Database connection (committed on success, rolled back on error)
+
+    Returns:
+        int: Number of soldiers with a latest assessment
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM soldier_latest_assessment")
+        cursor.execute(_REBUILD_SQL)
+        rows = cursor.rowcount
+        conn.commit()
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    from db.connection import get_connection
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    start = time.time()
+    conn = get_connection()
+    try:
+        count = rebuild_latest_assessments(conn)
+        print(f"✅ Rebuilt soldier_latest_assessment: {count} soldiers in {time.time() - start:.2f}s")
+    except Exception as e:
+        print("❌ Error rebuilding soldier_latest_assessment:", e)
+    finally:
+        conn.close()
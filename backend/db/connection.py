@@ -1,7 +1,9 @@
 import os
+import threading
 import mysql.connector
 from dotenv import load_dotenv
 from pathlib import Path
+from db.pool import ConnectionPool
 
 # Load environment variables
 backend_dir = Path(__file__).resolve().parent.parent
@@ -15,32 +17,64 @@ DB_PASSWORD = os.getenv('DB_PASSWORD')
 DB_HOST = os.getenv('DB_HOST')
 DB_PORT = int(os.getenv('DB_PORT', 3306))
 
+# Connection pool parameters
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))  # seconds to wait when exhausted
+DB_POOL_RECYCLE = float(os.getenv('DB_POOL_RECYCLE', 1800))  # recycle connections idle this long
+DB_POOL_HEALTH_CHECK_IDLE = float(os.getenv('DB_POOL_HEALTH_CHECK_IDLE', 5))  # ping if idle this long
+
+_pool = None
+_pool_lock = threading.Lock()
+
 print(f"Loading environment from: {env_path}")
 print(f"Connecting to database: {DB_NAME} on {DB_HOST}:{DB_PORT} as {DB_USER}")
 
+def get_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    connect_args={
+                        'host': DB_HOST,
+                        'port': DB_PORT,
+                        'user': DB_USER,
+                        'password': DB_PASSWORD,
+                        'database': DB_NAME
+                    },
+                    pool_size=DB_POOL_SIZE,
+                    wait_timeout=DB_POOL_TIMEOUT,
+                    recycle_seconds=DB_POOL_RECYCLE,
+                    health_check_idle=DB_POOL_HEALTH_CHECK_IDLE
+                )
+    return _pool
+
 def get_connection():
     """
-    Returns a new MySQL connection.
+    Returns a pooled MySQL connection.
+
+    Calling close() on the returned connection hands it back to the pool.
     """
     try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME
-        )
-        return connection
+        return get_pool().get_connection()
     except mysql.connector.Error as e:
         print("❌ Error getting MySQL connection:", e)
         raise e
 
 def release_connection(conn):
     """
-    Close the MySQL connection.
+    Return the MySQL connection to the pool.
+    """
+    conn.close()
+
+def get_pool_stats():
+    """
+    Returns connection pool statistics (checkouts, waits, created/recycled counts).
     """
-    if conn.is_connected():
-        conn.close()
+    return get_pool().get_stats()
 
 def execute_query(query, params=None, fetch=True):
     """
@@ -55,6 +89,7 @@ def execute_query(query, params=None, fetch=True):
         list or None
     """
     conn = None
+    cursor = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -0,0 +1,196 @@
+"""
+EXPLAIN-based regression check for the hot queries.
+
+Runs EXPLAIN on each query the API issues per request/soldier and fails if
+MySQL plans a full table scan (type ALL) on a table that should be reached
+through an index. Point it at a local database that has the schema and
+migrations applied (python db/init_db.py):
+
+    python -m db.explain_check            # check against existing data
+    python -m db.explain_check --seed     # seed an empty database first
+
+Exits with status 1 when any query regresses to a full scan.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from db.connection import get_connection
+from db.queries import (DAILY_SCORE_FOR_SOLDIER_DAY, DASHBOARD_LATEST_SCORES, MONITORING_RUN_SOLDIERS,
+                        SESSION_NLP_SCORES, SOLDIER_DAY_DETECTIONS, SOLDIERS_REPORT_COUNT, SOLDIERS_REPORT_CTE,
+                        SOLDIERS_REPORT_PAGE)
+
+# Risk thresholds only affect the CASE expressions, not the plan
+_REPORT_PARAMS = (7, 0.8, 0.6, 0.4, 7)
+_REPORT_CTE = SOLDIERS_REPORT_CTE.format(force_id_condition="")
+
+# (name, sql, params, tables allowed to be scanned in full)
+# The SQL is the statement the API issues (db/queries.py); params maps the
+# sample values from _sample_params() to its placeholders
+HOT_QUERIES = [
+    ('session_responses', SESSION_NLP_SCORES, lambda p: (p['session_id'],), set()),
+    ('cctv_detections_soldier_day', SOLDIER_DAY_DETECTIONS, lambda p: (p['force_id'], p['day'], p['day']), set()),
+    ('cctv_detections_monitoring_run', MONITORING_RUN_SOLDIERS, lambda p: (p['monitoring_id'],), set()),
+    ('daily_scores_soldier_day', DAILY_SCORE_FOR_SOLDIER_DAY, lambda p: (p['force_id'], p['day']), set()),
+    # Roster-wide reports read every soldier by design; only users may be scanned
+    ('dashboard_latest_scores', DASHBOARD_LATEST_SCORES, lambda p: (), {'users'}),
+    ('soldiers_report_count', SOLDIERS_REPORT_COUNT.format(report_cte=_REPORT_CTE, where_clause=""),
+     lambda p: _REPORT_PARAMS, {'users'}),
+    ('soldiers_report_page', SOLDIERS_REPORT_PAGE.format(report_cte=_REPORT_CTE, page_where="WHERE force_id > %s"),
+     lambda p: _REPORT_PARAMS + (p['force_id'], 20, 0), {'users'}),
+]
+
+SEED_TABLES = ['users', 'questionnaires', 'weekly_sessions', 'question_responses',
+               'cctv_daily_monitoring', 'cctv_detections', 'daily_depression_scores']
+
+
+def seed(conn, soldiers=500, days=180):
+    """Fill an empty database with synthetic rows so the optimizer sees realistic cardinalities"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM users")
+        if cursor.fetchone()[0]:
+            raise RuntimeError("Refusing to seed: users table is not empty (use a scratch database)")
+
+        rng = random.Random(42)
+        now = datetime.now()
+        force_ids = [f"{900000000 + i:09d}" for i in range(soldiers)]
+
+        cursor.executemany(
+            "INSERT INTO users (force_id, password_hash, user_type) VALUES (%s, 'seed', 'soldier')",
+            [(f,) for f in force_ids]
+        )
+        cursor.execute(
+            "INSERT INTO questionnaires (title, description, status, total_questions) "
+            "VALUES ('Seed Questionnaire', 'EXPLAIN check', 'Active', 5)"
+        )
+        questionnaire_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO questions (questionnaire_id, question_text, question_text_hindi) VALUES (%s, %s, %s)",
+            [(questionnaire_id, f"Question {i}", f"Question {i}") for i in range(5)]
+        )
+        cursor.execute("SELECT question_id FROM questions WHERE questionnaire_id = %s", (questionnaire_id,))
+        question_ids = [row[0] for row in cursor.fetchall()]
+
+        sessions = []
+        for force_id in force_ids:
+            for week in range(days // 7):
+                completed = now - timedelta(days=week * 7 + rng.random() * 7)
+                score = rng.random()
+                sessions.append((force_id, questionnaire_id, completed.year, completed, completed,
+                                 score, rng.random(), score))
+        cursor.executemany("""
+            INSERT INTO weekly_sessions
+            (force_id, questionnaire_id, year, start_timestamp, completion_timestamp, status,
+             nlp_avg_score, image_avg_score, combined_avg_score)
+            VALUES (%s, %s, %s, %s, %s, 'completed', %s, %s, %s)
+        """, sessions)
+
+        cursor.execute("SELECT session_id FROM weekly_sessions")
+        cursor.executemany("""
+            INSERT INTO question_responses
+            (session_id, question_id, answer_text, nlp_depression_score, image_depression_score, combined_depression_score)
+            VALUES (%s, %s, 'seed', %s, %s, %s)
+        """, [(row[0], q, rng.random(), rng.random(), rng.random())
+              for row in cursor.fetchall() for q in question_ids])
+
+        for day in range(days):
+            date = (now - timedelta(days=day)).date()
+            cursor.execute(
+                "INSERT INTO cctv_daily_monitoring (date, start_time, status) VALUES (%s, '09:00:00', 'completed')",
+                (date,)
+            )
+            monitoring_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO cctv_detections (monitoring_id, force_id, detection_timestamp, depression_score)
+                VALUES (%s, %s, %s, %s)
+            """, [(monitoring_id, f, datetime.combine(date, datetime.min.time()) + timedelta(hours=9 + i),
+                   rng.random()) for f in rng.sample(force_ids, min(50, soldiers)) for i in range(3)])
+            cursor.executemany("""
+                INSERT INTO daily_depression_scores (force_id, date, avg_depression_score, detection_count)
+                VALUES (%s, %s, %s, 3)
+            """, [(f, date, rng.random()) for f in force_ids[:100]])
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    from db.assessment_summary import rebuild_latest_assessments
+    rebuild_latest_assessments(conn)
+
+
+def _sample_params(cursor):
+    cursor.execute("SELECT force_id FROM cctv_detections WHERE force_id IS NOT NULL LIMIT 1")
+    row = cursor.fetchone()
+    if not row:
+        cursor.execute("SELECT force_id FROM users WHERE user_type = 'soldier' LIMIT 1")
+        row = cursor.fetchone()
+    force_id = row[0] if row else '000000000'
+
+    cursor.execute("SELECT MAX(session_id) FROM weekly_sessions")
+    session_id = cursor.fetchone()[0] or 0
+    cursor.execute("SELECT MAX(monitoring_id) FROM cctv_daily_monitoring")
+    monitoring_id = cursor.fetchone()[0] or 0
+
+    return {
+        'force_id': force_id,
+        'session_id': session_id,
+        'monitoring_id': monitoring_id,
+        'day': datetime.now().date()
+    }
+
+
+def check_queries(conn):
+    """
+    EXPLAIN every hot query and collect full-scan regressions.
+
+    Returns:
+        list: (query_name, table, rows_examined) for each disallowed full scan
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"ANALYZE TABLE {', '.join(SEED_TABLES + ['soldier_latest_assessment'])}")
+        cursor.fetchall()
+
+        sample = _sample_params(cursor)
+        failures = []
+        for name, sql, params, allowed_scans in HOT_QUERIES:
+            cursor.execute(f"EXPLAIN {sql}", params(sample))
+            plan = cursor.fetchall()
+            for step in plan:
+                table = step.get('table') or ''
+                if step.get('type') == 'ALL' and not table.startswith('<') and table not in allowed_scans:
+                    failures.append((name, table, step.get('rows')))
+            access = ', '.join(f"{step.get('table')}:{step.get('type')}/{step.get('key') or '-'}" for step in plan)
+            print(f"{'❌' if any(f[0] == name for f in failures) else '✅'} {name}: {access}")
+        return failures
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if a hot query plans a full table scan")
+    parser.add_argument('--seed', action='store_true', help="seed an empty database with synthetic data first")
+    parser.add_argument('--soldiers', type=int, default=500, help="number of soldiers to seed")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        if args.seed:
+            start = time.time()
+            seed(conn, soldiers=args.soldiers)
+            print(f"Seeded {args.soldiers} soldiers in {time.time() - start:.1f}s")
+        failures = check_queries(conn)
+    finally:
+        conn.close()
+
+    if failures:
+        print(f"\n{len(failures)} full table scan(s) on hot queries:")
+        for name, table, rows in failures:
+            print(f"   {name}: {table} (~{rows} rows)")
+        sys.exit(1)
+    print("\nAll hot queries use indexes.")
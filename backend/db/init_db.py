@@ -2,7 +2,20 @@ import mysql.connector
 from mysql.connector import Error
 from pathlib import Path
 from dotenv import load_dotenv
+import hashlib
 import os
+import re
+
+# Versioned migrations applied after schema.sql, in order. Append new entries;
+# never edit or renumber an applied one (its checksum is recorded).
+MIGRATIONS = [
+    (1, 'performance_indexes', 'performance_indexes.sql'),
+    (2, 'latest_assessment_backfill', 'latest_assessment_backfill.sql'),
+]
+
+CREATE_INDEX_PATTERN = re.compile(
+    r'^CREATE\s+(?:UNIQUE\s+)?INDEX\s+`?(\w+)`?\s+ON\s+`?(\w+)`?', re.IGNORECASE
+)
 
 def load_env():
     env_path = Path(__file__).resolve().parent.parent / '.env'
@@ -37,13 +50,9 @@ def init_db():
 
     try:
         cursor = conn.cursor()
-        with open(schema_path, 'r', encoding='utf-8') as f:
-            sql_commands = f.read().split(';')
-
-        for command in sql_commands:
-            cmd = command.strip()
-            if cmd:
-                cursor.execute(cmd)
+        # Comments are dropped before splitting, so a ';' inside one cannot leave an empty statement
+        for cmd in read_sql_statements(schema_path):
+            cursor.execute(cmd)
 
         conn.commit()
         print("✅ Database schema initialized successfully.")
@@ -53,6 +62,78 @@ def init_db():
         cursor.close()
         conn.close()
 
+def read_sql_statements(path):
+    """Split a .sql file into statements, dropping comment-only lines"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [line for line in f if not line.strip().startswith('--')]
+    return [cmd.strip() for cmd in ''.join(lines).split(';') if cmd.strip()]
+
+def index_exists(cursor, table_name, index_name):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table_name, index_name))
+    return cursor.fetchone()[0] > 0
+
+def apply_statement(cursor, cmd):
+    """Execute one migration statement, skipping indexes that already exist"""
+    match = CREATE_INDEX_PATTERN.match(cmd)
+    if match and index_exists(cursor, match.group(2), match.group(1)):
+        print(f"   ↷ {match.group(1)} already exists on {match.group(2)}")
+        return
+    cursor.execute(cmd)
+    if match:
+        print(f"   + {match.group(1)} on {match.group(2)}")
+
+def apply_migrations():
+    """Apply pending versioned migrations and record them in schema_migrations"""
+    conn = get_connection()
+    if not conn:
+        return
+
+    migrations_dir = Path(__file__).resolve().parent
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                checksum CHAR(64) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("SELECT version, checksum FROM schema_migrations")
+        applied = dict(cursor.fetchall())
+
+        for version, name, filename in MIGRATIONS:
+            path = migrations_dir / filename
+            checksum = hashlib.sha256(path.read_bytes()).hexdigest()
+
+            if version in applied:
+                if applied[version] != checksum:
+                    print(f"⚠️ Migration {version} ({name}) changed since it was applied; add a new migration instead")
+                continue
+
+            print(f"Applying migration {version}: {name}")
+            # MySQL DDL commits implicitly, so each statement is made idempotent
+            # and a partially applied migration can simply be re-run
+            for cmd in read_sql_statements(path):
+                apply_statement(cursor, cmd)
+
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (version, name, checksum)
+            )
+            conn.commit()
+            print(f"✅ Migration {version} ({name}) applied.")
+    except Error as e:
+        conn.rollback()
+        print("❌ Error applying migrations:", e)
+    finally:
+        cursor.close()
+        conn.close()
+
 if __name__ == "__main__":
     load_env()
     init_db()
+    apply_migrations()
@@ -0,0 +1,20 @@
+-- Latest Assessment Backfill (migration 2)
+-- Fills soldier_latest_assessment (created empty by schema.sql) from the
+-- existing weekly_sessions, so reports and the dashboard do not show every
+-- soldier as "No Survey" on an upgraded deployment. INSERT IGNORE keeps rows
+-- already maintained by the write path, so the migration can be re-run.
+-- Applied by `python db/init_db.py`; see MIGRATIONS in init_db.py.
+
+INSERT IGNORE INTO soldier_latest_assessment
+    (force_id, session_id, questionnaire_id, completion_timestamp,
+     nlp_avg_score, image_avg_score, combined_avg_score, mental_state_score)
+SELECT force_id, session_id, questionnaire_id, completion_timestamp,
+       nlp_avg_score, image_avg_score, combined_avg_score, mental_state_score
+FROM (
+    SELECT ws.*,
+           ROW_NUMBER() OVER (PARTITION BY ws.force_id
+                              ORDER BY ws.completion_timestamp DESC, ws.session_id DESC) AS rn
+    FROM weekly_sessions ws
+    WHERE ws.completion_timestamp IS NOT NULL
+) ranked
+WHERE rn = 1;
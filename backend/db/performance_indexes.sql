@@ -0,0 +1,17 @@
+-- Performance Indexes (migration 1)
+-- Secondary indexes for the columns the hot queries filter, join and sort on.
+-- Applied idempotently by `python db/init_db.py`; see MIGRATIONS in init_db.py.
+
+-- Latest session per soldier, per-soldier history and date-window reports
+CREATE INDEX idx_weekly_sessions_force_completion ON weekly_sessions (force_id, completion_timestamp);
+CREATE INDEX idx_weekly_sessions_completion ON weekly_sessions (completion_timestamp);
+
+-- Responses of a session (emotion score updates, re-scoring, deletes)
+CREATE INDEX idx_question_responses_session ON question_responses (session_id);
+
+-- CCTV detections per soldier per day, and per monitoring run
+CREATE INDEX idx_cctv_detections_force_timestamp ON cctv_detections (force_id, detection_timestamp);
+CREATE INDEX idx_cctv_detections_monitoring ON cctv_detections (monitoring_id);
+
+-- Daily aggregate lookups per soldier
+CREATE INDEX idx_daily_depression_scores_force_date ON daily_depression_scores (force_id, date);
@@ -0,0 +1,249 @@
+"""
+Bounded MySQL connection pool used behind db.connection.get_connection
+"""
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+
+import mysql.connector
+from mysql.connector import errors
+
+
+class PoolTimeoutError(errors.PoolError):
+    """Raised when no pooled connection becomes free within the wait timeout"""
+
+
+class PooledConnection:
+    """
+    Proxy handed out by the pool. Behaves like a mysql.connector connection,
+    except that close() returns the underlying connection to the pool.
+
+    A proxy that is garbage-collected without close() gives its pool slot
+    back (and is logged), so a leak cannot exhaust the bounded pool.
+    """
+
+    def __init__(self, pool, raw_connection):
+        self._pool = pool
+        self._raw = raw_connection
+        self._released = False
+        self._finalizer = weakref.finalize(self, pool._reclaim_leaked, threading.current_thread().name)
+        self._finalizer.atexit = False
+
+    def __getattr__(self, name):
+        if self.__dict__.get('_released', True):
+            raise errors.OperationalError("Connection has already been returned to the pool")
+        return getattr(self._raw, name)
+
+    def is_connected(self):
+        if self._released:
+            return False
+        return self._raw.is_connected()
+
+    def close(self):
+        """Return the connection to the pool (safe to call more than once)"""
+        if self._released:
+            return
+        self._released = True
+        self._finalizer.detach()
+        raw, self._raw = self._raw, None
+        self._pool._return(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe bounded pool of MySQL connections.
+
+    - pool_size: maximum number of open connections (idle + checked out)
+    - wait_timeout: seconds a checkout waits for a free connection before failing
+    - recycle_seconds: idle connections older than this are closed and replaced
+    - health_check_idle: connections idle longer than this are pinged on checkout
+    """
+
+    def __init__(self, connect_args: dict, pool_size: int = 10, wait_timeout: float = 10.0,
+                 recycle_seconds: float = 1800.0, health_check_idle: float = 5.0):
+        self.connect_args = dict(connect_args)
+        self.pool_size = max(1, int(pool_size))
+        self.wait_timeout = float(wait_timeout)
+        self.recycle_seconds = float(recycle_seconds)
+        self.health_check_idle = float(health_check_idle)
+
+        # Reentrant: a leaked connection can be reclaimed by a garbage collection that
+        # runs while this thread already holds the lock
+        self._cond = threading.Condition(threading.RLock())
+        self._idle = deque()  # (raw_connection, last_returned_monotonic)
+        self._size = 0
+        self._in_use = 0
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'health_check_failures': 0,
+            'discarded': 0,
+            'leaked': 0,
+            'peak_in_use': 0
+        }
+
+    def _create(self):
+        raw = mysql.connector.connect(**self.connect_args)
+        with self._cond:
+            self._stats['created'] += 1
+        return raw
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _validate(self, raw, last_returned: float):
+        """Recycle stale connections and ping idle ones before handing them out"""
+        idle_for = time.monotonic() - last_returned
+
+        if self.recycle_seconds > 0 and idle_for > self.recycle_seconds:
+            self._discard(raw)
+            with self._cond:
+                self._stats['recycled'] += 1
+            return self._create()
+
+        if idle_for > self.health_check_idle:
+            try:
+                raw.ping(reconnect=False)
+            except Exception as e:
+                logging.warning(f"Pooled connection failed health check, replacing it: {e}")
+                self._discard(raw)
+                with self._cond:
+                    self._stats['health_check_failures'] += 1
+                    self._stats['recycled'] += 1
+                return self._create()
+
+        return raw
+
+    def get_connection(self) -> PooledConnection:
+        """Check out a connection, waiting up to wait_timeout if the pool is exhausted"""
+        start = time.monotonic()
+        deadline = start + self.wait_timeout
+        waited = False
+        raw = None
+        last_returned = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, last_returned = self._idle.pop()
+                    break
+                if self._size < self.pool_size:
+                    # Reserve a slot; the connection itself is opened outside the lock
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available within {self.wait_timeout:.1f}s "
+                        f"(pool size {self.pool_size})"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            wait_time = time.monotonic() - start
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time_total'] += wait_time
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+
+        try:
+            if raw is None:
+                raw = self._create()
+            else:
+                raw = self._validate(raw, last_returned)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._in_use += 1
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._in_use)
+
+        return PooledConnection(self, raw)
+
+    def _return(self, raw):
+        """Take a connection back; roll back any open transaction so the next borrower starts clean"""
+        healthy = True
+        try:
+            if raw.is_connected():
+                raw.rollback()
+            else:
+                healthy = False
+        except Exception as e:
+            logging.warning(f"Discarding pooled connection that failed to reset: {e}")
+            healthy = False
+
+        if not healthy:
+            self._discard(raw)
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((raw, time.monotonic()))
+            else:
+                self._size -= 1
+                self._stats['discarded'] += 1
+            self._cond.notify()
+
+    def _reclaim_leaked(self, owner: str):
+        """
+        Free the slot of a connection that was dropped without close()
+
+        The raw connection is not reused (a cursor may still hold it); it is
+        closed when it is garbage-collected itself.
+        """
+        logging.warning(f"Pooled connection checked out by thread {owner} was garbage-collected "
+                        f"without close(); releasing its pool slot")
+        with self._cond:
+            self._in_use -= 1
+            self._size -= 1
+            self._stats['leaked'] += 1
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (checked-out connections are closed on return)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def get_stats(self) -> dict:
+        """Snapshot of pool usage counters for sizing under load"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'pool_size': self.pool_size,
+                'open_connections': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'wait_timeout': self.wait_timeout,
+                'recycle_seconds': self.recycle_seconds,
+                'health_check_idle': self.health_check_idle
+            })
+        stats['avg_wait_time'] = (stats['wait_time_total'] / stats['waits']) if stats['waits'] else 0.0
+        stats['wait_time_total'] = round(stats['wait_time_total'], 4)
+        stats['wait_time_max'] = round(stats['wait_time_max'], 4)
+        stats['avg_wait_time'] = round(stats['avg_wait_time'], 4)
+        return stats
@@ -0,0 +1,96 @@
+"""
+SQL of the hot queries, shared by the code that runs them and the EXPLAIN
+regression check (db/explain_check.py), so the check always plans the
+statements the API actually issues.
+"""
+
+# Soldiers report: each soldier's latest session comes from the
+# soldier_latest_assessment summary (it is in the window only if it is recent
+# enough), joined with the per-soldier CCTV aggregate for the same window.
+# Params: days, CRITICAL, HIGH and MEDIUM thresholds, days (+ the force_id filter)
+SOLDIERS_REPORT_CTE = """
+    WITH cctv AS (
+        SELECT ws.force_id,
+               COUNT(*) AS total_detections,
+               AVG(ws.image_avg_score) AS avg_score
+        FROM weekly_sessions ws
+        WHERE ws.completion_timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)
+        AND ws.image_avg_score > 0
+        GROUP BY ws.force_id
+    ),
+    report AS (
+        SELECT u.force_id,
+               w.session_id AS latest_session_id,
+               COALESCE(w.combined_avg_score, 0) AS combined_score,
+               COALESCE(w.nlp_avg_score, 0) AS nlp_score,
+               COALESCE(w.image_avg_score, 0) AS image_score,
+               w.completion_timestamp AS last_survey_date,
+               w.mental_state_score,
+               CASE WHEN w.session_id IS NULL THEN 'No Survey' ELSE q.title END AS questionnaire_title,
+               COALESCE(c.total_detections, 0) AS total_cctv_detections,
+               COALESCE(c.avg_score, 0) AS avg_cctv_score,
+               CASE
+                   WHEN COALESCE(w.combined_avg_score, 0) >= %s THEN 'CRITICAL'
+                   WHEN COALESCE(w.combined_avg_score, 0) >= %s THEN 'HIGH'
+                   WHEN COALESCE(w.combined_avg_score, 0) >= %s THEN 'MID'
+                   ELSE 'LOW'
+               END AS risk_level
+        FROM users u
+        LEFT JOIN soldier_latest_assessment w ON w.force_id = u.force_id
+            AND w.completion_timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)
+        LEFT JOIN questionnaires q ON q.questionnaire_id = w.questionnaire_id
+        LEFT JOIN cctv c ON c.force_id = u.force_id
+        WHERE u.user_type = 'soldier'
+        {force_id_condition}
+    )
+"""
+
+SOLDIERS_REPORT_COUNT = "{report_cte} SELECT COUNT(*) AS total_count FROM report {where_clause}"
+
+# Ordered by force_id so both OFFSET and keyset paging are stable. Params: limit, offset
+SOLDIERS_REPORT_PAGE = """
+    {report_cte}
+    SELECT * FROM report
+    {page_where}
+    ORDER BY force_id
+    LIMIT %s OFFSET %s
+"""
+
+DASHBOARD_LATEST_SCORES = """
+    SELECT u.force_id,
+           COALESCE(ws.combined_avg_score, 0) as latest_score,
+           ws.completion_timestamp
+    FROM users u
+    LEFT JOIN soldier_latest_assessment ws ON u.force_id = ws.force_id
+    WHERE u.user_type = 'soldier'
+"""
+
+# Params: session_id
+SESSION_NLP_SCORES = """
+    SELECT nlp_depression_score
+    FROM question_responses
+    WHERE session_id = %s AND nlp_depression_score IS NOT NULL
+"""
+
+# Params: monitoring_id
+MONITORING_RUN_SOLDIERS = """
+    SELECT DISTINCT force_id
+    FROM cctv_detections
+    WHERE monitoring_id = %s
+"""
+
+# Params: force_id, day, day
+SOLDIER_DAY_DETECTIONS = """
+    SELECT AVG(depression_score), COUNT(*)
+    FROM cctv_detections
+    WHERE force_id = %s
+    AND detection_timestamp >= %s
+    AND detection_timestamp < %s + INTERVAL 1 DAY
+"""
+
+# Params: force_id, day
+DAILY_SCORE_FOR_SOLDIER_DAY = """
+    SELECT score_id FROM daily_depression_scores
+    WHERE force_id = %s AND date = %s
+    LIMIT 1
+"""
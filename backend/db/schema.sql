@@ -45,6 +45,23 @@ CREATE TABLE IF NOT EXISTS weekly_sessions (
     FOREIGN KEY (questionnaire_id) REFERENCES questionnaires(questionnaire_id) ON DELETE SET NULL
 );
 
+-- Soldier Latest Assessment Table (one row per soldier, maintained on write,
+-- backfilled from weekly_sessions by migration 2, rebuild with `python -m db.assessment_summary`)
+CREATE TABLE IF NOT EXISTS soldier_latest_assessment (
+    force_id CHAR(9) PRIMARY KEY,
+    session_id INT NOT NULL,
+    questionnaire_id INT,
+    completion_timestamp TIMESTAMP NOT NULL,
+    nlp_avg_score FLOAT,
+    image_avg_score FLOAT,
+    combined_avg_score FLOAT,
+    mental_state_score FLOAT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (force_id) REFERENCES users(force_id) ON DELETE CASCADE,
+    FOREIGN KEY (session_id) REFERENCES weekly_sessions(session_id) ON DELETE CASCADE,
+    INDEX idx_latest_assessment_completion (completion_timestamp)
+);
+
 -- Question Responses Table
 CREATE TABLE IF NOT EXISTS question_responses (
     response_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -0,0 +1,156 @@
+"""
+Request-scoped database unit of work.
+
+Every helper used while serving one HTTP request shares a single pooled
+connection. The work is committed once after the response is built (or
+rolled back on an error status / unhandled exception).
+"""
+import logging
+from contextlib import contextmanager
+from flask import g, has_request_context
+from db.connection import get_connection
+
+
+class DBSession:
+    """One connection and transaction for the lifetime of a request"""
+
+    def __init__(self):
+        self._conn = None
+        self._cursors = []
+        self._rollback_only = False
+
+    @property
+    def connection(self):
+        """Pooled connection, checked out on first use"""
+        if self._conn is None:
+            self._conn = get_connection()
+        return self._conn
+
+    def cursor(self, *args, **kwargs):
+        """
+        Return a cursor on the request connection.
+
+        Cursors are buffered by default so helpers that fetch a single row
+        never leave unread results behind on the shared connection.
+        """
+        kwargs.setdefault('buffered', True)
+        cursor = self.connection.cursor(*args, **kwargs)
+        self._cursors.append(cursor)
+        return cursor
+
+    def handle(self):
+        """Connection-like view for helpers written against get_connection()"""
+        return _SessionConnection(self)
+
+    def rollback(self):
+        """Discard all work done so far; the request will not commit"""
+        self._rollback_only = True
+        if self._conn is not None:
+            self._conn.rollback()
+
+    def finish(self, commit: bool):
+        """Commit or roll back once, then return the connection to the pool"""
+        for cursor in self._cursors:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._cursors = []
+
+        if self._conn is None:
+            return
+
+        try:
+            if commit and not self._rollback_only:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        except Exception:
+            try:
+                self._conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            self._conn.close()
+            self._conn = None
+
+
+class _SessionConnection:
+    """Connection view whose commit/close are deferred to the end of the request"""
+
+    def __init__(self, session: DBSession):
+        self._session = session
+
+    def cursor(self, *args, **kwargs):
+        return self._session.cursor(*args, **kwargs)
+
+    def commit(self):
+        # Committed once by the request teardown
+        pass
+
+    def rollback(self):
+        self._session.rollback()
+
+    def close(self):
+        # Returned to the pool by the request teardown
+        pass
+
+    def is_connected(self):
+        return self._session.connection.is_connected()
+
+    def __getattr__(self, name):
+        return getattr(self._session.connection, name)
+
+
+def get_db_session():
+    """Return the unit of work for the current request, or None outside a request"""
+    if not has_request_context():
+        return None
+    if 'db_session' not in g:
+        g.db_session = DBSession()
+    return g.db_session
+
+
+@contextmanager
+def db_connection():
+    """
+    Yield a connection for a helper function.
+
+    Inside a request this is the shared request connection (commit and close
+    happen at teardown). Outside a request, e.g. in background threads, a
+    pooled connection is checked out, committed on success and returned.
+    """
+    session = get_db_session()
+    if session is not None:
+        yield session.handle()
+        return
+
+    conn = get_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    """Register commit/rollback hooks for the request unit of work"""
+
+    @app.after_request
+    def _commit_db_session(response):
+        session = g.pop('db_session', None)
+        if session is not None:
+            session.finish(commit=response.status_code < 400)
+        return response
+
+    @app.teardown_request
+    def _cleanup_db_session(error=None):
+        session = g.pop('db_session', None)
+        if session is not None:
+            if error is not None:
+                logging.error(f"Rolling back request transaction after error: {error}")
+            session.finish(commit=False)
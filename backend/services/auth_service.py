@@ -1,5 +1,6 @@
 import bcrypt
 from db.connection import get_connection
+from db.session import db_connection
 from utils.hash import check_password
 from typing import Optional, Dict
 
@@ -16,44 +17,36 @@ class AuthService:
             dict: User information if credentials are valid
             None: If credentials are invalid
         """
-        conn = None
-        cursor = None
-        try:
-            conn = get_connection()
+        # Shares the request connection when called from a route handler
+        with db_connection() as conn:
             cursor = conn.cursor(dictionary=True)  # Return results as dictionaries
-            
-            # Query to fetch user by force_id with correct column name (user_type)
-            cursor.execute(
-                """
-                SELECT force_id, password_hash, user_type 
-                FROM users 
-                WHERE force_id = %s
-                """, 
-                (force_id,)
-            )
-            
-            user = cursor.fetchone()
-            
-            if not user:
-                return None
+            try:
+                # Query to fetch user by force_id with correct column name (user_type)
+                cursor.execute(
+                    """
+                    SELECT force_id, password_hash, user_type 
+                    FROM users 
+                    WHERE force_id = %s
+                    """, 
+                    (force_id,)
+                )
                 
-            stored_hash = user['password_hash']
-            
-            if check_password(password, stored_hash):
-                return {
-                    'force_id': user['force_id'],
-                    'role': user['user_type']  # Changed from role to user_type
-                }
+                user = cursor.fetchone()
+            finally:
+                cursor.close()
             
+        if not user:
             return None
             
-        except Exception as e:
-            raise e
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+        stored_hash = user['password_hash']
+        
+        if check_password(password, stored_hash):
+            return {
+                'force_id': user['force_id'],
+                'role': user['user_type']  # Changed from role to user_type
+            }
+        
+        return None
                 
     def register_soldier(self, force_id: str, password: str) -> Dict:
         """
@@ -3,50 +3,27 @@ import logging
 import os
 import threading
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional, Dict, List
 from collections import deque, defaultdict
 from statistics import mean
+from config.settings import settings
 from db.connection import get_connection
+from db.session import db_connection
+from db.assessment_summary import upsert_latest_assessment
+from db.queries import DAILY_SCORE_FOR_SOLDIER_DAY, MONITORING_RUN_SOLDIERS, SOLDIER_DAY_DETECTIONS
+from services.settings_store import get_settings_snapshot
 from services.enhanced_emotion_detection_service import EnhancedEmotionDetectionService
+from services.frame_pipeline import CapturedFrame, FramePipeline
+from services.survey_sessions import DEFAULT_KIOSK_ID, SurveyAdmissionError, get_survey_session_registry
+from services.survey_monitor_manager import SurveyMonitorManager, parse_kiosk_cameras
+from services.camera_farm import CameraFarm, parse_camera_sources
+from services.preview_sink import create_preview_sink
+from services.motion_gate import create_motion_gate
 
 def get_camera_settings():
-    """Get camera settings from database with fallback to defaults"""
-    try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT setting_name, setting_value 
-            FROM system_settings 
-            WHERE setting_name IN ('camera_width', 'camera_height', 'detection_interval')
-        """)
-        
-        db_settings = cursor.fetchall()
-        setting_values = {}
-        
-        for setting in db_settings:
-            # Convert to appropriate types
-            if setting['setting_name'] in ['camera_width', 'camera_height', 'detection_interval']:
-                setting_values[setting['setting_name']] = int(setting['setting_value'])
-        
-        conn.close()
-        
-        # Return with defaults if not found in database
-        return {
-            'width': setting_values.get('camera_width', 640),
-            'height': setting_values.get('camera_height', 480),
-            'detection_interval': setting_values.get('detection_interval', 30)
-        }
-        
-    except Exception as e:
-        logging.error(f"Error retrieving camera settings: {e}")
-        # Return hardcoded defaults
-        return {
-            'width': 640,
-            'height': 480,
-            'detection_interval': 30
-        }
+    """Get camera settings from the cached system settings"""
+    return get_settings_snapshot().camera_settings()
 
 class CCTVMonitoringService:
     def __init__(self):
@@ -54,7 +31,21 @@ class CCTVMonitoringService:
         self.monitoring_id = None
         self.cap = None
         self.is_monitoring = False
-        self.monitor_thread = None
+        self.monitor_pipeline = None  # Capture thread + inference workers for daily monitoring
+        self.camera_farm = None  # Multi-camera daily monitoring (CCTV_CAMERAS) with worker processes
+        self.detection_lock = threading.Lock()  # Farm results arrive on one thread per worker
+        # Headless unless CCTV_PREVIEW asks for an MJPEG stream or a debug window
+        self.preview = create_preview_sink(settings.CCTV_PREVIEW, settings.CCTV_PREVIEW_FPS, settings.CCTV_PREVIEW_WIDTH)
+        self.survey_sessions = get_survey_session_registry()  # Shared with the survey routes
+        # One camera + pipeline per kiosk, sharing this service's models and a bounded inference pool
+        self.survey_monitors = SurveyMonitorManager(
+            self.emotion_service,
+            default_camera=self._find_available_camera,
+            max_sessions=settings.SURVEY_MAX_SESSIONS,
+            inference_workers=settings.SURVEY_INFERENCE_WORKERS,
+            kiosk_cameras=parse_kiosk_cameras(settings.SURVEY_KIOSK_CAMERAS),
+            max_slot_wait_ms=settings.SURVEY_ADMISSION_MAX_WAIT_MS
+        )
         self.detection_buffer = {}  # Buffer for storing detections for 3-second averaging
         self.last_average_time = {}  # Track last average calculation time per force_id
         self.AVERAGE_INTERVAL = 3  # Calculate average every 3 seconds
@@ -118,48 +109,45 @@ class CCTVMonitoringService:
         logging.error("No cameras available (checked indices 1 and 0 only)")
         return None
 
-    def _process_frames_continuously(self, date: str):
-        """Continuously process frames in a separate thread"""
-        logging.info("Starting continuous frame processing")
-        while self.is_monitoring:
-            try:
-                result = self.process_frame()
-                if result:
-                    logging.info(f"Processed frame: {result}")
-                time.sleep(0.1)  # Small delay to prevent excessive CPU usage
-            except Exception as e:
-                logging.error(f"Error in continuous processing: {e}")
-                
-        logging.info("Stopped continuous frame processing")
-        self.is_monitoring = False
+    def _create_pipeline(self, handler, sample_every: int, name: str) -> FramePipeline:
+        """Capture thread that always holds the freshest frame, feeding the inference worker(s)"""
+        return FramePipeline(
+            self.cap,
+            handler,
+            sample_every=sample_every,
+            workers=settings.CCTV_INFERENCE_WORKERS,
+            queue_size=settings.CCTV_FRAME_QUEUE_SIZE,
+            name=name,
+            frame_ring=settings.CCTV_FRAME_RING,
+            motion_gate=create_motion_gate()
+        )
+    
+    def _handle_monitoring_frame(self, frame: CapturedFrame) -> Optional[Dict]:
+        """Inference worker callback for daily monitoring"""
+        if not self.is_monitoring:
+            return None
+        result = self.process_frame(frame.image)
+        if result:
+            logging.info(f"Processed frame: {result}")
+        return result
+    
+    def get_pipeline_stats(self) -> Dict:
+        """Per-stage timing and drop counters of the running capture/inference pipelines"""
+        return {
+            'monitoring': self.monitor_pipeline.stats() if self.monitor_pipeline else None,
+            'camera_farm': self.camera_farm.stats() if self.camera_farm else None,
+            'preview': self.preview.stats(),
+            'survey': self.survey_monitors.stats()
+        }
 
-    def get_emotion_data_for_timerange(self, start_seconds: float, end_seconds: float) -> float:
-        """Get average emotion score for a specific time range relative to survey start"""
-        if not hasattr(self, 'survey_detections') or not self.survey_detections:
-            return 0.0
-            
-        if not hasattr(self, 'survey_start_time'):
-            return 0.0
-            
-        # Convert relative seconds to actual timestamps
-        start_time = self.survey_start_time + timedelta(seconds=start_seconds)
-        end_time = self.survey_start_time + timedelta(seconds=end_seconds)
-        
-        # Filter detections in this time range
-        relevant_detections = []
-        for detection in self.survey_detections:
-            detection_time = datetime.fromisoformat(detection['timestamp'])
-            if start_time <= detection_time <= end_time:
-                relevant_detections.append(detection)
-        
-        if not relevant_detections:
+    def get_emotion_data_for_timerange(self, force_id: str, start_seconds: float, end_seconds: float) -> float:
+        """Get average emotion score for a specific time range relative to the soldier's survey start"""
+        session = self.survey_sessions.get(force_id)
+        if session is None:
             return 0.0
-            
-        # Calculate average score for this time range
-        scores = [d['score'] for d in relevant_detections]
-        avg_score = sum(scores) / len(scores)
         
-        logging.info(f"Time range {start_seconds}-{end_seconds}s: {len(relevant_detections)} detections, avg_score={avg_score:.2f}")
+        avg_score = session.emotion_score_between(start_seconds, end_seconds)
+        logging.info(f"Time range {start_seconds}-{end_seconds}s: avg_score={avg_score:.2f}")
         return avg_score
 
     def start_monitoring(self, date: str) -> bool:
@@ -174,15 +162,18 @@ class CCTVMonitoringService:
         if self.cap:
             logging.info("Releasing previously open camera...")
             self.cap.release()
-            cv2.destroyAllWindows()
+            self.preview.close()
             self.cap = None
             
         try:
-            # Initialize video capture with available camera
-            logging.info("Initializing video capture...")
-            self.cap = self._find_available_camera()
-            if not self.cap:
-                raise Exception("Could not find any available camera - please connect a camera")
+            # Barracks deployment: configured camera streams through the inference farm
+            cameras = parse_camera_sources(settings.CCTV_CAMERAS, settings.CCTV_CAMERA_FPS)
+            if not cameras:
+                # Initialize video capture with available camera
+                logging.info("Initializing video capture...")
+                self.cap = self._find_available_camera()
+                if not self.cap:
+                    raise Exception("Could not find any available camera - please connect a camera")
             
             logging.info("Connecting to database...")
             # Get database connection
@@ -202,15 +193,23 @@ class CCTVMonitoringService:
                 self.monitoring_id = cursor.fetchone()[0]
                 conn.commit()
                 
-                logging.info("Starting monitoring thread...")
-                # Start the monitoring thread
+                logging.info("Starting monitoring pipeline...")
+                # Start the capture thread(s) and inference worker(s)
                 self.is_monitoring = True
-                self.monitor_thread = threading.Thread(
-                    target=self._process_frames_continuously,
-                    args=(date,),
-                    daemon=True
-                )
-                self.monitor_thread.start()
+                self.preview.open()
+                if cameras:
+                    self.camera_farm = CameraFarm(
+                        cameras,
+                        on_result=self._handle_farm_result,
+                        workers=settings.CCTV_FARM_WORKERS,
+                        slots_per_camera=settings.CCTV_FARM_SLOTS_PER_CAMERA,
+                        motion_gate_factory=create_motion_gate,
+                        preview=self.preview
+                    )
+                    self.camera_farm.start()
+                else:
+                    self.monitor_pipeline = self._create_pipeline(self._handle_monitoring_frame, 1, "CCTVMonitoring")
+                    self.monitor_pipeline.start()
                 
                 logging.info(f"Successfully started monitoring session {self.monitoring_id}")
                 return True
@@ -224,11 +223,14 @@ class CCTVMonitoringService:
             error_msg = f"Failed to start monitoring: {str(e)}"
             logging.error(error_msg)
             # Clean up resources
+            if self.camera_farm:
+                self.camera_farm.stop()
+                self.camera_farm = None
             if self.cap:
                 self.cap.release()
-                cv2.destroyAllWindows()
                 self.cap = None
                 logging.info("Released camera capture device")
+            self.preview.close()
             self.is_monitoring = False
             self.monitoring_id = None
             raise Exception(error_msg)
@@ -243,11 +245,17 @@ class CCTVMonitoringService:
             return False
 
         self.is_monitoring = False
+        if self.monitor_pipeline:
+            self.monitor_pipeline.stop()
+            self.monitor_pipeline = None
+        if self.camera_farm:
+            self.camera_farm.stop()
+            self.camera_farm = None
 
         # Stop video capture
         if self.cap and self.cap.isOpened():
             self.cap.release()
-        cv2.destroyAllWindows()
+        self.preview.close()
 
         # Calculate and store daily averages for each soldier
         try:
@@ -256,11 +264,7 @@ class CCTVMonitoringService:
 
             try:
                 # Get all unique force_ids from this monitoring session
-                cursor.execute("""
-                    SELECT DISTINCT force_id 
-                    FROM cctv_detections 
-                    WHERE monitoring_id = %s
-                """, (self.monitoring_id,))
+                cursor.execute(MONITORING_RUN_SOLDIERS, (self.monitoring_id,))
                 force_ids = [row[0] for row in cursor.fetchall()]
 
                 monitoring_date = datetime.now().date()
@@ -268,20 +272,12 @@ class CCTVMonitoringService:
                 # For each soldier, calculate their daily average
                 for force_id in force_ids:
                     # Calculate average from all detections today for this soldier
-                    cursor.execute("""
-                        SELECT AVG(depression_score) 
-                        FROM cctv_detections 
-                        WHERE force_id = %s 
-                        AND DATE(detection_timestamp) = %s
-                    """, (force_id, monitoring_date))
+                    cursor.execute(SOLDIER_DAY_DETECTIONS, (force_id, monitoring_date, monitoring_date))
                     
-                    daily_avg = cursor.fetchone()[0]
+                    daily_avg, detection_count = cursor.fetchone()
                     if daily_avg is not None:
                         # Check if an entry already exists for this soldier today
-                        cursor.execute("""
-                            SELECT id FROM daily_depression_scores 
-                            WHERE force_id = %s AND score_date = %s
-                        """, (force_id, monitoring_date))
+                        cursor.execute(DAILY_SCORE_FOR_SOLDIER_DAY, (force_id, monitoring_date))
                         
                         existing_entry = cursor.fetchone()
                         
@@ -289,16 +285,16 @@ class CCTVMonitoringService:
                             # Update existing entry
                             cursor.execute("""
                                 UPDATE daily_depression_scores 
-                                SET depression_score = %s 
-                                WHERE force_id = %s AND score_date = %s
-                            """, (daily_avg, force_id, monitoring_date))
+                                SET avg_depression_score = %s, detection_count = %s
+                                WHERE force_id = %s AND date = %s
+                            """, (daily_avg, detection_count, force_id, monitoring_date))
                         else:
                             # Insert new entry
                             cursor.execute("""
                                 INSERT INTO daily_depression_scores 
-                                (force_id, score_date, depression_score)
-                                VALUES (%s, %s, %s)
-                            """, (force_id, monitoring_date, daily_avg))
+                                (force_id, date, avg_depression_score, detection_count)
+                                VALUES (%s, %s, %s, %s)
+                            """, (force_id, monitoring_date, daily_avg, detection_count))
                         
                         logging.info(f"Stored daily average for soldier {force_id}: {daily_avg:.2f}")
 
@@ -327,40 +323,46 @@ class CCTVMonitoringService:
 
         return True
 
-    def process_frame(self) -> Optional[Dict]:
-        """Process a single frame from the video feed"""
+    def process_frame(self, frame=None) -> Optional[Dict]:
+        """Process a single frame (read from the video feed if not given)"""
         if not self.cap or not self.monitoring_id:
             return None
 
-        ret, frame = self.cap.read()
-        if not ret:
-            return None
-
-        # Create a copy for display
-        display_frame = frame.copy()
-        
-        # Resize frame for faster processing
-        frame = cv2.resize(frame, (1280, 720))
-        display_frame = cv2.resize(display_frame, (1280, 720))
+        if frame is None:
+            ret, frame = self.cap.read()
+            if not ret:
+                return None
 
-        # Detect face and emotion
+        # Detect face and emotion (on the native frame; no copy or upscaling)
         result = self.emotion_service.detect_face_and_emotion(frame)
+
+        # Annotated copy only when a preview viewer is attached and a preview frame is due
+        self.preview.offer(frame, [result] if result else [])
+
         if result:
             force_id, emotion, score, face_coords = result
             logging.info(f"Detected soldier {force_id} with emotion {emotion} and score {score}")
-            
-            # Draw rectangle around face
-            x, y, w, h = face_coords
-            cv2.rectangle(display_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            cv2.putText(display_frame, f"ID: {force_id}", (x, y-10), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-            cv2.putText(display_frame, f"Emotion: {emotion}", (x, y+h+25), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-            
-            # Show the frame
-            cv2.imshow('CCTV Monitoring', display_frame)
-            cv2.waitKey(1)  # Update window, wait 1ms
 
+            self._record_detection(force_id, emotion, score, face_coords)
+
+            return {
+                "force_id": force_id,
+                "emotion": emotion,
+                "score": score
+            }
+        return None
+
+    def _handle_farm_result(self, camera_id: str, timestamp: float, results: List) -> None:
+        """Camera farm callback: every soldier identified in one analysed frame"""
+        if not self.is_monitoring:
+            return
+        for force_id, emotion, score, face_coords in results:
+            logging.info(f"Camera {camera_id}: soldier {force_id} with emotion {emotion} and score {score}")
+            self._record_detection(force_id, emotion, score, face_coords)
+
+    def _record_detection(self, force_id: str, emotion: str, score: float, face_coords) -> None:
+        """Buffer a detection and store the soldier's 3-second average when it is due"""
+        with self.detection_lock:
             current_time = time.time()
 
             # Initialize buffer if needed
@@ -380,17 +382,6 @@ class CCTVMonitoringService:
             if current_time - self.last_average_time[force_id] >= self.AVERAGE_INTERVAL:
                 self._calculate_and_store_average(force_id, current_time)
 
-            return {
-                "force_id": force_id,
-                "emotion": emotion,
-                "score": score
-            }
-        else:
-            # Show frame even when no face is detected
-            cv2.imshow('CCTV Monitoring', display_frame)
-            cv2.waitKey(1)
-            return None
-
     def _calculate_and_store_average(self, force_id: str, current_time: float):
         """Calculate and store 3-second average for a soldier in cctv_detections"""
         buffer = self.detection_buffer[force_id]
@@ -447,143 +438,62 @@ class CCTVMonitoringService:
             logging.error(f"Error calculating daily scores: {e}")
             return False
 
-    def start_survey_monitoring(self, force_id: str) -> bool:
-        """Start emotion detection monitoring during survey for a specific soldier"""
+    def start_survey_monitoring(self, force_id: str, kiosk_id: str = DEFAULT_KIOSK_ID) -> bool:
+        """
+        Start emotion detection monitoring during survey for a specific soldier
+        
+        Raises:
+            SurveyAdmissionError: too many concurrent surveys, or the kiosk camera is in use
+        """
         start_time = time.time()
-        camera_init_time = 0  # Initialize timing variable
         
         try:
-            logging.info(f"[START] Starting survey monitoring for soldier {force_id}")
+            logging.info(f"[START] Starting survey monitoring for soldier {force_id} on kiosk {kiosk_id}")
             
-            # Initialize camera if not already done
-            if not self.cap:
-                camera_init_start = time.time()
-                logging.info("[CAMERA] Initializing camera...")
-                
-                self.cap = self._find_available_camera()
-                if not self.cap:
-                    raise Exception("No camera available")
-                    
-                camera_init_time = time.time() - camera_init_start
-                logging.info(f"[CAMERA] Camera initialized in {camera_init_time:.2f} seconds")
-            else:
-                logging.info("[CAMERA] Using existing camera connection")
-                    
-            # Set camera properties using dynamic settings from database
-            settings_start = time.time()
+            # Camera settings from the cached system settings
             camera_settings = get_camera_settings()
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, camera_settings['width'])
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, camera_settings['height'])
-            self.cap.set(cv2.CAP_PROP_FPS, 10)  # Keep FPS at 10 for performance
-            settings_time = time.time() - settings_start
-            
-            logging.info(f"[CONFIG] Camera configured in {settings_time:.2f}s: {camera_settings['width']}x{camera_settings['height']}, detection_interval={camera_settings['detection_interval']}")
             
-            # Initialize survey monitoring state
-            self.survey_force_id = force_id
-            self.survey_detections = []
-            self.survey_monitoring = True
-            self.survey_thread_active = True
-            self.survey_start_time = datetime.now()  # Track survey start time for question correlation
-            
-            # Start background monitoring thread
-            thread_start = time.time()
-            self.survey_thread = threading.Thread(
-                target=self._process_survey_frames_continuously,
-                args=(force_id,),
-                daemon=True
-            )
-            self.survey_thread.start()
-            thread_time = time.time() - thread_start
+            # Admit the session, open the kiosk camera and start its capture thread and inference worker(s)
+            self.survey_monitors.start(force_id, kiosk_id, camera_settings)
             
             total_time = time.time() - start_time
-            logging.info(f"[SUCCESS] Survey monitoring started in {total_time:.2f}s (camera: {camera_init_time:.2f}s, settings: {settings_time:.2f}s, thread: {thread_time:.2f}s)")
+            logging.info(f"[SUCCESS] Survey monitoring started in {total_time:.2f}s: {camera_settings['width']}x{camera_settings['height']}, detection_interval={camera_settings['detection_interval']}")
             return True
             
+        except SurveyAdmissionError as e:
+            logging.warning(f"[ADMISSION] Survey monitoring for {force_id} on kiosk {kiosk_id} rejected: {e}")
+            raise
         except Exception as e:
             total_time = time.time() - start_time
             logging.error(f"[ERROR] Failed to start survey monitoring after {total_time:.2f}s: {e}")
-            self.survey_monitoring = False
             return False
 
-    def _process_survey_frames_continuously(self, force_id: str):
-        """Continuously process frames during survey in background thread"""
-        logging.info(f"Starting continuous survey frame processing for soldier {force_id}")
-        
-        frame_count = 0
-        # Get dynamic detection interval from database settings
-        camera_settings = get_camera_settings()
-        detection_interval = camera_settings['detection_interval']  # Use configurable interval
-        logging.info(f"Using detection interval: {detection_interval} frames")
-        
-        while self.survey_thread_active and self.survey_monitoring:
-            try:
-                if not self.cap or not self.cap.isOpened():
-                    logging.warning("Camera not available during survey monitoring")
-                    time.sleep(1)
-                    continue
-                    
-                ret, frame = self.cap.read()
-                if not ret:
-                    logging.warning("Failed to read frame during survey")
-                    time.sleep(0.1)
-                    continue
-                
-                frame_count += 1
-                
-                # Process only every Nth frame to reduce computational load
-                if frame_count % detection_interval == 0:
-                    result = self.emotion_service.detect_face_and_emotion(frame)
-                    if result:
-                        detected_force_id, emotion, score, face_coords = result
-                        
-                        # Only process if it matches the soldier taking the survey
-                        if detected_force_id == force_id:
-                            detection_data = {
-                                'timestamp': datetime.now().isoformat(),
-                                'emotion': emotion,
-                                'score': score,
-                                'force_id': force_id
-                            }
-                            
-                            # Store in survey detections buffer
-                            if not hasattr(self, 'survey_detections'):
-                                self.survey_detections = []
-                            self.survey_detections.append(detection_data)
-                            
-                            logging.info(f"Survey detection: {force_id} - {emotion} ({score:.2f})")
-                
-                # Small delay to prevent excessive CPU usage
-                time.sleep(0.1)
-                
-            except Exception as e:
-                logging.error(f"Error in survey frame processing: {e}")
-                time.sleep(1)
-                
-        logging.info(f"Stopped continuous survey frame processing for soldier {force_id}")
+    def is_survey_active(self, force_id: str) -> bool:
+        """Whether a survey session for this soldier is being monitored"""
+        session = self.survey_sessions.get(force_id)
+        return session is not None and session.active
 
     def stop_survey_monitoring(self, force_id: str, session_id: Optional[int] = None) -> Dict:
         """Stop survey emotion detection and return average results"""
+        session = self.survey_sessions.end(force_id)
         try:
-            if not hasattr(self, 'survey_monitoring') or not self.survey_monitoring:
+            if session is None:
                 logging.warning(f"No monitoring session active for soldier {force_id}")
                 return {'force_id': force_id, 'message': 'No monitoring session active'}
                 
-            # Stop the monitoring thread
-            self.survey_monitoring = False
-            self.survey_thread_active = False
+            # Stop the kiosk's capture thread and inference worker(s), waiting for the frame in flight
+            self.survey_monitors.release(session)
             
-            # Wait for thread to finish
-            if hasattr(self, 'survey_thread') and self.survey_thread.is_alive():
-                self.survey_thread.join(timeout=2)
+            # Detections plus question markers, in time order
+            survey_detections = sorted(session.snapshot() + session.question_markers, key=lambda d: d['timestamp'])
             
             # Process any remaining detections
-            if hasattr(self, 'survey_detections') and self.survey_detections:
-                logging.info(f"Processing {len(self.survey_detections)} emotion detections for soldier {force_id}")
+            if survey_detections:
+                logging.info(f"Processing {len(survey_detections)} emotion detections for soldier {force_id}")
                 
                 # Filter out only actual emotion detections (not markers)
-                actual_detections = [d for d in self.survey_detections if 'score' in d and 'emotion' in d]
-                logging.info(f"Found {len(actual_detections)} actual emotion detections (filtered from {len(self.survey_detections)} total entries)")
+                actual_detections = [d for d in survey_detections if 'score' in d and 'emotion' in d]
+                logging.info(f"Found {len(actual_detections)} actual emotion detections (filtered from {len(survey_detections)} total entries)")
                 
                 if actual_detections:
                     # Calculate average depression score
@@ -613,11 +523,11 @@ class CCTVMonitoringService:
                     'session_id': session_id,
                     'avg_depression_score': avg_score,
                     'dominant_emotion': most_common_emotion,
-                    'detection_count': len(self.survey_detections),
-                    'detections': self.survey_detections  # Return ALL detections for per-question analysis
+                    'detection_count': len(survey_detections),
+                    'detections': survey_detections  # Return ALL detections for per-question analysis
                 }
                 
-                logging.info(f"Survey monitoring ended for {force_id}: avg_score={avg_score:.2f}, emotion={most_common_emotion}, detections={len(self.survey_detections)}")
+                logging.info(f"Survey monitoring ended for {force_id}: avg_score={avg_score:.2f}, emotion={most_common_emotion}, detections={len(survey_detections)}")
                 return results
             else:
                 logging.warning(f"No emotion data collected during survey for soldier {force_id}")
@@ -635,41 +545,32 @@ class CCTVMonitoringService:
             logging.error(f"Error stopping survey monitoring: {e}")
             return {'force_id': force_id, 'error': str(e)}
         finally:
-            # Clean up camera and monitoring resources
+            # IMPORTANT: Release the kiosk camera (no-op if the kiosk has moved on to another survey)
             try:
-                # Stop any ongoing threads
-                self.survey_monitoring = False
-                self.survey_thread_active = False
-                
-                # Wait for thread to finish
-                if hasattr(self, 'survey_thread') and self.survey_thread.is_alive():
-                    self.survey_thread.join(timeout=2)
-                
-                # IMPORTANT: Release camera resources
-                if self.cap and self.cap.isOpened():
-                    self.cap.release()
-                    self.cap = None
-                    cv2.destroyAllWindows()
-                    logging.info("Camera resources released after survey monitoring")
-                
-                # Clean up survey-specific attributes
-                if hasattr(self, 'survey_detections'):
-                    delattr(self, 'survey_detections')
-                if hasattr(self, 'survey_force_id'):
-                    delattr(self, 'survey_force_id')
-                if hasattr(self, 'survey_thread'):
-                    delattr(self, 'survey_thread')
+                if session is not None:
+                    self.survey_monitors.release(session)
                     
             except Exception as cleanup_error:
                 logging.error(f"Error during cleanup: {cleanup_error}")
 
     def _store_survey_emotion_data(self, session_id: int, force_id: str, avg_score: float):
         """Store survey emotion data in the weekly_sessions table"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
+            # Inside submit_survey this joins the request transaction, so the
+            # freshly inserted (uncommitted) session row is visible and the
+            # update commits or rolls back together with the submission
+            with db_connection() as conn:
+                self._update_survey_emotion_rows(conn, session_id, force_id, avg_score)
+            logging.info(f"Successfully stored survey emotion data for session {session_id}: avg_score={avg_score:.2f}")
             
+        except Exception as e:
+            logging.error(f"Error storing survey emotion data: {e}")
+            raise e
+
+    def _update_survey_emotion_rows(self, conn, session_id: int, force_id: str, avg_score: float):
+        """Write the survey emotion average to the session and its responses"""
+        cursor = conn.cursor()
+        try:
             logging.info(f"Storing emotion data - session_id: {session_id}, force_id: {force_id}, avg_score: {avg_score:.2f}")
             
             # Update the weekly session with image emotion score
@@ -694,29 +595,19 @@ class CCTVMonitoringService:
             response_rows_affected = cursor.rowcount
             logging.info(f"Updated {response_rows_affected} question response record(s)")
             
-            conn.commit()
-            logging.info(f"Successfully stored survey emotion data for session {session_id}: avg_score={avg_score:.2f}")
-            
-        except Exception as e:
-            logging.error(f"Error storing survey emotion data: {e}")
-            if conn:
-                conn.rollback()
-            raise e
+            upsert_latest_assessment(cursor, session_id)
         finally:
-            if conn:
-                conn.close()
+            cursor.close()
 
     def cleanup_camera(self):
         """Clean up camera resources"""
         try:
-            if hasattr(self, 'survey_monitoring') and self.survey_monitoring:
-                self.survey_monitoring = False
-                self.survey_thread_active = False
-                
+            self.survey_monitors.stop_all()
+            
             if self.cap and self.cap.isOpened():
                 self.cap.release()
                 self.cap = None
-                cv2.destroyAllWindows()
+                self.preview.close()
                 logging.info("Camera resources cleaned up")
         except Exception as e:
             logging.error(f"Error cleaning up camera: {e}")
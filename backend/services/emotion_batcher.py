@@ -0,0 +1,186 @@
+"""
+Micro-batching stage for the emotion CNN.
+
+Callers (every face of a frame, every inference worker and camera in the
+process) submit 48x48 face crops; one worker thread collects them for at
+most EMOTION_BATCH_MAX_WAIT_MS (or until EMOTION_BATCH_MAX_SIZE crops) and
+runs a single forward pass. The forward pass calls the model directly
+(compiled with tf.function when TensorFlow is available) instead of
+Model.predict, whose per-call setup dominates for a handful of crops.
+Batches are padded to power-of-two sizes so the compiled function is traced
+for a bounded set of shapes.
+"""
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Dict
+import numpy as np
+from config.settings import settings
+from services.frame_pipeline import StageTimer
+
+
+class _EmotionRequest:
+    __slots__ = ('model', 'roi', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, model, roi: np.ndarray):
+        self.model = model
+        self.roi = roi
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class EmotionBatcher:
+    """Collects emotion crops from all callers and runs them as batched forward passes"""
+
+    def __init__(self, max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._compiled = weakref.WeakKeyDictionary()  # model -> compiled forward function
+        self.batch_timer = StageTimer()
+        self.wait_timer = StageTimer()
+        self.batch_sizes = deque(maxlen=500)
+        self.faces = 0
+        self.busy_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def predict(self, model, rois: np.ndarray) -> np.ndarray:
+        """
+        Emotion probabilities for a stack of preprocessed crops
+
+        Args:
+            model: Emotion network (from the model registry snapshot)
+            rois: (n, 48, 48, 1) float32 crops scaled to [0, 1]
+
+        Returns:
+            np.ndarray: (n, 7) probabilities
+        """
+        if not len(rois):
+            return np.empty((0, 7), dtype=np.float32)
+        self._ensure_worker()
+
+        requests = [_EmotionRequest(model, roi) for roi in np.asarray(rois, dtype=np.float32)]
+        with self._condition:
+            self._queue.extend(requests)
+            self._condition.notify()
+
+        for request in requests:
+            request.done.wait()
+            if request.error is not None:
+                raise request.error
+        return np.stack([request.result for request in requests])
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._condition:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._worker_loop, daemon=True, name="EmotionBatcher")
+                    self._thread.start()
+
+    def _next_batch(self):
+        """Block for the first request, then collect more until the batch is full or its wait budget is spent"""
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+            deadline = self._queue[0].enqueued_at + self.max_wait
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            # One forward pass per model; a refresh can briefly leave requests for two versions queued
+            model = self._queue[0].model
+            batch = []
+            while self._queue and len(batch) < self.max_batch and self._queue[0].model is model:
+                batch.append(self._queue.popleft())
+            return model, batch
+
+    def _worker_loop(self):
+        while True:
+            model, batch = self._next_batch()
+            started = time.perf_counter()
+            try:
+                probabilities = self._forward(model, np.stack([request.roi for request in batch]))
+                for request, result in zip(batch, probabilities):
+                    request.result = result
+            except Exception as e:
+                logging.error(f"Batched emotion inference failed: {e}")
+                for request in batch:
+                    request.error = e
+            finished = time.perf_counter()
+
+            for request in batch:
+                request.done.set()
+
+            with self._stats_lock:
+                self.batch_timer.record(finished - started)
+                self.wait_timer.record(started - batch[0].enqueued_at)
+                self.batch_sizes.append(len(batch))
+                self.faces += len(batch)
+                self.busy_seconds += finished - started
+
+    def _forward(self, model, batch: np.ndarray) -> np.ndarray:
+        """One direct forward pass, padded to the next power of two"""
+        size = len(batch)
+        padded_size = 1 << (size - 1).bit_length()
+        if padded_size > size:
+            batch = np.concatenate([batch, np.zeros((padded_size - size,) + batch.shape[1:], dtype=batch.dtype)])
+
+        forward = self._compiled.get(model)
+        if forward is None:
+            forward = self._compile(model)
+            self._compiled[model] = forward
+        return np.asarray(forward(batch))[:size]
+
+    @staticmethod
+    def _compile(model):
+        if getattr(model, 'direct_call', False):
+            # Not a Keras model (e.g. the NumPy engine): nothing to compile
+            return model
+        try:
+            import tensorflow as tf
+            compiled = tf.function(lambda batch: model(batch, training=False))
+            return lambda batch: compiled(tf.convert_to_tensor(batch))
+        except Exception as e:
+            logging.info(f"tf.function unavailable ({e}) - calling the emotion model directly")
+            return lambda batch: model(batch, training=False)
+
+    def stats(self) -> Dict:
+        """Per-batch latency, batch sizes and throughput"""
+        with self._stats_lock:
+            sizes = list(self.batch_sizes)
+            batch_latency, queue_wait = self.batch_timer.summary(), self.wait_timer.summary()
+        return {
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': self.batch_timer.count,
+            'faces': self.faces,
+            'avg_batch_size': round(sum(sizes) / len(sizes), 2) if sizes else 0,
+            'max_batch_size': max(sizes) if sizes else 0,
+            'batch_latency': batch_latency,
+            'queue_wait': queue_wait,
+            'faces_per_second': round(self.faces / self.busy_seconds, 1) if self.busy_seconds else 0.0
+        }
+
+
+# Global instance for singleton pattern
+_global_emotion_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_emotion_batcher() -> EmotionBatcher:
+    """Get the process-wide emotion batcher (singleton)"""
+    global _global_emotion_batcher
+
+    if _global_emotion_batcher is None:
+        with _batcher_lock:
+            if _global_emotion_batcher is None:
+                _global_emotion_batcher = EmotionBatcher(settings.EMOTION_BATCH_MAX_SIZE,
+                                                         settings.EMOTION_BATCH_MAX_WAIT_MS)
+    return _global_emotion_batcher
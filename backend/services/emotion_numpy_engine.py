@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Pure-NumPy inference engine for the 48x48 emotion CNN.
+
+The Keras architecture (model/emotion_model.json) and weights
+(model/emotion_model.h5) are converted once into model/emotion_model.npz:
+the layer list plus float32, float16 or int8 (per-output-channel symmetric)
+weights. Loading the .npz needs only NumPy, so the emotion model starts in
+milliseconds without importing TensorFlow. Convolutions run as one
+im2col matrix multiply per layer on the whole batch.
+
+Convert (needs Keras once) and validate against Keras outputs:
+
+    python -m services.emotion_numpy_engine --convert
+    python -m services.emotion_numpy_engine --convert --quantize int8 --validate 256
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMOTION_MODEL_NPZ = os.path.join(BASE_DIR, 'model', 'emotion_model.npz')
+ENGINE_FORMAT = 'emotion-npz-v1'
+SUPPORTED_LAYERS = ('InputLayer', 'Conv2D', 'MaxPooling2D', 'Dropout', 'Flatten', 'Dense')
+
+
+def _relu(x: np.ndarray) -> np.ndarray:
+    return np.maximum(x, 0.0, out=x)
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    x = x - x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+
+ACTIVATIONS = {'linear': lambda x: x, 'relu': _relu, 'softmax': _softmax}
+
+
+def conv2d_valid(x: np.ndarray, kernel: np.ndarray, bias: np.ndarray) -> np.ndarray:
+    """
+    Stride-1 'valid' convolution as one im2col matrix multiply
+
+    Args:
+        x: (N, H, W, C) input
+        kernel: (kh, kw, C, F) Keras kernel
+        bias: (F,)
+    """
+    kh, kw, channels, filters = kernel.shape
+    windows = np.lib.stride_tricks.sliding_window_view(x, (kh, kw), axis=(1, 2))  # (N, H', W', C, kh, kw)
+    n, out_h, out_w = windows.shape[:3]
+    columns = windows.transpose(0, 1, 2, 4, 5, 3).reshape(n * out_h * out_w, kh * kw * channels)
+    out = columns @ kernel.reshape(kh * kw * channels, filters)
+    out += bias
+    return out.reshape(n, out_h, out_w, filters)
+
+
+def max_pool(x: np.ndarray, pool: int) -> np.ndarray:
+    """Non-overlapping 'valid' max pooling"""
+    n, h, w, c = x.shape
+    h, w = h - h % pool, w - w % pool
+    return x[:, :h, :w].reshape(n, h // pool, pool, w // pool, pool, c).max(axis=(2, 4))
+
+
+def quantize_weights(kernel: np.ndarray, quantize: Optional[str]) -> Dict[str, np.ndarray]:
+    """Storage arrays for one kernel (dequantized again by _dequantize at load time)"""
+    if quantize == 'int8':
+        axes = tuple(range(kernel.ndim - 1))
+        scale = np.abs(kernel).max(axis=axes) / 127.0
+        scale[scale == 0] = 1.0
+        return {'q': np.round(kernel / scale).astype(np.int8), 'scale': scale.astype(np.float32)}
+    if quantize == 'float16':
+        return {'w': kernel.astype(np.float16)}
+    return {'w': kernel.astype(np.float32)}
+
+
+def _dequantize(arrays, prefix: str) -> np.ndarray:
+    if f'{prefix}.q' in arrays:
+        return arrays[f'{prefix}.q'].astype(np.float32) * arrays[f'{prefix}.scale']
+    return arrays[f'{prefix}.w'].astype(np.float32)
+
+
+class NumpyEmotionModel:
+    """Drop-in replacement for the Keras emotion model at inference time"""
+
+    direct_call = True  # Call directly; EmotionBatcher must not wrap it in tf.function
+
+    def __init__(self, layers: List[Dict], weights: List[Optional[tuple]]):
+        self.layers = layers
+        self.weights = weights
+
+    @classmethod
+    def load(cls, path: str = EMOTION_MODEL_NPZ) -> 'NumpyEmotionModel':
+        start = time.time()
+        with np.load(path, allow_pickle=False) as arrays:
+            meta = json.loads(str(arrays['meta']))
+            if meta.get('format') != ENGINE_FORMAT:
+                raise ValueError(f"Unsupported emotion engine format: {meta.get('format')}")
+            layers = meta['layers']
+            weights = []
+            for i, layer in enumerate(layers):
+                if layer['type'] in ('Conv2D', 'Dense'):
+                    weights.append((_dequantize(arrays, f'{i}.kernel'), arrays[f'{i}.bias'].astype(np.float32)))
+                else:
+                    weights.append(None)
+        logging.info(f"NumPy emotion model loaded ({meta.get('quantize') or 'float32'}) in {time.time() - start:.3f}s")
+        return cls(layers, weights)
+
+    def __call__(self, batch, training: bool = False) -> np.ndarray:
+        x = np.asarray(batch, dtype=np.float32)
+        for layer, weights in zip(self.layers, self.weights):
+            kind = layer['type']
+            if kind == 'Conv2D':
+                x = ACTIVATIONS[layer['activation']](conv2d_valid(x, *weights))
+            elif kind == 'MaxPooling2D':
+                x = max_pool(x, layer['pool'])
+            elif kind == 'Flatten':
+                x = x.reshape(len(x), -1)
+            elif kind == 'Dense':
+                kernel, bias = weights
+                x = ACTIVATIONS[layer['activation']](x @ kernel + bias)
+        return x
+
+    def predict(self, batch, verbose: int = 0, batch_size: int = 64) -> np.ndarray:
+        """Keras-compatible predict()"""
+        batch = np.asarray(batch, dtype=np.float32)
+        return np.concatenate([self(batch[i:i + batch_size]) for i in range(0, len(batch), batch_size)]) \
+            if len(batch) else np.empty((0, self.weights[-1][1].shape[0]), dtype=np.float32)
+
+
+def convert_keras_model(keras_model, output_path: str = EMOTION_MODEL_NPZ, quantize: Optional[str] = None) -> str:
+    """
+    Write the .npz engine file for a loaded Keras Sequential emotion model
+
+    Args:
+        quantize: None (float32), 'float16' or 'int8'
+    """
+    layers, arrays = [], {}
+    for i, layer in enumerate(keras_model.layers):
+        kind = type(layer).__name__
+        config = layer.get_config()
+        if kind not in SUPPORTED_LAYERS:
+            raise ValueError(f"Layer {kind} is not supported by the NumPy emotion engine")
+        if kind == 'Conv2D':
+            if tuple(config['strides']) != (1, 1) or config['padding'] != 'valid':
+                raise ValueError("Only stride-1 'valid' convolutions are supported")
+        if kind == 'MaxPooling2D' and (config['pool_size'][0] != config['pool_size'][1] or
+                                       tuple(config['strides']) != tuple(config['pool_size'])):
+            raise ValueError("Only square, non-overlapping max pooling is supported")
+
+        entry = {'type': kind}
+        if kind in ('Conv2D', 'Dense'):
+            kernel, bias = layer.get_weights()
+            entry['activation'] = config['activation']
+            for key, value in quantize_weights(kernel, quantize).items():
+                arrays[f'{i}.kernel.{key}'] = value
+            arrays[f'{i}.bias'] = bias.astype(np.float32)
+        elif kind == 'MaxPooling2D':
+            entry['pool'] = int(config['pool_size'][0])
+        layers.append(entry)
+
+    meta = {'format': ENGINE_FORMAT, 'quantize': quantize, 'layers': layers}
+    temp_path = output_path + '.tmp.npz'
+    np.savez_compressed(temp_path, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(temp_path, output_path)
+    logging.info(f"Wrote NumPy emotion model to {output_path} ({os.path.getsize(output_path) / 1e6:.1f}MB)")
+    return output_path
+
+
+def validate_against_keras(keras_model, engine: NumpyEmotionModel, samples: int = 256, seed: int = 0) -> Dict:
+    """Compare engine and Keras outputs on random and smooth synthetic faces"""
+    rng = np.random.default_rng(seed)
+    noise = rng.random((samples // 2, 48, 48, 1), dtype=np.float32)
+    # Low-frequency images look more like face crops than white noise
+    smooth = np.clip(np.cumsum(np.cumsum(rng.normal(0, 0.05, (samples - len(noise), 48, 48, 1)), 1), 2) + 0.5, 0, 1).astype(np.float32)
+    batch = np.concatenate([noise, smooth])
+
+    expected = np.asarray(keras_model(batch, training=False))
+    actual = engine(batch)
+    difference = np.abs(expected - actual)
+    return {
+        'samples': len(batch),
+        'max_abs_diff': float(difference.max()),
+        'mean_abs_diff': float(difference.mean()),
+        'top1_agreement': float(np.mean(expected.argmax(1) == actual.argmax(1)))
+    }
+
+
+def _load_keras_model():
+    from services.model_registry import load_keras_emotion_model
+    return load_keras_emotion_model()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert/validate the NumPy emotion engine")
+    parser.add_argument('--convert', action='store_true', help="convert emotion_model.json/.h5 to .npz")
+    parser.add_argument('--quantize', choices=['float16', 'int8'], help="weight storage precision")
+    parser.add_argument('--output', default=EMOTION_MODEL_NPZ)
+    parser.add_argument('--validate', type=int, default=256, help="samples compared against Keras (0 = skip)")
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help="max abs probability difference (default 1e-4, or 0.05 for int8)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    keras_model = _load_keras_model()
+    if args.convert:
+        convert_keras_model(keras_model, args.output, args.quantize)
+    if args.validate:
+        report = validate_against_keras(keras_model, NumpyEmotionModel.load(args.output), args.validate)
+        tolerance = args.tolerance if args.tolerance is not None else (0.05 if args.quantize == 'int8' else 1e-4)
+        report['tolerance'] = tolerance
+        report['valid'] = report['max_abs_diff'] <= tolerance
+        print(json.dumps(report, indent=2))
+        if not report['valid']:
+            raise SystemExit(1)
@@ -1,6 +1,5 @@
 import cv2
 import numpy as np
-from keras.models import model_from_json
 import face_recognition
 import logging
 import os
@@ -9,6 +8,11 @@ from datetime import datetime
 from db.connection import get_connection
 from typing import Dict, Optional, Tuple, List
 from services.model_refresh_service import get_model_refresh_service
+from services.model_registry import get_model_registry
+from services.face_detection import detect_faces, detection_level, padded_roi
+from services.face_tracker import FaceTracker
+from services.emotion_batcher import get_emotion_batcher
+from config.settings import settings
 
 class EnhancedEmotionDetectionService:
     def __init__(self):
@@ -36,6 +40,15 @@ class EnhancedEmotionDetectionService:
         # Use the model refresh service for face recognition
         self.model_refresh_service = get_model_refresh_service()
         
+        # Models are shared by every instance through the process-wide registry
+        self.model_registry = get_model_registry()
+        
+        # Emotion crops from every face, worker and camera share batched forward passes
+        self.emotion_batcher = get_emotion_batcher()
+        
+        # Carries recognized soldiers across frames so the face encoder only runs for new/stale tracks
+        self.face_tracker = self.create_face_tracker()
+        
         # OPTIMIZATION: Use preloaded models for instant access
         self.model_preloader = None
         self._initialize_preloader()
@@ -63,239 +76,195 @@ class EnhancedEmotionDetectionService:
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
     
+    @staticmethod
+    def create_face_tracker() -> FaceTracker:
+        """Tracker for one camera (tracks are spatial, so every camera needs its own)"""
+        return FaceTracker(
+            iou_threshold=settings.FACE_TRACK_IOU_THRESHOLD,
+            reidentify_seconds=settings.FACE_TRACK_REIDENTIFY_SECONDS,
+            max_gap_seconds=settings.FACE_TRACK_MAX_GAP_SECONDS
+        )
+    
+    @property
+    def emotion_model(self):
+        return self.model_registry.current().emotion_model
+    
+    @property
+    def face_detector(self):
+        return self.model_registry.current().face_cascade
+    
     def _load_models(self):
-        """Load emotion detection and face cascade models - use preloaded if available"""
+        """Make sure the emotion and face cascade models are loaded in the shared model registry"""
         load_start_time = time.time()
         try:
-            # OPTIMIZATION: Try to use preloaded models first (check again in case they're ready now)
-            if not self.model_preloader:
-                # Re-attempt to get model preloader (might be ready now)
-                try:
-                    from services.model_preloader_service import ModelPreloaderService
-                    self.model_preloader = ModelPreloaderService.get_instance()
-                    logging.info("[RETRY] Model preloader service now available")
-                except Exception as e:
-                    logging.debug(f"Model preloader still not available: {e}")
-                    self.model_preloader = None
-            
-            if self.model_preloader and self.model_preloader.is_ready():
-                logging.info("[OPTIMIZE] Using preloaded models for instant access")
-                
-                # Get preloaded models
-                self.emotion_model = self.model_preloader.get_emotion_model()
-                self.face_detector = self.model_preloader.get_face_cascade()
-                
-                if self.emotion_model and self.face_detector:
-                    load_time = time.time() - load_start_time
-                    logging.info(f"[SUCCESS] All preloaded models loaded successfully in {load_time:.3f}s - instant access!")
-                    return
-                else:
-                    logging.warning("[WARNING] Some preloaded models not available, falling back to on-demand loading")
-            else:
-                if self.model_preloader:
-                    logging.info("[WARNING] Model preloader exists but not ready yet, using traditional loading")
-                else:
-                    logging.info("[WARNING] Model preloader not available, using traditional loading")
-            
-            # Fallback: Traditional on-demand loading
-            logging.info("[LOADING] Loading models on-demand (preloader not ready or failed)")
-            self._load_models_traditional()
+            # The preloader normally loaded them already; otherwise this loads them once per process
+            self.model_registry.load_static_models()
             
             load_time = time.time() - load_start_time
-            logging.info(f"[SUCCESS] Traditional model loading completed in {load_time:.2f}s")
+            logging.info(f"[SUCCESS] Shared models available in {load_time:.3f}s")
             
         except Exception as e:
             load_time = time.time() - load_start_time
             logging.error(f"[ERROR] Error in model loading after {load_time:.2f}s: {e}")
-            # Final fallback
-            self._load_models_traditional()
-    
-    def _load_models_traditional(self):
-        """Traditional model loading method (fallback)"""
-        try:
-            # Get the directory of this script
-            current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            
-            # Load emotion model
-            model_json_path = os.path.join(current_dir, 'model', 'emotion_model.json')
-            model_h5_path = os.path.join(current_dir, 'model', 'emotion_model.h5')
-            cascade_path = os.path.join(current_dir, 'haarcascades', 'haarcascade_frontalface_default.xml')
-            
-            json_file = open(model_json_path, 'r')
-            loaded_model_json = json_file.read()
-            json_file.close()
-            self.emotion_model = model_from_json(loaded_model_json)
-            self.emotion_model.load_weights(model_h5_path)
-            
-            # Load face cascade
-            self.face_detector = cv2.CascadeClassifier(cascade_path)
-            
-            logging.info("Traditional model loading completed successfully")
-            
-        except Exception as e:
-            logging.error(f"Error loading models: {e}")
             raise
     
-    def _get_current_face_model(self) -> Tuple[Optional[List], Optional[List]]:
-        """Get current face recognition model - use preloaded if available"""
+    def _get_current_face_index(self, models=None):
+        """Get the face gallery index of the given (default: current) model snapshot"""
         try:
-            # OPTIMIZATION: Try preloaded models first for instant access
-            # Re-check for model preloader in case it's ready now
-            if not self.model_preloader:
-                try:
-                    from services.model_preloader_service import ModelPreloaderService
-                    self.model_preloader = ModelPreloaderService.get_instance()
-                    logging.info("[RETRY] Model preloader service now available for face recognition")
-                except Exception as e:
-                    logging.debug(f"Model preloader still not available for face recognition: {e}")
-                    self.model_preloader = None
-            
-            if self.model_preloader and self.model_preloader.is_ready():
-                face_encodings = self.model_preloader.get_face_encodings()
-                if face_encodings:
-                    # Extract encodings and force_ids from preloaded data
-                    known_encodings = []
-                    known_force_ids = []
-                    
-                    for force_id, encoding in face_encodings.items():
-                        known_encodings.append(encoding)
-                        known_force_ids.append(force_id)
-                    
-                    logging.info(f"[OPTIMIZE] Using preloaded face encodings - instant access! ({len(known_encodings)} soldiers)")
-                    return known_encodings, known_force_ids
-                else:
-                    logging.warning("[WARNING] Preloaded face encodings not available, falling back to disk loading")
-            else:
-                if self.model_preloader:
-                    logging.info("[WARNING] Model preloader exists but not ready for face recognition, loading from disk")
-                else:
-                    logging.info("[LOADING] Model preloader not available, loading face encodings from disk")
+            models = models or self.model_registry.current()
+            if models.face_index is not None:
+                return models.face_index
             
-            # Fallback: Traditional loading from model refresh service
-            logging.info("[LOADING] Loading face encodings from disk (preloader not ready)")
+            # Try to refresh the model; the refresh publishes the index to the registry
+            refresh_result = self.model_refresh_service.force_refresh()
+            logging.info(f"Face model refresh result: {refresh_result}")
             
-            # Get current model from refresh service
-            encodings, force_ids = self.model_refresh_service.get_current_model()
-            
-            if encodings is None or force_ids is None:
-                # Try to refresh the model
-                refresh_result = self.model_refresh_service.force_refresh()
-                logging.info(f"Face model refresh result: {refresh_result}")
-                
-                # Get model after refresh
-                encodings, force_ids = self.model_refresh_service.get_current_model()
-            
-            return encodings, force_ids
+            return self.model_registry.current().face_index
             
         except Exception as e:
             logging.error(f"Error getting face model: {e}")
-            return None, None
+            return None
     
-    def detect_face_and_emotion(self, frame) -> Optional[Tuple[str, str, float, tuple]]:
+    def detect_face_and_emotion(self, frame, tracker: Optional[FaceTracker] = None) -> Optional[Tuple[str, str, float, tuple]]:
         """
         Detect face, identify soldier and detect emotion with enhanced error handling
+        
+        Returns:
+            (force_id, emotion, depression_score, face_coords) for the largest face, or None
+        """
+        results = self.detect_faces_and_emotions(frame, max_faces=1, tracker=tracker)
+        return results[0] if results else None
+    
+    def detect_faces_and_emotions(self, frame, max_faces: Optional[int] = None,
+                                  tracker: Optional[FaceTracker] = None) -> List[Tuple[str, str, float, tuple]]:
+        """
+        Identify every recognizable soldier in a frame and detect their emotions
+        
+        The emotion crops of all faces go through one batched forward pass
+        (shared with every other frame being analysed in this process).
+        
+        Args:
+            frame: BGR frame
+            max_faces: Analyse only the largest N faces (default: all)
+            tracker: Face tracker of the camera this frame comes from (default: the service's own)
+        
+        Returns:
+            List of (force_id, emotion, depression_score, face_coords), largest face first
         """
         try:
-            # Get current face recognition model
-            known_face_encodings, known_force_ids = self._get_current_face_model()
-            
-            if not known_face_encodings or not known_force_ids:
-                logging.warning("No face recognition model available")
-                return None
-            
-            # Convert to grayscale for face detection
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_detector.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=(30, 30)
-            )
-            
-            if len(faces) == 0:
-                return None
-                
-            # Process the largest face found
-            x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
-            face_coords = (x, y, w, h)
-            
-            # NEW: Check face quality before processing
-            face_region = frame[y:y+h, x:x+w]
-            face_quality = self._check_face_quality(face_region)
-            if face_quality < 0.5:  # Skip low quality faces
-                logging.debug(f"Low quality face detected (quality: {face_quality:.2f}), skipping")
-                return None
-            
-            # Get face encoding for recognition
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_locations = [(y, x + w, y + h, x)]  # Convert to face_recognition format
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-            
-            if not face_encodings:
-                logging.debug("No face encodings found")
-                return None
-                
-            face_encoding = face_encodings[0]
-            
-            # Find matching soldier with improved tolerance and distance calculation
-            matches = face_recognition.compare_faces(known_face_encodings, face_encoding, tolerance=0.6)
-            
-            if not any(matches):
-                # Try with higher tolerance for better recognition
-                matches = face_recognition.compare_faces(known_face_encodings, face_encoding, tolerance=0.7)
-                
-                if not any(matches):
-                    logging.debug("Face detected but not recognized as any known soldier")
-                    return None
-            
-            # Get the best match based on face distance
-            face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-            best_match_index = np.argmin(face_distances)
+            # One model snapshot for the whole frame, so a concurrent refresh cannot mix versions
+            models = self.model_registry.current()
             
-            # Verify the match is within reasonable distance
-            if face_distances[best_match_index] > 0.7:  # Too far, likely not a match
-                logging.debug(f"Best match distance too high: {face_distances[best_match_index]:.3f}")
-                return None
+            # Get current face recognition index (built once per model version)
+            face_index = self._get_current_face_index(models)
             
-            force_id = known_force_ids[best_match_index]
-            logging.debug(f"Recognized soldier {force_id} with distance {face_distances[best_match_index]:.3f}")
-            
-            # Extract and preprocess face region for emotion detection
-            roi_gray = gray[y:y+h, x:x+w]
-            roi_gray = cv2.resize(roi_gray, (48, 48))
-            
-            # Enhance contrast using histogram equalization
-            roi_gray = cv2.equalizeHist(roi_gray)
+            if face_index is None or len(face_index) == 0:
+                logging.warning("No face recognition model available")
+                return []
             
-            # Normalize pixel values
-            roi_gray = roi_gray.astype('float')/255.0
-            roi_gray = np.expand_dims(roi_gray, axis=0)
-            roi_gray = np.expand_dims(roi_gray, axis=-1)
+            # Detect on a downscaled gray level; boxes come back in full-resolution coordinates
+            level = detection_level(frame, settings.FACE_DETECTION_WIDTH)
+            faces = detect_faces(models.face_cascade, frame, settings.FACE_DETECTION_WIDTH, min_size=30, level=level)
             
-            # Get emotion predictions
-            emotion_prediction = self.emotion_model.predict(roi_gray, verbose=0)[0]
+            # Tracks keep their identity across frames (and across brief detection misses)
+            tracker = tracker or self.face_tracker
+            tracks = tracker.update(faces, level)
             
-            # Get top 2 emotions and their probabilities
-            top_2_idx = np.argsort(emotion_prediction)[-2:][::-1]
-            top_2_probs = emotion_prediction[top_2_idx]
+            # Process the largest faces first
+            tracks = sorted(tracks, key=lambda t: t.box[2] * t.box[3], reverse=True)[:max_faces]
             
-            # Log probabilities for debugging
-            emotions_probs = {self.emotion_dict[i]: f"{emotion_prediction[i]:.3f}" 
-                             for i in range(len(emotion_prediction))}
-            logging.debug(f"Emotion probabilities for {force_id}: {emotions_probs}")
+            identified, rois = [], []
+            for track in tracks:
+                x, y, w, h = track.box
+                face_coords = (x, y, w, h)
+                
+                # Only the face region is converted from here on (full resolution for accuracy)
+                face_gray = cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY)
+                
+                # NEW: Check face quality before processing
+                face_quality = self._check_face_quality(face_gray)
+                if face_quality < 0.5:  # Skip low quality faces
+                    logging.debug(f"Low quality face detected (quality: {face_quality:.2f}), skipping")
+                    continue
+                
+                force_id = self._identify_track(tracker, track, frame, face_coords, face_index, models.face_model_generation)
+                if force_id is None:
+                    continue
+                
+                identified.append((force_id, face_coords))
+                rois.append(self._preprocess_emotion_roi(face_gray))
             
-            # Enhanced emotion selection logic
-            emotion_label = self._select_emotion_label(emotion_prediction, top_2_idx, top_2_probs)
+            if not identified:
+                return []
             
-            depression_score = self.emotion_mapping[emotion_label]
+            # Get emotion predictions for every face in one batched forward pass
+            emotion_predictions = self.emotion_batcher.predict(models.emotion_model, np.stack(rois))
             
-            logging.info(f"Detected soldier {force_id} with {emotion_label} emotion (score: {depression_score}, confidence: {top_2_probs[0]:.3f})")
+            results = []
+            for (force_id, face_coords), emotion_prediction in zip(identified, emotion_predictions):
+                # Get top 2 emotions and their probabilities
+                top_2_idx = np.argsort(emotion_prediction)[-2:][::-1]
+                top_2_probs = emotion_prediction[top_2_idx]
+                
+                # Log probabilities for debugging
+                emotions_probs = {self.emotion_dict[i]: f"{emotion_prediction[i]:.3f}" 
+                                 for i in range(len(emotion_prediction))}
+                logging.debug(f"Emotion probabilities for {force_id}: {emotions_probs}")
+                
+                # Enhanced emotion selection logic
+                emotion_label = self._select_emotion_label(emotion_prediction, top_2_idx, top_2_probs)
+                
+                depression_score = self.emotion_mapping[emotion_label]
+                
+                logging.info(f"Detected soldier {force_id} with {emotion_label} emotion (score: {depression_score}, confidence: {top_2_probs[0]:.3f})")
+                
+                results.append((force_id, emotion_label, float(depression_score), face_coords))
             
-            return force_id, emotion_label, float(depression_score), face_coords
+            return results
             
         except Exception as e:
-            logging.error(f"Error in detect_face_and_emotion: {e}")
+            logging.error(f"Error in detect_faces_and_emotions: {e}")
+            return []
+    
+    def _preprocess_emotion_roi(self, face_gray: np.ndarray) -> np.ndarray:
+        """48x48x1 emotion network input from a gray face crop"""
+        # Extract and preprocess face region for emotion detection
+        roi_gray = cv2.resize(face_gray, (48, 48))
+        
+        # Enhance contrast using histogram equalization
+        roi_gray = cv2.equalizeHist(roi_gray)
+        
+        # Normalize pixel values
+        roi_gray = roi_gray.astype(np.float32) / 255.0
+        return roi_gray[:, :, np.newaxis]
+    
+    def _identify_track(self, tracker, track, frame, face_coords, face_index, gallery_generation) -> Optional[str]:
+        """force_id of a tracked face, running the face encoder only if the track needs (re-)identification"""
+        if not tracker.needs_identification(track, gallery_generation):
+            return track.force_id
+        
+        # Get face encoding for recognition from the face crop plus some context for the landmarks
+        face_crop, face_location = padded_roi(frame, face_coords)
+        rgb_crop = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
+        face_encodings = face_recognition.face_encodings(rgb_crop, [face_location])
+        
+        if not face_encodings:
+            logging.debug("No face encodings found")
             return None
+        
+        # Find matching soldier: one vectorized pass over every gallery encoding
+        match = face_index.search(face_encodings[0])
+        
+        # Verify the match is within reasonable distance
+        if match is None or match.distance > 0.7:  # Too far, likely not a match
+            if match is not None:
+                logging.debug(f"Best match distance too high: {match.distance:.3f}")
+            tracker.identify(track, None, gallery_generation=gallery_generation)
+            return None
+        
+        logging.debug(f"Recognized soldier {match.force_id} with distance {match.distance:.3f} (margin {match.margin:.3f}), track {track.track_id}")
+        tracker.identify(track, match.force_id, match.distance, gallery_generation)
+        return match.force_id
     
     def _select_emotion_label(self, emotion_prediction: np.ndarray, top_2_idx: np.ndarray, top_2_probs: np.ndarray) -> str:
         """
@@ -421,13 +390,15 @@ class EnhancedEmotionDetectionService:
             face_model_status = self.model_refresh_service.get_model_status()
             
             # Check emotion model
-            emotion_model_loaded = hasattr(self, 'emotion_model') and self.emotion_model is not None
-            face_detector_loaded = hasattr(self, 'face_detector') and self.face_detector is not None
+            emotion_model_loaded = self.emotion_model is not None
+            face_detector_loaded = self.face_detector is not None
             
             return {
                 "face_recognition_model": face_model_status,
                 "emotion_model_loaded": emotion_model_loaded,
                 "face_detector_loaded": face_detector_loaded,
+                "face_tracking": self.face_tracker.stats(),
+                "emotion_batching": self.emotion_batcher.stats(),
                 "system_operational": (
                     face_model_status.get("model_loaded", False) and
                     emotion_model_loaded and
@@ -223,8 +223,7 @@ class EnhancedFaceRecognitionService:
     def _get_existing_soldiers(self) -> List[str]:
         """Get list of soldiers already in the model"""
         try:
-            _, force_ids = self.model_manager.load_model_with_validation()
-            return force_ids or []
+            return self.model_manager.get_soldier_ids()
         except:
             return []
 
@@ -234,8 +233,7 @@ class EnhancedFaceRecognitionService:
         """
         try:
             # Get soldiers from PKL model
-            _, pkl_force_ids = self.model_manager.load_model_with_validation()
-            pkl_soldiers = set(pkl_force_ids or [])
+            pkl_soldiers = set(self.model_manager.get_soldier_ids())
             
             # Get soldiers from database
             conn = get_connection()
@@ -0,0 +1,177 @@
+"""
+Approximate nearest-neighbour (IVF) backend for large soldier galleries.
+
+The gallery is partitioned with k-means into `nlist` inverted lists. A query
+ranks the centroids and scans only the `nprobe` closest lists, so the work per
+face grows with N / nlist * nprobe instead of N. Rows are stored sorted by
+list, so every probed list is a contiguous slice of one float32 matrix.
+"""
+import logging
+import time
+from typing import List, Optional, Sequence
+import numpy as np
+from services.face_gallery_index import ENCODING_DIM, GalleryIndex, GalleryMatch, group_by_label
+
+
+def _squared_distances(rows: np.ndarray, row_sq_norms: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """(len(rows), len(points)) squared Euclidean distances"""
+    sq = row_sq_norms[:, None] - 2.0 * (rows @ points.T) + np.einsum('ij,ij->i', points, points)[None, :]
+    np.maximum(sq, 0.0, out=sq)
+    return sq
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid of every row, in chunks that keep the distance block near 64MB"""
+    sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+    assignment = np.empty(len(matrix), dtype=np.int32)
+    chunk_size = max(1024, (1 << 24) // max(1, len(centroids)))
+    for start in range(0, len(matrix), chunk_size):
+        end = start + chunk_size
+        assignment[start:end] = np.argmin(_squared_distances(matrix[start:end], sq_norms[start:end], centroids), axis=1)
+    return assignment
+
+
+def train_kmeans(matrix: np.ndarray, nlist: int, iterations: int = 10, sample_size: Optional[int] = None,
+                 seed: int = 0) -> np.ndarray:
+    """
+    Lloyd's k-means on a random sample of the gallery.
+
+    Returns:
+        np.ndarray: (nlist, 128) float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = sample_size or min(len(matrix), nlist * 64)
+    sample = matrix[rng.choice(len(matrix), size=min(sample_size, len(matrix)), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = _assign(sample, centroids)
+        counts = np.bincount(assignment, minlength=nlist)
+
+        # Per-list sums with one sort + reduceat instead of a scatter-add
+        order = np.argsort(assignment, kind='stable')
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        empty = counts == 0
+        sums = np.add.reduceat(sample[order], starts[~empty], axis=0)
+        centroids[~empty] = sums / counts[~empty, None]
+        if empty.any():
+            # Re-seed empty lists from random sample points
+            centroids[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+
+    return centroids.astype(np.float32)
+
+
+class IVFGalleryIndex(GalleryIndex):
+    """Inverted-file (k-means partitioned) approximate gallery index"""
+
+    def __init__(self, matrix: np.ndarray, labels: np.ndarray, force_ids: Sequence[str], centroids: np.ndarray,
+                 list_offsets: np.ndarray, nprobe: int = 8, version: Optional[str] = None):
+        """
+        Args:
+            matrix: (N, 128) encodings sorted by inverted list
+            labels: (N,) int label per row
+            force_ids: force_id for each label value
+            centroids: (nlist, 128) list centroids
+            list_offsets: (nlist + 1,) start row of each list
+            nprobe: number of lists scanned per query
+            version: model version the index was built from
+        """
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.labels = np.ascontiguousarray(labels, dtype=np.int32)
+        self.force_ids = list(force_ids)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.list_offsets = np.asarray(list_offsets, dtype=np.int64)
+        self.nprobe = max(1, min(int(nprobe), len(self.centroids))) if len(self.centroids) else 0
+        self.version = version
+        self._sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+        self._centroid_sq_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+    @classmethod
+    def build(cls, encodings: List, force_ids: List[str], version: Optional[str] = None, nlist: Optional[int] = None,
+              nprobe: int = 8, iterations: int = 10, seed: int = 0) -> 'IVFGalleryIndex':
+        """
+        Build from the FaceModelManager format.
+
+        Args:
+            nlist: number of inverted lists (default sqrt(N))
+            nprobe: lists scanned per query; higher is slower and more accurate
+            iterations: k-means iterations
+        """
+        if encodings is None or len(encodings) == 0:
+            empty = np.empty((0, ENCODING_DIM), dtype=np.float32)
+            return cls(empty, np.empty(0, dtype=np.int32), [], empty, np.zeros(1, dtype=np.int64), nprobe, version)
+
+        matrix, labels, unique_ids = group_by_label(encodings, force_ids)
+        return cls.from_grouped(matrix, labels, unique_ids, version, nlist, nprobe, iterations, seed)
+
+    @classmethod
+    def from_grouped(cls, matrix: np.ndarray, labels: np.ndarray, force_ids: Sequence[str],
+                     version: Optional[str] = None, nlist: Optional[int] = None, nprobe: int = 8,
+                     iterations: int = 10, seed: int = 0) -> 'IVFGalleryIndex':
+        """Build from label-grouped arrays (as stored on disk)"""
+        if not len(matrix):
+            empty = np.empty((0, ENCODING_DIM), dtype=np.float32)
+            return cls(empty, np.empty(0, dtype=np.int32), [], empty, np.zeros(1, dtype=np.int64), nprobe, version)
+
+        start = time.time()
+        matrix = np.asarray(matrix, dtype=np.float32)
+        labels = np.asarray(labels, dtype=np.int32)
+        nlist = min(len(matrix), nlist or max(1, int(np.sqrt(len(matrix)))))
+
+        centroids = train_kmeans(matrix, nlist, iterations=iterations, seed=seed)
+        assignment = _assign(matrix, centroids)
+        order = np.argsort(assignment, kind='stable')
+        list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=nlist))))
+
+        logging.info(f"IVF face index trained - {len(matrix)} encodings, {nlist} lists in {time.time() - start:.2f}s")
+        return cls(matrix[order], labels[order], force_ids, centroids, list_offsets, nprobe, version)
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def search(self, encoding: np.ndarray, nprobe: Optional[int] = None) -> Optional[GalleryMatch]:
+        """Closest soldier among the rows of the nprobe nearest lists"""
+        if not len(self.matrix):
+            return None
+
+        query = np.asarray(encoding, dtype=np.float32)
+        query_sq = float(query @ query)
+        nprobe = max(1, min(nprobe or self.nprobe, len(self.centroids)))
+
+        centroid_sq = self._centroid_sq_norms - 2.0 * (self.centroids @ query) + query_sq
+        probes = np.argpartition(centroid_sq, nprobe - 1)[:nprobe] if nprobe < len(self.centroids) else np.arange(len(self.centroids))
+
+        rows = np.concatenate([np.arange(self.list_offsets[p], self.list_offsets[p + 1]) for p in probes])
+        if not len(rows):
+            return None
+
+        candidates = self.matrix[rows]
+        sq = self._sq_norms[rows] - 2.0 * (candidates @ query) + query_sq
+        np.maximum(sq, 0.0, out=sq)
+        distances = np.sqrt(sq)
+        candidate_labels = self.labels[rows]
+        if self._excluded_labels is not None:
+            distances[self._excluded_labels[candidate_labels]] = np.inf
+
+        best_row = int(np.argmin(distances))
+        if not np.isfinite(distances[best_row]):
+            return None
+        best_label = candidate_labels[best_row]
+        others = distances[candidate_labels != best_label]
+        margin = float(others.min() - distances[best_row]) if len(others) else float('inf')
+
+        return GalleryMatch(self.force_ids[best_label], float(distances[best_row]), margin)
+
+    def describe(self) -> dict:
+        sizes = np.diff(self.list_offsets)
+        return {
+            'type': 'ivf',
+            'version': self.version,
+            'encodings': len(self.matrix),
+            'soldiers': self.soldier_count,
+            'excluded': len(self.excluded),
+            'nlist': len(self.centroids),
+            'nprobe': self.nprobe,
+            'max_list_size': int(sizes.max()) if len(sizes) else 0,
+            'memory_bytes': int(self.matrix.nbytes + self.labels.nbytes + self.centroids.nbytes)
+        }
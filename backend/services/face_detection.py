@@ -0,0 +1,101 @@
+"""
+Multi-resolution face detection helpers.
+
+Haar detection runs on a downscaled gray copy of the frame (one pyramid level
+at most FACE_DETECTION_WIDTH pixels wide); the boxes are mapped back to
+full-resolution coordinates, and only the face region is cropped and
+converted for encoding and emotion analysis. Resizing and converting a
+whole 640x480+ frame twice per call was most of the per-frame CPU outside
+the models themselves.
+"""
+from typing import List, Tuple
+import cv2
+import numpy as np
+
+HAAR_WINDOW = 24  # The frontal face cascade's native window; smaller minSize values are ignored
+
+
+def detection_scale(frame_width: int, detection_width: int) -> float:
+    """Downscale factor (<= 1) that brings the frame to at most detection_width pixels"""
+    if not detection_width or frame_width <= detection_width:
+        return 1.0
+    return detection_width / float(frame_width)
+
+
+def detection_level(frame: np.ndarray, detection_width: int) -> Tuple[np.ndarray, float]:
+    """
+    Downscaled gray copy of a BGR frame
+
+    Returns:
+        Tuple of (gray level, scale from full resolution to the level)
+    """
+    height, width = frame.shape[:2]
+    scale = detection_scale(width, detection_width)
+
+    # Downscale the colour frame first (INTER_AREA), so the gray conversion only touches the small level
+    small = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    return gray, scale
+
+
+def detect_faces(cascade, frame: np.ndarray, detection_width: int, scale_factor: float = 1.1,
+                 min_neighbors: int = 5, min_size: int = 30, level=None) -> List[Tuple[int, int, int, int]]:
+    """
+    Detect faces on a downscaled gray copy of a BGR frame
+
+    Args:
+        cascade: cv2.CascadeClassifier
+        frame: Full-resolution BGR frame
+        detection_width: Width of the detection level (0 = full resolution)
+        min_size: Smallest face to find, in full-resolution pixels
+        level: (gray, scale) from detection_level() if the caller already computed it
+
+    Returns:
+        List of (x, y, w, h) boxes in full-resolution coordinates
+    """
+    height, width = frame.shape[:2]
+    gray, scale = level if level is not None else detection_level(frame, detection_width)
+
+    level_min_size = max(HAAR_WINDOW, int(round(min_size * scale)))
+    faces = cascade.detectMultiScale(
+        gray,
+        scaleFactor=scale_factor,
+        minNeighbors=min_neighbors,
+        minSize=(level_min_size, level_min_size)
+    )
+    if len(faces) == 0:
+        return []
+    return [scale_box(face, 1.0 / scale, width, height) for face in faces]
+
+
+def scale_box(box, factor: float, frame_width: int, frame_height: int) -> Tuple[int, int, int, int]:
+    """Map an (x, y, w, h) box between pyramid levels, clipped to the frame"""
+    x, y, w, h = (int(round(v * factor)) for v in box)
+    x, y = max(0, x), max(0, y)
+    return x, y, min(w, frame_width - x), min(h, frame_height - y)
+
+
+def padded_roi(frame: np.ndarray, box, padding: float = 0.25):
+    """
+    Crop a face box with some context around it
+
+    Returns:
+        Tuple of (crop, (top, right, bottom, left) of the face inside the crop)
+    """
+    x, y, w, h = box
+    frame_height, frame_width = frame.shape[:2]
+    pad_x, pad_y = int(w * padding), int(h * padding)
+    x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+    x1, y1 = min(frame_width, x + w + pad_x), min(frame_height, y + h + pad_y)
+    return frame[y0:y1, x0:x1], (y - y0, x + w - x0, y + h - y0, x - x0)
+
+
+def iou(a, b) -> float:
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
@@ -0,0 +1,411 @@
+"""
+Vectorized nearest-neighbour index over the soldier face gallery.
+
+The gallery (every stored encoding of every soldier, ~12 per soldier) is held
+as one contiguous float32 (N x 128) matrix with an int label per row, built
+once per model version. A query is a single matrix-vector pass that returns
+the closest soldier, the distance and the margin to the runner-up soldier.
+
+FaceGalleryIndex is the exact backend. CentroidPrefilterIndex shortlists
+soldiers by centroid before exact matching, and services.face_ann_index
+provides an approximate IVF backend for very large galleries, all behind the
+same interface. SegmentedGalleryIndex combines one index per model segment.
+"""
+import copy
+import logging
+from typing import List, NamedTuple, Optional, Sequence
+import numpy as np
+
+ENCODING_DIM = 128
+
+
+class GalleryMatch(NamedTuple):
+    """Best gallery match for one face encoding"""
+    force_id: str
+    distance: float
+    margin: float  # distance gap to the nearest *other* soldier (inf if only one soldier)
+
+
+class GalleryIndex:
+    """
+    Common interface of the gallery index backends.
+
+    Every backend is built either from the FaceModelManager format (parallel
+    lists of encodings and force_ids) with build(), or from label-grouped
+    arrays with from_grouped(), and answers search() with a GalleryMatch.
+    """
+
+    force_ids: List[str]
+    version: Optional[str]
+    excluded = frozenset()  # soldiers removed with without()
+    _excluded_labels = None  # bool mask over label values, None when nothing is excluded
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @property
+    def soldier_count(self) -> int:
+        return len(self.force_ids) - len(self.excluded)
+
+    def without(self, force_ids) -> 'GalleryIndex':
+        """
+        View of the index that never matches the given soldiers. It shares the
+        arrays, so removing soldiers costs O(soldiers) instead of a rebuild.
+        """
+        view = copy.copy(self)
+        label_of = {fid: label for label, fid in enumerate(self.force_ids)}
+        view.excluded = frozenset(fid for fid in force_ids if fid in label_of)
+        if view.excluded:
+            view._excluded_labels = np.zeros(len(self.force_ids), dtype=bool)
+            view._excluded_labels[[label_of[fid] for fid in view.excluded]] = True
+        else:
+            view._excluded_labels = None
+        return view
+
+    def search(self, encoding: np.ndarray) -> Optional[GalleryMatch]:
+        """Closest soldier for one encoding, or None for an empty gallery"""
+        raise NotImplementedError
+
+    def describe(self) -> dict:
+        raise NotImplementedError
+
+
+def group_by_label(encodings: List, force_ids: List[str]):
+    """
+    Convert parallel encoding/force_id lists to a float32 matrix whose rows are
+    grouped by an int label, plus the force_id of each label.
+    """
+    unique_ids, labels = np.unique(np.asarray(force_ids), return_inverse=True)
+    order = np.argsort(labels, kind='stable')
+    matrix = np.asarray(encodings, dtype=np.float32)[order]
+    return matrix, labels[order].astype(np.int32), [str(fid) for fid in unique_ids]
+
+
+def label_blocks(labels: np.ndarray):
+    """Start row and row count of each label's block in a label-grouped matrix"""
+    if not len(labels):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    counts = np.diff(np.r_[starts, len(labels)])
+    return starts, counts
+
+
+def compute_centroids(matrix: np.ndarray, labels: np.ndarray):
+    """
+    Per-soldier centroid and radius of a label-grouped gallery.
+
+    The radius is the largest distance from the centroid to any of the
+    soldier's encodings, so |q - c| - r is a lower bound on the distance from
+    q to every encoding of that soldier.
+
+    Returns:
+        tuple: ((S, 128) float32 centroids, (S,) float32 radii), one per label block
+    """
+    starts, counts = label_blocks(labels)
+    if not len(starts):
+        return np.empty((0, ENCODING_DIM), dtype=np.float32), np.empty(0, dtype=np.float32)
+    centroids = (np.add.reduceat(matrix, starts, axis=0) / counts[:, None]).astype(np.float32)
+    spread = np.linalg.norm(matrix - np.repeat(centroids, counts, axis=0), axis=1)
+    radii = np.maximum.reduceat(spread, starts).astype(np.float32)
+    return centroids, radii
+
+
+class FaceGalleryIndex(GalleryIndex):
+    """Exact (brute-force) face gallery index"""
+
+    def __init__(self, matrix: np.ndarray, labels: np.ndarray, force_ids: Sequence[str], version: Optional[str] = None):
+        """
+        Args:
+            matrix: (N, 128) encodings, rows grouped by label
+            labels: (N,) int label per row, non-decreasing
+            force_ids: force_id for each label value
+            version: model version the index was built from
+        """
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.labels = np.ascontiguousarray(labels, dtype=np.int32)
+        self.force_ids = list(force_ids)
+        self.version = version
+
+        if self.matrix.ndim != 2 or (len(self.matrix) and self.matrix.shape[1] != ENCODING_DIM):
+            raise ValueError(f"Expected (N, {ENCODING_DIM}) encodings, got {self.matrix.shape}")
+        if len(self.labels) != len(self.matrix):
+            raise ValueError("Label count does not match encoding count")
+
+        self._sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+        # Start row of each label's block, for per-soldier minima in one reduceat
+        self._label_starts, self._label_counts = label_blocks(self.labels)
+        self._block_labels = self.labels[self._label_starts]
+
+    @classmethod
+    def build(cls, encodings: List, force_ids: List[str], version: Optional[str] = None) -> 'FaceGalleryIndex':
+        """
+        Build from the FaceModelManager format: parallel lists with one force_id
+        per encoding (a soldier appears once for each of their encodings).
+        """
+        if encodings is None or len(encodings) == 0:
+            return cls(np.empty((0, ENCODING_DIM), dtype=np.float32), np.empty(0, dtype=np.int32), [], version)
+
+        matrix, labels, unique_ids = group_by_label(encodings, force_ids)
+        return cls.from_grouped(matrix, labels, unique_ids, version)
+
+    @classmethod
+    def from_grouped(cls, matrix: np.ndarray, labels: np.ndarray, force_ids: Sequence[str],
+                     version: Optional[str] = None) -> 'FaceGalleryIndex':
+        """Build from label-grouped arrays (as stored on disk) without regrouping or copying"""
+        return cls(matrix, labels, force_ids, version)
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def encodings_for(self, force_id: str) -> np.ndarray:
+        """All gallery encodings of one soldier"""
+        try:
+            label = self.force_ids.index(force_id)
+        except ValueError:
+            return np.empty((0, ENCODING_DIM), dtype=np.float32)
+        return self.matrix[self.labels == label]
+
+    def distances(self, encoding: np.ndarray) -> np.ndarray:
+        """Euclidean distance from encoding to every gallery row (same metric as face_recognition.face_distance)"""
+        query = np.asarray(encoding, dtype=np.float32)
+        sq = self._sq_norms - 2.0 * (self.matrix @ query) + float(query @ query)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq)
+
+    def search(self, encoding: np.ndarray) -> Optional[GalleryMatch]:
+        """Closest soldier for one encoding, or None for an empty gallery"""
+        if not len(self.matrix):
+            return None
+
+        # Minimum distance per soldier, then best and runner-up soldier
+        per_soldier = np.minimum.reduceat(self.distances(encoding), self._label_starts)
+        if self._excluded_labels is not None:
+            per_soldier[self._excluded_labels[self._block_labels]] = np.inf
+        if len(per_soldier) == 1:
+            best, margin = 0, float('inf')
+        else:
+            top2 = np.argpartition(per_soldier, 1)[:2]
+            best, second = (top2[0], top2[1]) if per_soldier[top2[0]] <= per_soldier[top2[1]] else (top2[1], top2[0])
+            margin = float(per_soldier[second] - per_soldier[best])
+
+        if not np.isfinite(per_soldier[best]):
+            return None
+        return GalleryMatch(self.force_ids[self._block_labels[best]], float(per_soldier[best]), margin)
+
+    def describe(self) -> dict:
+        return {
+            'type': 'exact',
+            'version': self.version,
+            'encodings': len(self.matrix),
+            'soldiers': self.soldier_count,
+            'excluded': len(self.excluded),
+            'memory_bytes': int(self.matrix.nbytes + self.labels.nbytes)
+        }
+
+
+class CentroidPrefilterIndex(FaceGalleryIndex):
+    """
+    Two-stage matcher: centroid shortlist, then exact distances.
+
+    Stage one scores the query against one centroid per soldier using the
+    lower bound max(|q - c| - r, 0). Stage two computes exact distances only
+    for the encodings of the `shortlist` best soldiers. The shortlist grows
+    until no soldier outside it could be closer than the best match found,
+    or could fall within `max_distance` at all (so accept/reject decisions
+    at that tolerance are the same as the exact index).
+    """
+
+    def __init__(self, matrix: np.ndarray, labels: np.ndarray, force_ids: Sequence[str], version: Optional[str] = None,
+                 centroids: Optional[np.ndarray] = None, radii: Optional[np.ndarray] = None,
+                 shortlist: int = 16, max_distance: float = 0.7):
+        super().__init__(matrix, labels, force_ids, version)
+        if centroids is None or radii is None or len(centroids) != len(self._label_starts):
+            centroids, radii = compute_centroids(self.matrix, self.labels)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.radii = np.ascontiguousarray(radii, dtype=np.float32)
+        self.shortlist = max(1, int(shortlist))
+        self.max_distance = float(max_distance)
+        self._centroid_sq_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+    @classmethod
+    def build(cls, encodings: List, force_ids: List[str], version: Optional[str] = None,
+              centroids: Optional[dict] = None, shortlist: int = 16, max_distance: float = 0.7) -> 'CentroidPrefilterIndex':
+        """
+        Args:
+            centroids: Precomputed {'force_ids', 'centroids', 'radii'} from
+                FaceModelManager.load_centroids(); recomputed if missing or stale
+            shortlist: soldiers scored exactly in the first stage-two pass
+            max_distance: match tolerance used by the recognizer
+        """
+        if encodings is None or len(encodings) == 0:
+            empty = np.empty((0, ENCODING_DIM), dtype=np.float32)
+            return cls(empty, np.empty(0, dtype=np.int32), [], version, shortlist=shortlist, max_distance=max_distance)
+
+        matrix, labels, unique_ids = group_by_label(encodings, force_ids)
+        return cls.from_grouped(matrix, labels, unique_ids, version, centroids, shortlist, max_distance)
+
+    @classmethod
+    def from_grouped(cls, matrix: np.ndarray, labels: np.ndarray, force_ids: Sequence[str],
+                     version: Optional[str] = None, centroids: Optional[dict] = None, shortlist: int = 16,
+                     max_distance: float = 0.7) -> 'CentroidPrefilterIndex':
+        block_centroids = block_radii = None
+        if centroids and list(centroids.get('force_ids', [])) == list(force_ids):
+            block_centroids, block_radii = centroids['centroids'], centroids['radii']
+        return cls(matrix, labels, force_ids, version, block_centroids, block_radii, shortlist, max_distance)
+
+    def search(self, encoding: np.ndarray, shortlist: Optional[int] = None) -> Optional[GalleryMatch]:
+        if not len(self.matrix):
+            return None
+
+        query = np.asarray(encoding, dtype=np.float32)
+        query_sq = float(query @ query)
+        soldiers = len(self.centroids)
+
+        # Stage one: O(soldiers) lower bounds from centroid distance minus radius
+        centroid_sq = self._centroid_sq_norms - 2.0 * (self.centroids @ query) + query_sq
+        lower_bounds = np.maximum(np.sqrt(np.maximum(centroid_sq, 0.0)) - self.radii, 0.0)
+        if self._excluded_labels is not None:
+            lower_bounds[self._excluded_labels[self._block_labels]] = np.inf
+
+        k = min(shortlist or self.shortlist, soldiers)
+        while True:
+            blocks = np.argpartition(lower_bounds, k - 1)[:k] if k < soldiers else np.arange(soldiers)
+
+            # Stage two: exact distances over the shortlisted soldiers' encodings only
+            counts = self._label_counts[blocks]
+            offsets = np.cumsum(counts) - counts
+            rows = np.arange(counts.sum()) - np.repeat(offsets, counts) + np.repeat(self._label_starts[blocks], counts)
+            sq = self._sq_norms[rows] - 2.0 * (self.matrix[rows] @ query) + query_sq
+            per_soldier = np.sqrt(np.maximum(np.minimum.reduceat(sq, offsets), 0.0))
+            if self._excluded_labels is not None:
+                per_soldier[self._excluded_labels[self._block_labels[blocks]]] = np.inf
+
+            order = np.argsort(per_soldier)[:2]
+            best_distance = float(per_soldier[order[0]])
+            if k >= soldiers:
+                break
+            next_bound = float(np.partition(lower_bounds, k)[k])
+            if best_distance <= next_bound or next_bound > self.max_distance:
+                break
+            k = min(k * 2, soldiers)
+
+        if not np.isfinite(best_distance):
+            return None
+        margin = float(per_soldier[order[1]] - best_distance) if len(order) > 1 else float('inf')
+        return GalleryMatch(self.force_ids[self._block_labels[blocks[order[0]]]], best_distance, margin)
+
+    def describe(self) -> dict:
+        info = super().describe()
+        info.update({'type': 'centroid', 'shortlist': self.shortlist, 'max_distance': self.max_distance})
+        return info
+
+
+class SegmentedGalleryIndex(GalleryIndex):
+    """
+    Gallery split into independently built per-segment indexes (one per
+    segment of the face model store). Soldiers are unique across segments,
+    so the best match is the best per-segment match and the runner-up is the
+    closest of that segment's runner-up and the other segments' best matches.
+    """
+
+    def __init__(self, parts: Sequence[GalleryIndex], version: Optional[str] = None):
+        self.parts = [part for part in parts if len(part)]
+        self.force_ids = [fid for part in self.parts for fid in part.force_ids if fid not in part.excluded]
+        self.version = version
+
+    def __len__(self) -> int:
+        return sum(len(part) for part in self.parts)
+
+    def search(self, encoding: np.ndarray) -> Optional[GalleryMatch]:
+        if len(self.parts) == 1:
+            return self.parts[0].search(encoding)
+
+        matches = [match for match in (part.search(encoding) for part in self.parts) if match is not None]
+        if not matches:
+            return None
+
+        matches.sort(key=lambda match: match.distance)
+        best = matches[0]
+        runner_up = best.distance + best.margin
+        if len(matches) > 1:
+            runner_up = min(runner_up, matches[1].distance)
+        return GalleryMatch(best.force_id, best.distance, runner_up - best.distance)
+
+    def without(self, force_ids) -> 'SegmentedGalleryIndex':
+        removed = set(force_ids)
+        return SegmentedGalleryIndex([part.without(part.excluded | removed) for part in self.parts], self.version)
+
+    def describe(self) -> dict:
+        parts = [part.describe() for part in self.parts]
+        return {
+            'type': 'segmented',
+            'version': self.version,
+            'encodings': len(self),
+            'soldiers': self.soldier_count,
+            'segments': parts,
+            'memory_bytes': sum(part.get('memory_bytes', 0) for part in parts)
+        }
+
+
+def build_gallery_index(encodings: List, force_ids: List[str], version: Optional[str] = None,
+                        backend: Optional[str] = None, centroids: Optional[dict] = None) -> Optional[GalleryIndex]:
+    """
+    Build the gallery index, logging instead of raising on malformed model data.
+
+    Args:
+        encodings: Gallery encodings (FaceModelManager format)
+        force_ids: force_id of each encoding
+        version: Model version the index is built from
+        backend: 'exact', 'centroid', 'ivf' or 'auto' (default: FACE_INDEX_BACKEND
+            setting). 'auto' uses the two-stage centroid matcher from
+            FACE_INDEX_CENTROID_MIN_ENCODINGS encodings and the approximate IVF
+            index from FACE_INDEX_IVF_MIN_ENCODINGS encodings.
+        centroids: Per-soldier centroids saved with the model (centroid backend)
+
+    Returns:
+        GalleryIndex or None if the model data could not be indexed
+    """
+    try:
+        if encodings is None or len(encodings) == 0:
+            matrix, labels, unique_ids = np.empty((0, ENCODING_DIM), dtype=np.float32), np.empty(0, dtype=np.int32), []
+        else:
+            matrix, labels, unique_ids = group_by_label(encodings, force_ids)
+    except Exception as e:
+        logging.error(f"Error building face gallery index: {e}")
+        return None
+    return build_gallery_index_grouped(matrix, labels, unique_ids, version, backend, centroids)
+
+
+def build_gallery_index_grouped(matrix: np.ndarray, labels: np.ndarray, force_ids: Sequence[str],
+                                version: Optional[str] = None, backend: Optional[str] = None,
+                                centroids: Optional[dict] = None) -> Optional[GalleryIndex]:
+    """
+    Same as build_gallery_index() for label-grouped arrays, e.g. the
+    memory-mapped arrays returned by FaceModelManager.load_model_arrays().
+    """
+    from config.settings import settings
+
+    backend = (backend or settings.FACE_INDEX_BACKEND).lower()
+    if backend == 'auto':
+        if len(matrix) >= settings.FACE_INDEX_IVF_MIN_ENCODINGS:
+            backend = 'ivf'
+        elif len(matrix) >= settings.FACE_INDEX_CENTROID_MIN_ENCODINGS:
+            backend = 'centroid'
+        else:
+            backend = 'exact'
+
+    try:
+        if backend == 'ivf':
+            from services.face_ann_index import IVFGalleryIndex
+            index = IVFGalleryIndex.from_grouped(matrix, labels, force_ids, version,
+                                                 nprobe=settings.FACE_INDEX_IVF_NPROBE)
+        elif backend == 'centroid':
+            index = CentroidPrefilterIndex.from_grouped(matrix, labels, force_ids, version, centroids=centroids,
+                                                        shortlist=settings.FACE_INDEX_CENTROID_SHORTLIST)
+        else:
+            index = FaceGalleryIndex.from_grouped(matrix, labels, force_ids, version)
+        logging.info(f"Face gallery index built ({backend}) - {len(index)} encodings, {index.soldier_count} soldiers (version {version})")
+        return index
+    except Exception as e:
+        logging.error(f"Error building face gallery index: {e}")
+        return None
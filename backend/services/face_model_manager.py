@@ -1,35 +1,209 @@
 #!/usr/bin/env python3
 """
 Enhanced Face Model Manager with atomic operations, versioning, and validation
+
+Storage layout (format npy-seg-v1), under storage/models/:
+
+    face_model/<segment>/encodings.npy   float32 (n, 128), rows grouped by soldier
+    face_model/<segment>/labels.npy      int32 (n,), index into the segment's force_ids
+    face_model/<segment>/centroids.npy   per-soldier centroids and radii (two-stage matcher)
+    face_model/<segment>/segment.json    segment force_ids, counts and SHA-256 per file
+    face_model_manifest.json             live segments and tombstones
+
+The gallery is an append-only list of immutable segments. Enrolling soldiers
+writes one small segment and deleting soldiers records tombstones in the
+manifest, so both cost O(that soldier's encodings) instead of rewriting the
+whole model. A tombstone hides a soldier in every segment written before it.
+The SegmentCompactor merges segments in the background and drops tombstoned
+rows; replaced segments are deleted after a grace period.
+
+Every change is published by atomically replacing the manifest and bumping
+its generation counter. Listeners registered with add_model_listener() are
+called right after in-process writes, and the ModelChangeWatcher delivers
+other processes' changes, so readers apply deltas within milliseconds. Readers
+memory-map the segment arrays (np.load(mmap_mode='r')), so a load is O(1),
+every process shares the same page cache, and segments already loaded are
+reused on refresh. A legacy face_recognition_model.pkl (or npy-v1 model) is
+migrated to this format on first use, or explicitly with:
+
+    python -m services.face_model_manager
 """
 import pickle
+import ctypes
+import ctypes.util
 import os
+import re
+import select
 import shutil
 import threading
+import time
 import hashlib
 import json
 import glob
 from datetime import datetime
-from typing import List, Tuple, Dict, Optional
+from contextlib import contextmanager
+from typing import Callable, List, NamedTuple, Tuple, Dict, Optional
 import logging
 import numpy as np
+from services.face_gallery_index import ENCODING_DIM, group_by_label, compute_centroids
+
+MODEL_FORMAT = 'npy-seg-v1'
+LEGACY_NPY_FORMAT = 'npy-v1'
+SEGMENT_FILES = {
+    'encodings': 'encodings.npy',
+    'labels': 'labels.npy',
+    'centroids': 'centroids.npy',
+    'radii': 'radii.npy'
+}
+SEGMENT_METADATA = 'segment.json'
+
+
+class _StoreLock:
+    """
+    Reentrant process-wide store lock
+
+    Manifests published while a thread holds it are delivered to the model
+    listeners once that thread's outermost hold is released, so listeners never
+    run under the store lock (a listener taking its own lock could otherwise
+    deadlock against a thread holding that lock and waiting for this one).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._depth = threading.local()
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._depth.value = getattr(self._depth, 'value', 0) + 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth.value -= 1
+        published = None
+        if self._depth.value == 0:
+            published = getattr(_write_state, 'published', None)
+            _write_state.published = None
+        self._lock.release()
+        if published is not None:
+            notify_model_listeners(published)
+
+
+# FaceModelManager is instantiated per request, so writers share one process-wide lock
+_store_lock = _StoreLock()
+_compaction_lock = threading.Lock()
+# Segments are immutable: their metadata is cached by name for the life of the process
+_segment_metadata_cache = {}
+# Model directories whose startup cleanup/migration already ran in this process
+_initialized_model_dirs = set()
+# Change notification: listeners, the last generation delivered, and the manifest a thread published
+_model_listeners = []
+_listeners_lock = threading.Lock()
+_notified_generation = None
+_write_state = threading.local()
+
+
+class ModelSegment(NamedTuple):
+    """Live rows of one gallery segment"""
+    name: str
+    seq: int
+    encodings: np.ndarray  # (n, 128) float32, memory-mapped unless rows were tombstoned
+    labels: np.ndarray  # (n,) int32, grouped, index into force_ids
+    force_ids: List[str]
+    centroids: Dict  # {'force_ids', 'centroids', 'radii'} for the live soldiers
+    hidden: Tuple[str, ...]  # tombstoned soldiers filtered out of this segment
+
+
+def concatenate_segments(segments: List[ModelSegment]):
+    """
+    Merge segments into one label-grouped (matrix, labels, force_ids).
+    Copies the encodings unless there is a single segment.
+    """
+    if not segments:
+        return np.empty((0, ENCODING_DIM), dtype=np.float32), np.empty(0, dtype=np.int32), []
+    if len(segments) == 1:
+        return segments[0].encodings, segments[0].labels, list(segments[0].force_ids)
+    
+    offsets = np.cumsum([0] + [len(s.force_ids) for s in segments[:-1]])
+    matrix = np.concatenate([s.encodings for s in segments])
+    labels = np.concatenate([s.labels + offset for s, offset in zip(segments, offsets)]).astype(np.int32)
+    return matrix, labels, [fid for s in segments for fid in s.force_ids]
+
+
+def live_rows(segment: ModelSegment) -> ModelSegment:
+    """Copy of a segment without the rows of its hidden (tombstoned) soldiers"""
+    if not segment.hidden:
+        return segment
+    
+    hidden = set(segment.hidden)
+    keep = np.array([fid not in hidden for fid in segment.force_ids], dtype=bool)
+    rows = keep[segment.labels]
+    live_labels = (np.cumsum(keep) - 1)[segment.labels[rows]].astype(np.int32)
+    live_ids = [fid for fid, live in zip(segment.force_ids, keep) if live]
+    centroids = {
+        'force_ids': live_ids,
+        'centroids': segment.centroids['centroids'][keep],
+        'radii': segment.centroids['radii'][keep]
+    }
+    return ModelSegment(segment.name, segment.seq, segment.encodings[rows], live_labels, live_ids, centroids, ())
+
+
+def add_model_listener(callback: Callable[[Dict], None]):
+    """
+    Call callback(manifest) after every published model change: right after
+    in-process writes, and for other processes' writes once the
+    ModelChangeWatcher sees them. Callbacks run on the writer's thread.
+    """
+    with _listeners_lock:
+        if callback not in _model_listeners:
+            _model_listeners.append(callback)
+
+
+def remove_model_listener(callback: Callable[[Dict], None]):
+    with _listeners_lock:
+        if callback in _model_listeners:
+            _model_listeners.remove(callback)
+
+
+def notify_model_listeners(manifest: Dict):
+    """Deliver one published manifest to every listener"""
+    global _notified_generation
+    _notified_generation = manifest.get('generation')
+    with _listeners_lock:
+        listeners = list(_model_listeners)
+    for callback in listeners:
+        try:
+            callback(manifest)
+        except Exception as e:
+            logging.error(f"Error in face model listener {getattr(callback, '__name__', callback)}: {e}")
+
 
 class FaceModelManager:
     def __init__(self):
         self.model_dir = os.path.join('storage', 'models')
-        self.model_filename = os.path.join(self.model_dir, 'face_recognition_model.pkl')
-        self.metadata_filename = os.path.join(self.model_dir, 'model_metadata.json')
-        self.lock = threading.RLock()  # Reentrant lock for thread safety
+        self.data_dir = os.path.join(self.model_dir, 'face_model')
+        self.manifest_filename = os.path.join(self.model_dir, 'face_model_manifest.json')
+        self.model_filename = self.manifest_filename  # Replacing the manifest publishes a change
+        self.legacy_model_filename = os.path.join(self.model_dir, 'face_recognition_model.pkl')
+        self.legacy_metadata_filename = os.path.join(self.model_dir, 'model_metadata.json')
+        self.lock = _store_lock
         
         # Ensure directories exist
-        if not os.path.exists(self.model_dir):
-            os.makedirs(self.model_dir)
-                
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+        
         self.setup_logging()
         
+        # FaceModelManager is created per request; clean up and migrate once per process
+        with _store_lock:
+            if self.model_dir in _initialized_model_dirs:
+                return
+            _initialized_model_dirs.add(self.model_dir)
+        
         # Clean up old backups on initialization
         self._cleanup_atomic_backups(keep_count=1)
         self._cleanup_migration_backups(keep_count=1)
+        
+        self.migrate_legacy_model()
     
     def setup_logging(self):
         logging.basicConfig(
@@ -38,45 +212,354 @@ class FaceModelManager:
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
     
-    def _generate_model_hash(self, encodings: List, force_ids: List) -> str:
-        """Generate hash of model data for integrity checking"""
-        # Convert encodings to string representation for hashing
-        encodings_str = str([enc.tolist() if hasattr(enc, 'tolist') else enc for enc in encodings])
-        force_ids_str = str(force_ids)
-        combined_data = encodings_str + force_ids_str
-        return hashlib.sha256(combined_data.encode()).hexdigest()
+    def _generate_model_hash(self, matrix: np.ndarray, labels: np.ndarray, force_ids: List[str]) -> str:
+        """Generate hash of model data for integrity checking (SHA-256 over the raw array bytes)"""
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(matrix, dtype=np.float32).data)
+        digest.update(np.ascontiguousarray(labels, dtype=np.int32).data)
+        digest.update('\n'.join(force_ids).encode())
+        return digest.hexdigest()
     
-    def _create_metadata(self, encodings: List, force_ids: List, version: str) -> Dict:
-        """Create metadata for model version"""
+    def _file_sha256(self, path: str) -> str:
+        """SHA-256 of a file, read in 1MB chunks"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _empty_manifest(self) -> Dict:
         return {
-            'version': version,
-            'timestamp': datetime.now().isoformat(),
-            'soldier_count': len(force_ids),
-            'force_ids': force_ids,
-            'model_hash': self._generate_model_hash(encodings, force_ids),
-            'encoding_dimensions': encodings[0].shape if encodings else None
+            'format': MODEL_FORMAT,
+            'generation': 0,
+            'version': None,
+            'timestamp': None,
+            'next_seq': 1,
+            'segments': [],
+            'tombstones': {},
+            'retired': []
         }
     
-    def _save_metadata(self, metadata: Dict):
-        """Save model metadata"""
-        with open(self.metadata_filename, 'w') as f:
-            json.dump(metadata, f, indent=2)
-    
     def _load_metadata(self) -> Optional[Dict]:
-        """Load model metadata"""
+        """Load the current model manifest"""
         try:
-            if os.path.exists(self.metadata_filename):
-                with open(self.metadata_filename, 'r') as f:
+            if os.path.exists(self.manifest_filename):
+                with open(self.manifest_filename, 'r') as f:
                     return json.load(f)
         except Exception as e:
             logging.error(f"Error loading metadata: {e}")
         return None
     
+    def _read_manifest(self) -> Dict:
+        """Manifest to modify (an empty one if there is no segmented model yet)"""
+        manifest = self._load_metadata()
+        if not manifest or manifest.get('format') == LEGACY_NPY_FORMAT:
+            return self._empty_manifest()
+        if manifest.get('format') != MODEL_FORMAT:
+            raise ValueError(f"Unsupported model format: {manifest.get('format')}")
+        return manifest
+    
+    def _publish_manifest(self, manifest: Dict, version: Optional[str]):
+        """Atomically replace the manifest; readers see either the old or the new one"""
+        live = self._live_soldiers(manifest)
+        manifest.update({
+            'generation': manifest.get('generation', 0) + 1,  # Bumped by every change, watched by readers
+            'version': version,
+            'timestamp': datetime.now().isoformat(),
+            'soldier_count': len(live),
+            'encoding_count': sum(count for _, count in live.values()),
+            'encoding_dimensions': [ENCODING_DIM]
+        })
+        
+        temp_manifest = self.manifest_filename + '.tmp'
+        try:
+            with open(temp_manifest, 'w') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(temp_manifest, self.manifest_filename)
+        finally:
+            if os.path.exists(temp_manifest):
+                os.remove(temp_manifest)
+        _write_state.published = dict(manifest)
+    
+    @contextmanager
+    def _write_lock(self):
+        """Writer lock; listeners are notified once this thread no longer holds the store lock"""
+        with self.lock:
+            yield
+    
+    def _segment_metadata(self, name: str) -> Dict:
+        """segment.json of a segment (cached, segments never change)"""
+        metadata = _segment_metadata_cache.get(name)
+        if metadata is None:
+            with open(os.path.join(self.data_dir, name, SEGMENT_METADATA), 'r') as f:
+                metadata = json.load(f)
+            _segment_metadata_cache[name] = metadata
+        return metadata
+    
+    def _live_soldiers(self, manifest: Dict) -> Dict[str, Tuple[str, int]]:
+        """force_id -> (segment name, encoding count) for every soldier not tombstoned"""
+        tombstones = manifest.get('tombstones', {})
+        live = {}
+        for entry in manifest.get('segments', []):
+            metadata = self._segment_metadata(entry['name'])
+            for force_id, count in zip(metadata['force_ids'], metadata['counts']):
+                if tombstones.get(force_id, 0) < entry['seq']:
+                    live[force_id] = (entry['name'], count)
+        return live
+    
+    def _segment_name(self, seq: int, version: str) -> str:
+        """Unused directory name for a new segment"""
+        base = f"seg_{seq:06d}_" + re.sub(r'[^\w.-]', '_', version)
+        name, suffix = base, 1
+        while os.path.exists(os.path.join(self.data_dir, name)) or os.path.exists(os.path.join(self.data_dir, name + '.tmp')):
+            name = f"{base}_{suffix}"
+            suffix += 1
+        return name
+    
+    def _write_segment(self, matrix: np.ndarray, labels: np.ndarray, force_ids: List[str],
+                       seq: int, version: str) -> Dict:
+        """
+        Write one immutable segment directory (O(rows in the segment))
+        
+        Returns:
+            Dict: The segment metadata (segment.json)
+        """
+        name = self._segment_name(seq, version)
+        segment_dir = os.path.join(self.data_dir, name)
+        staging_dir = segment_dir + '.tmp'
+        os.makedirs(staging_dir)
+        
+        try:
+            centroids, radii = compute_centroids(matrix, labels)
+            arrays = {'encodings': matrix, 'labels': labels, 'centroids': centroids, 'radii': radii}
+            files = {}
+            for key, array in arrays.items():
+                path = os.path.join(staging_dir, SEGMENT_FILES[key])
+                np.save(path, array)
+                files[key] = {
+                    'name': SEGMENT_FILES[key],
+                    'sha256': self._file_sha256(path),
+                    'bytes': os.path.getsize(path)
+                }
+            
+            # Validate the saved data
+            test_matrix = np.load(os.path.join(staging_dir, SEGMENT_FILES['encodings']), mmap_mode='r')
+            test_labels = np.load(os.path.join(staging_dir, SEGMENT_FILES['labels']), mmap_mode='r')
+            valid = test_matrix.shape == matrix.shape and np.array_equal(test_labels, labels)
+            del test_matrix, test_labels  # Release the maps before renaming (Windows)
+            if not valid:
+                raise ValueError("Model validation failed after save")
+            
+            metadata = {
+                'name': name,
+                'seq': seq,
+                'version': version,
+                'timestamp': datetime.now().isoformat(),
+                'encoding_count': int(len(matrix)),
+                'force_ids': force_ids,
+                'counts': np.bincount(labels, minlength=len(force_ids)).tolist(),
+                'files': files,
+                'model_hash': self._generate_model_hash(matrix, labels, force_ids)
+            }
+            with open(os.path.join(staging_dir, SEGMENT_METADATA), 'w') as f:
+                json.dump(metadata, f, indent=2)
+            
+            os.rename(staging_dir, segment_dir)
+            _segment_metadata_cache[name] = metadata
+            return metadata
+        
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+    
+    def _open_segment(self, name: str, tombstones: Dict, verify: bool = False,
+                      include_hidden: bool = False) -> ModelSegment:
+        """Memory-map one segment and (unless include_hidden) filter out its tombstoned soldiers"""
+        metadata = self._segment_metadata(name)
+        segment_dir = os.path.join(self.data_dir, name)
+        paths = {key: os.path.join(segment_dir, info['name']) for key, info in metadata['files'].items()}
+        if verify:
+            for key, info in metadata['files'].items():
+                if self._file_sha256(paths[key]) != info['sha256']:
+                    raise ValueError(f"Checksum mismatch for {name}/{info['name']} - possible corruption")
+        
+        matrix = np.load(paths['encodings'], mmap_mode='r')
+        labels = np.load(paths['labels'], mmap_mode='r')
+        centroids = np.load(paths['centroids'], mmap_mode='r')
+        radii = np.load(paths['radii'], mmap_mode='r')
+        force_ids = metadata['force_ids']
+        if len(matrix) != metadata['encoding_count'] or len(labels) != len(matrix) or matrix.shape[1] != ENCODING_DIM:
+            raise ValueError(f"Segment {name} does not match its metadata")
+        
+        hidden = tuple(fid for fid in force_ids if tombstones.get(fid, 0) >= metadata['seq'])
+        segment = ModelSegment(name, metadata['seq'], matrix, labels, force_ids,
+                               {'force_ids': force_ids, 'centroids': centroids, 'radii': radii}, hidden)
+        return segment if include_hidden else live_rows(segment)
+    
+    def _open_segments(self, verify: bool = False, include_hidden: bool = False):
+        """Open every live segment, raising on a missing or inconsistent model"""
+        manifest = self._load_metadata()
+        if not manifest:
+            raise FileNotFoundError("Model manifest does not exist")
+        if manifest.get('format') != MODEL_FORMAT:
+            raise ValueError(f"Unsupported model format: {manifest.get('format')}")
+        
+        tombstones = manifest.get('tombstones', {})
+        segments = [self._open_segment(entry['name'], tombstones, verify, include_hidden) for entry in manifest['segments']]
+        return [segment for segment in segments if len(segment.encodings)], manifest
+    
+    def load_segments(self, verify: bool = False,
+                      include_hidden: bool = False) -> Tuple[Optional[List[ModelSegment]], Optional[Dict]]:
+        """
+        Memory-map the live segments of the current model
+        
+        Args:
+            verify: Also check the SHA-256 of every file (reads the whole model)
+            include_hidden: Keep the rows of tombstoned soldiers (listed in
+                ModelSegment.hidden) instead of copying out the live rows
+        
+        Returns:
+            Tuple of (segments, manifest), or (None, None) if no valid model exists
+        """
+        with self.lock:
+            try:
+                self.migrate_legacy_model()
+                if not os.path.exists(self.manifest_filename):
+                    logging.warning("Model file does not exist")
+                    return None, None
+                return self._open_segments(verify, include_hidden)
+            except Exception as e:
+                logging.error(f"Error loading model: {e}")
+                return None, None
+    
+    def load_model_arrays(self, verify: bool = False) -> Tuple:
+        """
+        Load the whole live gallery as one label-grouped model
+        
+        Returns:
+            Tuple of (encodings (N, 128) float32, labels (N,) int32, force_ids per label, manifest),
+            or (None, None, None, None) if no valid model exists. The encodings are
+            memory-mapped when the model is a single segment and copied otherwise.
+        """
+        segments, manifest = self.load_segments(verify)
+        if segments is None:
+            return None, None, None, None
+        matrix, labels, force_ids = concatenate_segments(segments)
+        return matrix, labels, force_ids, manifest
+    
+    def load_model_with_validation(self) -> Tuple[Optional[List], Optional[List]]:
+        """
+        Load model as parallel lists (one force_id per encoding); readers
+        should use load_segments()
+        """
+        with self.lock:
+            matrix, labels, soldier_ids, _ = self.load_model_arrays()
+            if matrix is None:
+                return None, None
+            
+            encodings = list(np.array(matrix))
+            force_ids = [soldier_ids[label] for label in labels.tolist()]
+            logging.info(f"Model loaded successfully - {len(soldier_ids)} soldiers, {len(force_ids)} encodings")
+            return encodings, force_ids
+    
+    def encoding_counts(self) -> Dict[str, int]:
+        """Encoding count of every soldier in the model, from segment metadata only"""
+        with self.lock:
+            try:
+                self.migrate_legacy_model()
+                manifest = self._load_metadata()
+                if not manifest or manifest.get('format') != MODEL_FORMAT:
+                    return {}
+                return {fid: count for fid, (_, count) in self._live_soldiers(manifest).items()}
+            except Exception as e:
+                logging.error(f"Error reading model soldiers: {e}")
+                return {}
+    
+    def get_soldier_ids(self) -> List[str]:
+        """Soldiers in the current model"""
+        return list(self.encoding_counts())
+    
+    def migrate_legacy_model(self) -> bool:
+        """
+        Convert a legacy face_recognition_model.pkl, or a single-file npy-v1
+        model, to the segmented format.
+        
+        The pickle and its metadata are moved to migration_backup/ once the
+        converted model is published.
+        
+        Returns:
+            bool: True if a legacy model was migrated
+        """
+        with self._write_lock():
+            manifest = self._load_metadata()
+            if manifest and manifest.get('format') == LEGACY_NPY_FORMAT:
+                return self._migrate_npy_v1(manifest)
+            if manifest or not os.path.exists(self.legacy_model_filename):
+                return False
+            
+            try:
+                with open(self.legacy_model_filename, "rb") as f:
+                    data = pickle.load(f)
+                
+                # Handle both old tuple format and dict format
+                if isinstance(data, dict):
+                    encodings = data['encodings']
+                    force_ids = data['force_ids']
+                else:
+                    encodings, force_ids = data
+                
+                legacy_metadata = {}
+                if os.path.exists(self.legacy_metadata_filename):
+                    with open(self.legacy_metadata_filename, 'r') as f:
+                        legacy_metadata = json.load(f)
+                
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                version = legacy_metadata.get('version') or f"migrated_{timestamp}"
+                if not self.atomic_save_model(encodings, list(force_ids), version):
+                    raise RuntimeError("Failed to save migrated model")
+                
+                migration_dir = os.path.join(self.model_dir, 'migration_backup')
+                os.makedirs(migration_dir, exist_ok=True)
+                shutil.move(self.legacy_model_filename, os.path.join(migration_dir, f"face_model_{timestamp}.pkl"))
+                if os.path.exists(self.legacy_metadata_filename):
+                    shutil.move(self.legacy_metadata_filename, os.path.join(migration_dir, f"model_metadata_{timestamp}.json"))
+                
+                logging.info(f"Migrated legacy pickle model to {MODEL_FORMAT} - Version: {version}, Encodings: {len(force_ids)}")
+                return True
+            
+            except Exception as e:
+                logging.error(f"Error migrating legacy model: {e}")
+                return False
+    
+    def _migrate_npy_v1(self, manifest: Dict) -> bool:
+        """Rewrite a single-directory npy-v1 model as one segment"""
+        try:
+            data_dir = os.path.join(self.model_dir, manifest['data_dir'])
+            files = manifest['files']
+            matrix = np.load(os.path.join(data_dir, files['encodings']['name']))
+            labels = np.load(os.path.join(data_dir, files['labels']['name']))
+            force_ids = np.asarray(manifest['force_ids'], dtype=object)[labels].tolist() if len(labels) else []
+            
+            if not self.atomic_save_model(matrix, force_ids, manifest.get('version')):
+                raise RuntimeError("Failed to save migrated model")
+            
+            # The old version directories are orphans now and are removed after the grace period
+            legacy_centroids = os.path.join(self.model_dir, 'face_centroids.npz')
+            if os.path.exists(legacy_centroids):
+                os.remove(legacy_centroids)
+            
+            logging.info(f"Migrated {LEGACY_NPY_FORMAT} model to {MODEL_FORMAT} - Encodings: {len(force_ids)}")
+            return True
+        
+        except Exception as e:
+            logging.error(f"Error migrating {LEGACY_NPY_FORMAT} model: {e}")
+            return False
+    
     def _cleanup_atomic_backups(self, keep_count: int = 1):
         """Clean up old atomic backups, keeping only the latest ones"""
         try:
             # Get all atomic backup files
-            backup_pattern = os.path.join(self.model_dir, 'face_recognition_model.pkl.backup_*')
+            backup_pattern = self.legacy_model_filename + '.backup_*'
             backup_files = glob.glob(backup_pattern)
             
             if len(backup_files) <= keep_count:
@@ -92,7 +575,7 @@ class FaceModelManager:
                     logging.info(f"Removed old atomic backup: {os.path.basename(backup_file)}")
                 except Exception as e:
                     logging.error(f"Error removing backup {backup_file}: {e}")
-                    
+        
         except Exception as e:
             logging.error(f"Error cleaning up atomic backups: {e}")
     
@@ -122,182 +605,165 @@ class FaceModelManager:
                     logging.info(f"Removed old migration backup: {os.path.basename(migration_file)}")
                 except Exception as e:
                     logging.error(f"Error removing migration backup {migration_file}: {e}")
-                    
+        
         except Exception as e:
             logging.error(f"Error cleaning up migration backups: {e}")
     
+    def _retire_segments(self, manifest: Dict, names: List[str]):
+        """Mark segments as replaced; their files are kept for the grace period"""
+        retired_at = time.time()
+        manifest.setdefault('retired', []).extend({'name': name, 'retired_at': retired_at} for name in names)
+    
+    def collect_retired_segments(self) -> int:
+        """
+        Delete segments retired longer than FACE_MODEL_SEGMENT_GRACE_SECONDS ago,
+        plus orphaned directories of that age (failed writes, old formats).
+        Other processes may still be reading a retired segment until they refresh.
+        
+        Returns:
+            int: Number of directories removed
+        """
+        from config.settings import settings
+        
+        with self._write_lock():
+            manifest = self._load_metadata()
+            if not manifest or manifest.get('format') != MODEL_FORMAT:
+                return 0
+            
+            now = time.time()
+            grace = settings.FACE_MODEL_SEGMENT_GRACE_SECONDS
+            retired = manifest.get('retired', [])
+            expired = {r['name'] for r in retired if now - r['retired_at'] > grace}
+            referenced = {e['name'] for e in manifest['segments']} | {r['name'] for r in retired}
+            
+            removed = 0
+            for name in os.listdir(self.data_dir):
+                path = os.path.join(self.data_dir, name)
+                orphan = name not in referenced and now - os.path.getmtime(path) > grace
+                if name in expired or orphan:
+                    try:
+                        shutil.rmtree(path)
+                        _segment_metadata_cache.pop(name, None)
+                        removed += 1
+                        logging.info(f"Removed old model segment: {name}")
+                    except Exception as e:
+                        logging.error(f"Error removing model segment {name}: {e}")
+            
+            if expired:
+                manifest['retired'] = [r for r in retired if r['name'] not in expired]
+                self._publish_manifest(manifest, manifest.get('version'))
+            return removed
+    
     def atomic_save_model(self, encodings: List, force_ids: List, version: Optional[str] = None) -> bool:
         """
-        Atomically save model with backup and validation
+        Atomically replace the whole model with a single segment
+        
+        Args:
+            encodings: Encodings in any order (stored grouped by soldier)
+            force_ids: force_id of each encoding
+            version: Version name (default: timestamp)
         """
-        with self.lock:
+        with self._write_lock():
             try:
                 # Generate version if not provided
                 if not version:
                     version = datetime.now().strftime("%Y%m%d_%H%M%S")
                 
-                # Create temporary file for atomic write
-                temp_filename = self.model_filename + '.tmp'
-                temp_metadata = self.metadata_filename + '.tmp'
-                
-                # Save to temporary files
-                with open(temp_filename, "wb") as f:
-                    pickle.dump((encodings, force_ids), f)
-                
-                # Create and save metadata
-                metadata = self._create_metadata(encodings, force_ids, version)
-                with open(temp_metadata, 'w') as f:
-                    json.dump(metadata, f, indent=2)
-                
-                # Validate the saved data
-                with open(temp_filename, "rb") as f:
-                    test_data = pickle.load(f)
-                
-                # Handle both formats for validation
-                if isinstance(test_data, dict):
-                    test_encodings = test_data['encodings']
-                    test_force_ids = test_data['force_ids']
+                if encodings is not None and len(encodings):
+                    matrix, labels, unique_ids = group_by_label(encodings, force_ids)
                 else:
-                    test_encodings, test_force_ids = test_data
+                    matrix, labels, unique_ids = np.empty((0, ENCODING_DIM), dtype=np.float32), np.empty(0, dtype=np.int32), []
+                if len(matrix) != len(force_ids) or (len(matrix) and matrix.shape[1] != ENCODING_DIM):
+                    raise ValueError(f"Invalid model data: {matrix.shape} encodings for {len(force_ids)} force IDs")
                 
-                # Verify integrity
-                if len(test_encodings) != len(encodings) or test_force_ids != force_ids:
-                    raise ValueError("Model validation failed after save")
+                manifest = self._read_manifest()
+                seq = manifest['next_seq']
+                segments = []
+                if len(matrix):
+                    metadata = self._write_segment(matrix, labels, unique_ids, seq, version)
+                    segments.append({'name': metadata['name'], 'seq': seq, 'encoding_count': metadata['encoding_count']})
                 
-                # Atomic move to final location
-                if os.name == 'nt':  # Windows
-                    if os.path.exists(self.model_filename):
-                        os.replace(temp_filename, self.model_filename)
-                        os.replace(temp_metadata, self.metadata_filename)
-                    else:
-                        os.rename(temp_filename, self.model_filename)
-                        os.rename(temp_metadata, self.metadata_filename)
-                else:  # Unix-like
-                    os.rename(temp_filename, self.model_filename)
-                    os.rename(temp_metadata, self.metadata_filename)
+                self._retire_segments(manifest, [entry['name'] for entry in manifest['segments']])
+                manifest.update({'segments': segments, 'tombstones': {}, 'next_seq': seq + 1})
+                self._publish_manifest(manifest, version)
                 
-                # Clean up old backups after successful save
+                # Clean up old segments and backups after successful save
+                self.collect_retired_segments()
                 self._cleanup_atomic_backups(keep_count=1)
                 self._cleanup_migration_backups(keep_count=1)
                 
-                logging.info(f"Model saved atomically - Version: {version}, Soldiers: {len(force_ids)}")
+                logging.info(f"Model saved atomically - Version: {version}, Soldiers: {len(unique_ids)}, Encodings: {len(matrix)}")
                 return True
-                
+            
             except Exception as e:
                 logging.error(f"Error in atomic save: {e}")
-                
-                # Cleanup temp files if they exist
-                for temp_file in [temp_filename, temp_metadata]:
-                    if os.path.exists(temp_file):
-                        try:
-                            os.remove(temp_file)
-                        except:
-                            pass
-                
                 return False
     
-    def load_model_with_validation(self) -> Tuple[Optional[List], Optional[List]]:
+    def append_segment(self, encodings: List, force_ids: List, version: Optional[str] = None) -> List[str]:
         """
-        Load model with integrity validation
+        Enroll soldiers by writing one new segment (O(new encodings) I/O).
+        Soldiers already in the model are skipped.
+        
+        Args:
+            encodings: New encodings
+            force_ids: force_id of each encoding
+            version: Version name (default: timestamp)
+        
+        Returns:
+            List[str]: Soldiers added (empty if all were duplicates)
         """
-        with self.lock:
-            try:
-                if not os.path.exists(self.model_filename):
-                    logging.warning("Model file does not exist")
-                    return None, None
-                
-                # Load model data
-                with open(self.model_filename, "rb") as f:
-                    data = pickle.load(f)
-                
-                # Handle both old tuple format and new dict format
-                if isinstance(data, dict):
-                    encodings = data['encodings']
-                    force_ids = data['force_ids']
-                else:
-                    encodings, force_ids = data
-                
-                # Load and validate metadata if exists
-                metadata = self._load_metadata()
-                if metadata:
-                    # Verify hash
-                    current_hash = self._generate_model_hash(encodings, force_ids)
-                    if current_hash != metadata.get('model_hash'):
-                        logging.warning("Model hash mismatch - possible corruption")
-                    
-                    # Verify soldier count
-                    if len(force_ids) != metadata.get('soldier_count', 0):
-                        logging.warning("Soldier count mismatch in metadata")
-                
-                logging.info(f"Model loaded successfully - {len(force_ids)} soldiers")
-                return encodings, force_ids
-                
-            except Exception as e:
-                logging.error(f"Error loading model: {e}")
-                return None, None
+        with self._write_lock():
+            if not version:
+                version = datetime.now().strftime("%Y%m%d_%H%M%S")
+            
+            manifest = self._read_manifest()
+            live = self._live_soldiers(manifest)
+            rows = [i for i, fid in enumerate(force_ids) if fid not in live]
+            duplicates = set(force_ids) & set(live)
+            if duplicates:
+                logging.warning(f"Duplicate force IDs found: {duplicates}")
+            if not rows:
+                return []
+            
+            matrix, labels, unique_ids = group_by_label([encodings[i] for i in rows], [force_ids[i] for i in rows])
+            if matrix.ndim != 2 or matrix.shape[1] != ENCODING_DIM:
+                raise ValueError(f"Invalid encoding dimensions: {matrix.shape}")
+            
+            seq = manifest['next_seq']
+            metadata = self._write_segment(matrix, labels, unique_ids, seq, version)
+            manifest['segments'].append({'name': metadata['name'], 'seq': seq, 'encoding_count': metadata['encoding_count']})
+            manifest['next_seq'] = seq + 1
+            self._publish_manifest(manifest, version)
+            
+            logging.info(f"Appended segment {metadata['name']} - Soldiers: {len(unique_ids)}, Encodings: {len(matrix)}")
+            return unique_ids
     
     def add_soldiers_incremental(self, new_encodings: List, new_force_ids: List) -> bool:
         """
         Add new soldiers to existing model incrementally
         """
-        with self.lock:
-            try:
-                # Load existing model
-                existing_encodings, existing_force_ids = self.load_model_with_validation()
-                if existing_encodings is None:
-                    existing_encodings, existing_force_ids = [], []
-                
-                # Check for duplicates
-                duplicates = set(new_force_ids) & set(existing_force_ids)
-                if duplicates:
-                    logging.warning(f"Duplicate force IDs found: {duplicates}")
-                    # Remove duplicates from new data
-                    filtered_encodings = []
-                    filtered_force_ids = []
-                    for enc, fid in zip(new_encodings, new_force_ids):
-                        if fid not in existing_force_ids:
-                            filtered_encodings.append(enc)
-                            filtered_force_ids.append(fid)
-                    new_encodings, new_force_ids = filtered_encodings, filtered_force_ids
-                
-                # Combine data
-                combined_encodings = existing_encodings + new_encodings
-                combined_force_ids = existing_force_ids + new_force_ids
-                
-                # Save atomically
-                return self.atomic_save_model(combined_encodings, combined_force_ids)
-                
-            except Exception as e:
-                logging.error(f"Error in incremental add: {e}")
-                return False
+        try:
+            self.append_segment(new_encodings, new_force_ids)
+            return True
+        except Exception as e:
+            logging.error(f"Error in incremental add: {e}")
+            return False
     
     def add_soldiers_batch_atomic(self, soldiers_data: List[Dict]) -> Dict:
         """
-        Atomically add multiple soldiers in a single transaction
-        Production-safe with full atomic operations
+        Atomically add multiple soldiers as a single segment
         """
-        with self.lock:
+        with self._write_lock():
             start_time = datetime.now()
             
             try:
-                # Single backup creation for entire batch
                 timestamp = start_time.strftime("%Y%m%d_%H%M%S")
-                backup_filename = f"{self.model_filename}.batch_backup_{timestamp}"
-                
-                if os.path.exists(self.model_filename):
-                    shutil.copy2(self.model_filename, backup_filename)
-                    logging.info(f"Created batch backup: {backup_filename}")
+                existing_ids_set = set(self.get_soldier_ids())
                 
-                # Load existing model with full validation
-                existing_encodings, existing_force_ids = self.load_model_with_validation()
-                if existing_encodings is None:
-                    existing_encodings, existing_force_ids = [], []
-                
-                # Process all soldiers in memory (atomic-friendly)
+                # Collect all soldiers of the batch into one segment
                 all_new_encodings = []
                 all_new_force_ids = []
                 processed_soldiers = []
-                existing_ids_set = set(existing_force_ids)
                 
                 for soldier_data in soldiers_data:
                     force_id = soldier_data['force_id']
@@ -313,9 +779,6 @@ class FaceModelManager:
                         logging.warning(f"Skipping duplicate soldier: {force_id}")
                 
                 if not processed_soldiers:
-                    # Clean up backup if no processing needed
-                    if os.path.exists(backup_filename):
-                        os.remove(backup_filename)
                     return {
                         'success': True,
                         'message': 'No new soldiers to add',
@@ -324,43 +787,23 @@ class FaceModelManager:
                         'processing_time': (datetime.now() - start_time).total_seconds()
                     }
                 
-                # Combine data
-                combined_encodings = existing_encodings + all_new_encodings
-                combined_force_ids = existing_force_ids + all_new_force_ids
-                
-                # Generate version
+                # Single segment for the entire batch: published atomically or not at all
                 version = f"batch_{timestamp}_{len(processed_soldiers)}_soldiers"
+                self.append_segment(all_new_encodings, all_new_force_ids, version)
                 
-                # Single atomic save for entire batch
-                success = self.atomic_save_model(combined_encodings, combined_force_ids, version)
+                processing_time = (datetime.now() - start_time).total_seconds()
+                logging.info(f"Batch atomic save completed: {len(processed_soldiers)} soldiers in {processing_time:.2f}s")
                 
-                if success:
-                    # Clean up backup after successful save
-                    if os.path.exists(backup_filename):
-                        os.remove(backup_filename)
-                    
-                    processing_time = (datetime.now() - start_time).total_seconds()
-                    logging.info(f"Batch atomic save completed: {len(processed_soldiers)} soldiers in {processing_time:.2f}s")
-                    
-                    return {
-                        'success': True,
-                        'processed_soldiers': processed_soldiers,
-                        'processed_count': len(processed_soldiers),
-                        'total_encodings': len(all_new_encodings),
-                        'processing_time': processing_time,
-                        'version': version
-                    }
-                else:
-                    raise Exception("Atomic save failed")
-                    
+                return {
+                    'success': True,
+                    'processed_soldiers': processed_soldiers,
+                    'processed_count': len(processed_soldiers),
+                    'total_encodings': len(all_new_encodings),
+                    'processing_time': processing_time,
+                    'version': version
+                }
+            
             except Exception as e:
-                # Atomic rollback
-                if os.path.exists(backup_filename):
-                    if os.path.exists(self.model_filename):
-                        shutil.copy2(backup_filename, self.model_filename)
-                        logging.info("Rolled back from batch backup due to error")
-                    os.remove(backup_filename)
-                
                 processing_time = (datetime.now() - start_time).total_seconds()
                 logging.error(f"Batch atomic operation failed: {e}")
                 return {
@@ -372,142 +815,182 @@ class FaceModelManager:
     
     def add_soldiers_incremental_optimized(self, new_encodings: List, new_force_ids: List) -> bool:
         """
-        Optimized atomic incremental addition - production safe
-        Uses smart duplicate checking but maintains full atomic safety
-        """
-        with self.lock:
-            try:
-                start_time = datetime.now()
-                
-                # Create backup only if needed
-                if self._needs_backup():
-                    timestamp = start_time.strftime("%Y%m%d_%H%M%S")
-                    backup_filename = f"{self.model_filename}.backup_{timestamp}"
-                    if os.path.exists(self.model_filename):
-                        shutil.copy2(self.model_filename, backup_filename)
-                
-                # Load with validation
-                existing_encodings, existing_force_ids = self.load_model_with_validation()
-                if existing_encodings is None:
-                    existing_encodings, existing_force_ids = [], []
-                
-                # Fast duplicate check using sets (but maintain atomic safety)
-                existing_ids_set = set(existing_force_ids)
-                filtered_encodings = []
-                filtered_force_ids = []
-                
-                for enc, fid in zip(new_encodings, new_force_ids):
-                    if fid not in existing_ids_set:
-                        filtered_encodings.append(enc)
-                        filtered_force_ids.append(fid)
-                
-                if not filtered_encodings:
-                    logging.info("No new soldiers to add (all duplicates)")
-                    return True  # No new data to add
-                
-                # Combine and save atomically
-                combined_encodings = existing_encodings + filtered_encodings
-                combined_force_ids = existing_force_ids + filtered_force_ids
-                
-                version = f"incremental_{start_time.strftime('%Y%m%d_%H%M%S')}"
-                success = self.atomic_save_model(combined_encodings, combined_force_ids, version)
-                
-                processing_time = (datetime.now() - start_time).total_seconds()
-                if success:
-                    logging.info(f"Optimized atomic add completed: {len(filtered_encodings)} soldiers in {processing_time:.2f}s")
-                
-                return success
-                
-            except Exception as e:
-                logging.error(f"Optimized atomic add failed: {e}")
-                return False
-    
-    def _needs_backup(self) -> bool:
-        """
-        Check if backup is needed based on last backup time
-        Reduces I/O for frequent small updates
+        Atomic incremental addition as a new segment - production safe
         """
         try:
-            if not os.path.exists(self.model_filename):
-                return False
-                
-            # Only create backup if model was modified recently (last 30 minutes)
-            model_mtime = os.path.getmtime(self.model_filename)
-            current_time = datetime.now().timestamp()
+            start_time = datetime.now()
+            version = f"incremental_{start_time.strftime('%Y%m%d_%H%M%S')}"
+            added = self.append_segment(new_encodings, new_force_ids, version)
+            
+            if not added:
+                logging.info("No new soldiers to add (all duplicates)")
+                return True  # No new data to add
             
-            return (current_time - model_mtime) < 1800  # 30 minutes
-        except:
-            return True  # Safe default
+            processing_time = (datetime.now() - start_time).total_seconds()
+            logging.info(f"Optimized atomic add completed: {len(added)} soldiers in {processing_time:.2f}s")
+            return True
+        
+        except Exception as e:
+            logging.error(f"Optimized atomic add failed: {e}")
+            return False
     
     def remove_soldiers(self, force_ids_to_remove: List[str]) -> bool:
         """
-        Remove soldiers from model
+        Remove soldiers from model by writing tombstones (no encodings are rewritten)
         """
-        with self.lock:
+        with self._write_lock():
             try:
-                # Load existing model
-                encodings, force_ids = self.load_model_with_validation()
-                if encodings is None:
-                    logging.error("Cannot remove soldiers - model not loaded")
-                    return False
+                manifest = self._read_manifest()
+                live = self._live_soldiers(manifest)
+                removed = [fid for fid in dict.fromkeys(force_ids_to_remove) if fid in live]
                 
-                # Filter out soldiers to remove
-                new_encodings = []
-                new_force_ids = []
-                removed_count = 0
-                
-                for enc, fid in zip(encodings, force_ids):
-                    if fid not in force_ids_to_remove:
-                        new_encodings.append(enc)
-                        new_force_ids.append(fid)
-                    else:
-                        removed_count += 1
-                
-                if removed_count == 0:
+                if not removed:
                     logging.warning("No soldiers found to remove")
                     return True
                 
-                # Save updated model
-                success = self.atomic_save_model(new_encodings, new_force_ids)
-                if success:
-                    logging.info(f"Successfully removed {removed_count} soldiers")
-                
-                return success
+                # Hide every row written so far; a later re-enrollment gets a higher seq
+                for force_id in removed:
+                    manifest['tombstones'][force_id] = manifest['next_seq'] - 1
+                self._publish_manifest(manifest, f"remove_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
                 
+                logging.info(f"Successfully removed {len(removed)} soldiers ({sum(live[fid][1] for fid in removed)} encodings)")
+                return True
+            
             except Exception as e:
                 logging.error(f"Error removing soldiers: {e}")
                 return False
     
+    def compaction_stats(self) -> Dict:
+        """Segment count and share of stored rows hidden by tombstones"""
+        manifest = self._load_metadata()
+        if not manifest or manifest.get('format') != MODEL_FORMAT:
+            return {'segments': 0, 'stored_encodings': 0, 'live_encodings': 0, 'dead_ratio': 0.0, 'tombstones': 0}
+        
+        stored = sum(entry['encoding_count'] for entry in manifest['segments'])
+        live = manifest.get('encoding_count', stored)
+        return {
+            'segments': len(manifest['segments']),
+            'stored_encodings': stored,
+            'live_encodings': live,
+            'dead_ratio': round((stored - live) / stored, 4) if stored else 0.0,
+            'tombstones': len(manifest.get('tombstones', {}))
+        }
+    
+    def compact(self) -> Dict:
+        """
+        Merge all segments into one and drop tombstoned rows.
+        
+        The merge runs outside the writer lock; segments appended and soldiers
+        removed meanwhile are carried over into the new manifest.
+        """
+        if not _compaction_lock.acquire(blocking=False):
+            return {'compacted': False, 'reason': 'Compaction already running'}
+        
+        try:
+            start_time = time.time()
+            with self.lock:
+                manifest = self._read_manifest()
+                snapshot = list(manifest['segments'])
+                tombstones = dict(manifest['tombstones'])
+            
+            if not snapshot or (len(snapshot) == 1 and not tombstones):
+                return {'compacted': False, 'reason': 'Nothing to compact'}
+            
+            # Rows of a segment are hidden only by tombstones >= its seq, so the merged
+            # segment takes the highest merged seq: newer tombstones still apply to it
+            merged_seq = max(entry['seq'] for entry in snapshot)
+            segments = [self._open_segment(entry['name'], tombstones) for entry in snapshot]
+            matrix, labels, force_ids = concatenate_segments([s for s in segments if len(s.encodings)])
+            version = f"compact_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            metadata = self._write_segment(np.ascontiguousarray(matrix), labels, force_ids, merged_seq, version) if len(matrix) else None
+            del segments, matrix, labels
+            
+            with self._write_lock():
+                current = self._read_manifest()
+                merged_names = [entry['name'] for entry in snapshot]
+                if not set(merged_names) <= {entry['name'] for entry in current['segments']}:
+                    # The model was replaced (atomic_save_model) while merging
+                    if metadata:
+                        self._retire_segments(current, [metadata['name']])
+                        self._publish_manifest(current, current.get('version'))
+                    return {'compacted': False, 'reason': 'Model replaced during compaction'}
+                
+                remaining = [entry for entry in current['segments'] if entry['name'] not in merged_names]
+                merged = [{'name': metadata['name'], 'seq': merged_seq, 'encoding_count': metadata['encoding_count']}] if metadata else []
+                current['segments'] = merged + remaining
+                current['tombstones'] = {fid: seq for fid, seq in current['tombstones'].items() if seq >= merged_seq}
+                self._retire_segments(current, merged_names)
+                self._publish_manifest(current, current.get('version'))
+            
+            result = {
+                'compacted': True,
+                'merged_segments': len(snapshot),
+                'encodings': metadata['encoding_count'] if metadata else 0,
+                'dropped_encodings': sum(entry['encoding_count'] for entry in snapshot) - (metadata['encoding_count'] if metadata else 0),
+                'duration_seconds': round(time.time() - start_time, 3)
+            }
+            logging.info(f"Face model compacted: {result}")
+            return result
+        
+        except Exception as e:
+            logging.error(f"Error compacting face model: {e}")
+            return {'compacted': False, 'reason': 'Compaction failed', 'error': str(e)}
+        finally:
+            _compaction_lock.release()
+    
+    def compact_if_needed(self) -> Optional[Dict]:
+        """Compact when there are too many segments or too many tombstoned rows"""
+        from config.settings import settings
+        
+        stats = self.compaction_stats()
+        result = None
+        if (stats['segments'] > settings.FACE_MODEL_MAX_SEGMENTS or
+                stats['dead_ratio'] > settings.FACE_MODEL_COMPACT_DEAD_RATIO):
+            result = self.compact()
+        self.collect_retired_segments()
+        return result
+    
+    def _model_size_bytes(self, manifest: Optional[Dict]) -> int:
+        """On-disk size of the live segments plus manifest"""
+        if not manifest or manifest.get('format') != MODEL_FORMAT:
+            return 0
+        size = sum(info['bytes'] for entry in manifest['segments']
+                   for info in self._segment_metadata(entry['name'])['files'].values())
+        return size + (os.path.getsize(self.manifest_filename) if os.path.exists(self.manifest_filename) else 0)
+    
     def get_model_info(self) -> Dict:
         """
         Get comprehensive model information
         """
         with self.lock:
             try:
-                encodings, force_ids = self.load_model_with_validation()
+                counts = self.encoding_counts()
                 metadata = self._load_metadata()
+                total_encodings = sum(counts.values())
                 
                 info = {
-                    'model_exists': encodings is not None,
-                    'total_encodings': len(force_ids) if force_ids else 0,
-                    'unique_soldiers': len(set(force_ids)) if force_ids else 0,
-                    'avg_encodings_per_soldier': round(len(force_ids) / len(set(force_ids)), 1) if force_ids else 0,
-                    'soldier_count': len(set(force_ids)) if force_ids else 0,  # Keep for backwards compatibility
-                    'force_ids': force_ids or [],
+                    'model_exists': metadata is not None,
+                    'format': metadata.get('format') if metadata else None,
+                    'total_encodings': total_encodings,
+                    'unique_soldiers': len(counts),
+                    'avg_encodings_per_soldier': round(total_encodings / len(counts), 1) if counts else 0,
+                    'soldier_count': len(counts),  # Keep for backwards compatibility
+                    'force_ids': list(counts),
                     'metadata': metadata,
-                    'encoding_dimensions': encodings[0].shape if encodings else None,
-                    'model_size_bytes': os.path.getsize(self.model_filename) if os.path.exists(self.model_filename) else 0
+                    'segments': self.compaction_stats(),
+                    'encoding_dimensions': (ENCODING_DIM,) if total_encodings else None,
+                    'model_size_bytes': self._model_size_bytes(metadata)
                 }
                 
                 return info
-                
+            
             except Exception as e:
                 logging.error(f"Error getting model info: {e}")
                 return {'error': str(e)}
     
     def validate_model_integrity(self) -> Dict:
         """
-        Comprehensive model integrity check
+        Comprehensive model integrity check (verifies the file checksums)
         """
         with self.lock:
             try:
@@ -518,62 +1001,248 @@ class FaceModelManager:
                 }
                 
                 # Check if model file exists
-                if not os.path.exists(self.model_filename):
+                self.migrate_legacy_model()
+                if not os.path.exists(self.manifest_filename):
                     results['valid'] = False
                     results['issues'].append("Model file does not exist")
                     return results
                 
-                # Load and validate model
-                encodings, force_ids = self.load_model_with_validation()
-                if encodings is None:
+                # Load and validate every segment
+                try:
+                    segments, metadata = self._open_segments(verify=True)
+                except Exception as e:
                     results['valid'] = False
-                    results['issues'].append("Failed to load model")
+                    results['issues'].append(f"Failed to load model: {e}")
                     return results
                 
                 # Check data consistency
-                if len(encodings) != len(force_ids):
-                    results['valid'] = False
-                    results['issues'].append(f"Encoding count ({len(encodings)}) != Force ID count ({len(force_ids)})")
+                for segment in segments:
+                    labels = segment.labels
+                    if int(labels.max()) >= len(segment.force_ids) or np.any(np.diff(labels) < 0):
+                        results['valid'] = False
+                        results['issues'].append(f"Segment {segment.name}: labels are not grouped by soldier")
                 
-                # Check for unusual encoding counts per soldier (instead of duplicates)
-                from collections import Counter
-                force_id_counts = Counter(force_ids)
+                counts = self.encoding_counts()
+                if sum(counts.values()) != sum(len(segment.labels) for segment in segments):
+                    results['valid'] = False
+                    results['issues'].append("Segment metadata does not match stored encodings")
                 
                 # Multiple encodings per soldier is normal (~30 per soldier)
-                unusual_counts = {}
-                for fid, count in force_id_counts.items():
-                    if count < 15 or count > 50:  # Allow reasonable range
-                        unusual_counts[fid] = count
+                unusual_counts = {fid: count for fid, count in counts.items() if count < 15 or count > 50}  # Allow reasonable range
                 
                 if unusual_counts:
                     results['issues'].append(f"Soldiers with unusual encoding counts: {unusual_counts}")
                     # Don't mark as invalid unless severely abnormal
-                    severe_issues = {fid: count for fid, count in unusual_counts.items() if count < 5 or count > 100}
-                    if severe_issues:
+                    if any(count < 5 or count > 100 for count in unusual_counts.values()):
                         results['valid'] = False
                 
-                # Check encoding dimensions
-                if encodings:
-                    expected_dim = 128
-                    for i, enc in enumerate(encodings):
-                        if not hasattr(enc, 'shape') or enc.shape != (expected_dim,):
-                            results['valid'] = False
-                            results['issues'].append(f"Invalid encoding dimensions for soldier {force_ids[i]}: expected ({expected_dim},), got {getattr(enc, 'shape', 'unknown')}")
-                            break
-                
+                total_encodings = sum(counts.values())
                 results['details'] = {
-                    'total_encodings': len(force_ids),
-                    'unique_soldiers': len(set(force_ids)),
-                    'avg_encodings_per_soldier': round(len(force_ids) / len(set(force_ids)), 1) if force_ids else 0,
-                    'encoding_dimensions': encodings[0].shape if encodings else None,
-                    'model_size_bytes': os.path.getsize(self.model_filename)
+                    'format': metadata.get('format'),
+                    'version': metadata.get('version'),
+                    'segments': len(segments),
+                    'tombstones': len(metadata.get('tombstones', {})),
+                    'total_encodings': total_encodings,
+                    'unique_soldiers': len(counts),
+                    'avg_encodings_per_soldier': round(total_encodings / len(counts), 1) if counts else 0,
+                    'encoding_dimensions': (ENCODING_DIM,) if total_encodings else None,
+                    'model_size_bytes': self._model_size_bytes(metadata)
                 }
                 
                 return results
-                
+            
             except Exception as e:
                 return {
                     'valid': False,
                     'issues': [f"Validation error: {str(e)}"],
                     'details': {}
                 }
+
+
+class SegmentCompactor:
+    """
+    Background thread that compacts the face model when it fragments
+    (see FACE_MODEL_MAX_SEGMENTS / FACE_MODEL_COMPACT_DEAD_RATIO)
+    """
+    
+    def __init__(self):
+        self.model_manager = FaceModelManager()
+        self.interval_seconds = 60
+        self.enabled = False
+        self.thread = None
+        self.last_result = None
+    
+    def start(self, interval_seconds: int = 60):
+        """Start the compaction thread"""
+        self.interval_seconds = interval_seconds
+        if self.enabled:
+            return
+        self.enabled = True
+        self.thread = threading.Thread(target=self._compaction_loop, daemon=True)
+        self.thread.start()
+        logging.info(f"Face model compactor started with {interval_seconds}s interval")
+    
+    def stop(self):
+        """Stop the compaction thread"""
+        self.enabled = False
+        if self.thread:
+            self.thread.join(timeout=5)
+        logging.info("Face model compactor stopped")
+    
+    def _compaction_loop(self):
+        while self.enabled:
+            time.sleep(self.interval_seconds)
+            try:
+                result = self.model_manager.compact_if_needed()
+                if result:
+                    self.last_result = result
+            except Exception as e:
+                logging.error(f"Error in face model compaction loop: {e}")
+
+
+# Global instance for singleton pattern
+_global_segment_compactor = None
+_compactor_lock = threading.Lock()
+
+def get_segment_compactor() -> SegmentCompactor:
+    """Get the global face model compactor (singleton)"""
+    global _global_segment_compactor
+    
+    with _compactor_lock:
+        if _global_segment_compactor is None:
+            _global_segment_compactor = SegmentCompactor()
+        return _global_segment_compactor
+
+
+def _inotify_open(path: str) -> Optional[int]:
+    """Non-blocking inotify descriptor for files written or renamed into path (Linux only)"""
+    IN_CLOSE_WRITE, IN_MOVED_TO = 0x08, 0x80
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(os.path.abspath(path)), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+class ModelChangeWatcher:
+    """
+    Notifies the model listeners when another process publishes a model change.
+    
+    'poll' mode stats the manifest every interval; 'inotify' mode (Linux)
+    wakes up on writes to the model directory and falls back to polling
+    where inotify is unavailable. The manifest is parsed only when its
+    mtime/size changed, and listeners run only for a new generation.
+    In-process writes notify the listeners directly.
+    """
+    
+    def __init__(self):
+        self.model_manager = FaceModelManager()
+        self.mode = 'poll'
+        self.interval_seconds = 1.0
+        self.enabled = False
+        self.thread = None
+        self._manifest_stamp = None
+    
+    def start(self, mode: str = 'poll', interval_seconds: float = 1.0):
+        """Start watching the manifest in a background thread"""
+        self.mode = mode
+        self.interval_seconds = interval_seconds
+        if self.enabled or mode == 'off':
+            return
+        self.enabled = True
+        target = self._inotify_loop if mode == 'inotify' else self._poll_loop
+        self.thread = threading.Thread(target=target, daemon=True, name="FaceModelWatcher")
+        self.thread.start()
+        logging.info(f"Face model watcher started ({mode}, {interval_seconds}s)")
+    
+    def stop(self):
+        """Stop watching"""
+        self.enabled = False
+        if self.thread:
+            self.thread.join(timeout=5)
+        logging.info("Face model watcher stopped")
+    
+    def check(self) -> bool:
+        """
+        Notify listeners if the manifest has a generation they have not seen
+        
+        Returns:
+            bool: True if listeners were notified
+        """
+        try:
+            stat = os.stat(self.model_manager.manifest_filename)
+        except FileNotFoundError:
+            return False
+        
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._manifest_stamp:
+            return False
+        self._manifest_stamp = stamp
+        
+        manifest = self.model_manager._load_metadata()
+        if not manifest or manifest.get('generation') == _notified_generation:
+            return False
+        notify_model_listeners(manifest)
+        return True
+    
+    def _poll_loop(self):
+        while self.enabled:
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Error in face model watcher: {e}")
+            time.sleep(self.interval_seconds)
+    
+    def _inotify_loop(self):
+        fd = _inotify_open(self.model_manager.model_dir)
+        if fd is None:
+            logging.warning("inotify unavailable - face model watcher falling back to polling")
+            return self._poll_loop()
+        
+        try:
+            while self.enabled:
+                # The timeout doubles as a periodic check in case an event was missed
+                ready, _, _ = select.select([fd], [], [], self.interval_seconds)
+                if ready:
+                    try:
+                        while os.read(fd, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                try:
+                    self.check()
+                except Exception as e:
+                    logging.error(f"Error in face model watcher: {e}")
+        finally:
+            os.close(fd)
+
+
+# Global instance for singleton pattern
+_global_model_change_watcher = None
+_watcher_lock = threading.Lock()
+
+def get_model_change_watcher() -> ModelChangeWatcher:
+    """Get the global face model watcher (singleton)"""
+    global _global_model_change_watcher
+    
+    with _watcher_lock:
+        if _global_model_change_watcher is None:
+            _global_model_change_watcher = ModelChangeWatcher()
+        return _global_model_change_watcher
+
+
+if __name__ == "__main__":
+    manager = FaceModelManager()
+    info = manager.get_model_info()
+    if info.get('model_exists'):
+        print(f"✅ Face model {info['metadata']['version']} ({info['format']}): "
+              f"{info['unique_soldiers']} soldiers, {info['total_encodings']} encodings, "
+              f"{info['segments']['segments']} segments")
+    else:
+        print("❌ No face model found")
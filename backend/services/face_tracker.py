@@ -0,0 +1,185 @@
+"""
+Lightweight face tracker that carries a recognized force_id across frames.
+
+Detections are associated with existing tracks by IoU. When the Haar
+cascade misses a face for a frame, the track's box is moved with
+Lucas-Kanade optical flow on the downscaled gray level, so the track (and
+its identity) survives brief detection drops. A track is re-identified with
+the expensive face encoder only when it is new, when its identity is older
+than the re-identification age, or when the gallery changed since it was
+identified; steady-state recognition cost is one IoU check per frame.
+"""
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from services.face_detection import iou
+
+
+class FaceTrack:
+    """One tracked face; box is (x, y, w, h) in full-resolution coordinates"""
+
+    def __init__(self, track_id: int, box, now: float):
+        self.track_id = track_id
+        self.box = tuple(int(v) for v in box)
+        self.created_at = now
+        self.last_seen = now
+        self.force_id = None
+        self.distance = None
+        self.identified_at = None
+        self.gallery_generation = None
+        self.hits = 1
+        self.flow_hits = 0
+
+
+class FaceTracker:
+    """
+    IoU + optical-flow tracker; thread-safe so inference workers can share it
+
+    Args:
+        iou_threshold: Minimum IoU for a detection to continue a track
+        reidentify_seconds: Identity age after which the track is re-identified
+        unknown_retry_seconds: How often an unrecognized track is retried
+        max_gap_seconds: A track not seen for this long is dropped
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, reidentify_seconds: float = 10.0,
+                 unknown_retry_seconds: float = 1.0, max_gap_seconds: float = 5.0):
+        self.iou_threshold = iou_threshold
+        self.reidentify_seconds = reidentify_seconds
+        self.unknown_retry_seconds = unknown_retry_seconds
+        self.max_gap_seconds = max_gap_seconds
+        self.tracks: List[FaceTrack] = []
+        self._ids = itertools.count(1)
+        self._previous_level = None  # (gray, scale) of the last frame, for optical flow
+        self._lock = threading.Lock()
+        self.stats_counters = {'identifications': 0, 'reused': 0, 'flow_updates': 0, 'tracks_created': 0}
+
+    def update(self, boxes: List[Tuple[int, int, int, int]], level, now: Optional[float] = None) -> List[FaceTrack]:
+        """
+        Associate this frame's detections with the tracks
+
+        Args:
+            boxes: Detected (x, y, w, h) boxes in full-resolution coordinates
+            level: (gray, scale) detection level of this frame (see face_detection.detection_level)
+
+        Returns:
+            Tracks visible in this frame: one per detection (same order), followed
+            by tracks that were moved by optical flow because no detection matched
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_gap_seconds]
+
+            # Greedy IoU association, best pairs first
+            pairs = sorted(
+                ((iou(track.box, box), t, b) for t, track in enumerate(self.tracks) for b, box in enumerate(boxes)),
+                reverse=True
+            )
+            assigned, used_tracks = {}, set()
+            for overlap, t, b in pairs:
+                if overlap < self.iou_threshold:
+                    break
+                if b in assigned or t in used_tracks:
+                    continue
+                assigned[b] = self.tracks[t]
+                used_tracks.add(t)
+
+            visible = []
+            for b, box in enumerate(boxes):
+                track = assigned.get(b)
+                if track is None:
+                    track = FaceTrack(next(self._ids), box, now)
+                    self.tracks.append(track)
+                    self.stats_counters['tracks_created'] += 1
+                else:
+                    track.box = tuple(int(v) for v in box)
+                    track.last_seen = now
+                    track.hits += 1
+                visible.append(track)
+
+            # Detection missed a tracked face: follow it with optical flow
+            for track in self.tracks:
+                if track not in visible and self._follow_flow(track, level):
+                    track.last_seen = now
+                    track.flow_hits += 1
+                    self.stats_counters['flow_updates'] += 1
+                    visible.append(track)
+
+            self._previous_level = level
+            return visible
+
+    def _follow_flow(self, track: FaceTrack, level) -> bool:
+        """Move a track's box by the median Lucas-Kanade flow of features inside it"""
+        if self._previous_level is None or level is None:
+            return False
+        previous_gray, previous_scale = self._previous_level
+        gray, scale = level
+        if previous_gray.shape != gray.shape or previous_scale != scale:
+            return False
+
+        x, y, w, h = (int(round(v * scale)) for v in track.box)
+        if w <= 4 or h <= 4:
+            return False
+        mask = np.zeros_like(previous_gray)
+        mask[y:y+h, x:x+w] = 255
+        points = cv2.goodFeaturesToTrack(previous_gray, maxCorners=40, qualityLevel=0.01, minDistance=3, mask=mask)
+        if points is None or len(points) < 4:
+            return False
+
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(previous_gray, gray, points, None)
+        good = status.ravel() == 1
+        if good.sum() < 4:
+            return False
+        dx, dy = np.median((moved[good] - points[good]).reshape(-1, 2), axis=0) / scale
+
+        frame_height, frame_width = (int(round(v / scale)) for v in gray.shape[:2])
+        bx, by, bw, bh = track.box
+        bx = int(min(max(0, bx + dx), frame_width - bw))
+        by = int(min(max(0, by + dy), frame_height - bh))
+        track.box = (bx, by, bw, bh)
+        return True
+
+    def needs_identification(self, track: FaceTrack, gallery_generation=None, now: Optional[float] = None) -> bool:
+        """Whether the track must be (re-)identified with the face encoder"""
+        now = time.time() if now is None else now
+        if track.identified_at is None or track.gallery_generation != gallery_generation:
+            return True
+        max_age = self.reidentify_seconds if track.force_id else self.unknown_retry_seconds
+        if now - track.identified_at > max_age:
+            return True
+
+        with self._lock:
+            self.stats_counters['reused'] += 1
+        return False
+
+    def identify(self, track: FaceTrack, force_id: Optional[str], distance: Optional[float] = None,
+                 gallery_generation=None, now: Optional[float] = None):
+        """Record the result of identifying a track (force_id None for an unknown face)"""
+        with self._lock:
+            if track.force_id and force_id and track.force_id != force_id:
+                logging.info(f"Track {track.track_id} re-identified as {force_id} (was {track.force_id})")
+            track.force_id = force_id
+            track.distance = distance
+            track.identified_at = time.time() if now is None else now
+            track.gallery_generation = gallery_generation
+            self.stats_counters['identifications'] += 1
+
+    def reset(self):
+        with self._lock:
+            self.tracks = []
+            self._previous_level = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+            active = len(self.tracks)
+        lookups = counters['identifications'] + counters['reused']
+        return {
+            'active_tracks': active,
+            **counters,
+            'reuse_ratio': round(counters['reused'] / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,351 @@
+"""
+Capture / inference pipeline for camera monitoring.
+
+A capture thread reads the camera as fast as it delivers frames, so the
+driver buffer never backs up, and hands every Nth frame to a bounded
+drop-oldest queue. Inference workers always take the freshest queued frame;
+frames that went stale while the workers were busy are dropped and counted
+instead of being processed late. Every stage is timed, so the latency from
+frame capture to detection result is bounded and measurable.
+
+With frame_ring=True, sampled frames are decoded straight into a
+FrameRingBuffer (see services/shared_frame_ring.py) instead of a freshly
+allocated array per read; workers pin the frame's slot while the handler
+runs, and a frame whose slot was already reused is skipped and counted.
+
+A motion gate (services/motion_gate.py) in the capture thread keeps frames
+of an unchanged scene away from the workers entirely.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, NamedTuple, Optional
+import numpy as np
+from services.shared_frame_ring import FrameRingBuffer
+
+
+class CapturedFrame(NamedTuple):
+    seq: int
+    image: np.ndarray
+    captured_at: float  # time.perf_counter() when the read returned
+    timestamp: float  # time.time() of the capture, for storing detections
+    ring: Optional[FrameRingBuffer] = None  # Ring holding the image (None = own array)
+    slot: int = -1
+    ring_seq: int = 0
+
+
+class DropOldestQueue:
+    """Bounded frame queue that evicts the oldest frame when full"""
+
+    def __init__(self, maxsize: int = 1):
+        self.maxsize = max(1, maxsize)
+        self._frames = deque()
+        self._condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, frame: CapturedFrame):
+        with self._condition:
+            if len(self._frames) >= self.maxsize:
+                self._frames.popleft()
+                self.dropped += 1
+            self._frames.append(frame)
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[CapturedFrame]:
+        """Oldest queued frame (the only one with the default maxsize 1), or None on timeout"""
+        with self._condition:
+            if not self._frames:
+                self._condition.wait(timeout)
+            return self._frames.popleft() if self._frames else None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until a frame is queued, without taking it"""
+        with self._condition:
+            if not self._frames:
+                self._condition.wait(timeout)
+            return bool(self._frames)
+
+    def clear(self) -> int:
+        with self._condition:
+            cleared = len(self._frames)
+            self._frames.clear()
+            return cleared
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+class FairSemaphore:
+    """
+    Counting semaphore that grants slots in request order
+
+    threading.Semaphore lets a thread that just released a slot take it straight
+    back, so with several pipelines sharing slots one busy camera can starve the
+    others; here a released slot is handed to the longest waiter.
+    """
+
+    def __init__(self, value: int = 1):
+        self._value = max(1, value)
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return True
+            granted = threading.Event()
+            self._waiters.append(granted)
+        if granted.wait(timeout):
+            return True
+        with self._lock:
+            if granted.is_set():  # Handed over while timing out
+                return True
+            self._waiters.remove(granted)
+            return False
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._value += 1
+
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+class StageTimer:
+    """Rolling window of latencies for one pipeline stage"""
+
+    def __init__(self, window: int = 500):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self._samples.append(seconds * 1000)
+        self.count += 1
+
+    def summary(self) -> Dict:
+        samples = np.array(self._samples) if self._samples else None
+        if samples is None:
+            return {'count': self.count}
+        return {
+            'count': self.count,
+            'avg_ms': round(float(samples.mean()), 2),
+            'p50_ms': round(float(np.percentile(samples, 50)), 2),
+            'p95_ms': round(float(np.percentile(samples, 95)), 2),
+            'max_ms': round(float(samples.max()), 2)
+        }
+
+
+class FramePipeline:
+    """
+    Camera capture thread plus inference worker(s) joined by a DropOldestQueue
+
+    handler(frame: CapturedFrame) runs on a worker thread for every frame the
+    workers pick up; its return value is only used for the 'results' counter
+    (truthy results are counted).
+
+    inference_slots (a FairSemaphore) bounds inference across several
+    pipelines: a worker takes a slot before it takes a frame, so it always
+    processes the freshest frame once capacity frees up.
+
+    frame_ring decodes sampled frames into a ring of queue_size + workers + 1
+    preallocated slots; handlers must not keep frame.image after returning.
+
+    motion_gate (a MotionGate) checks every captured frame and decides which
+    ones are sampled: none while the scene is unchanged, every sample_every
+    frames divided by its speedup while there is motion.
+    """
+
+    STAGES = ('capture', 'slot_wait', 'queue_wait', 'inference', 'end_to_end')
+
+    def __init__(self, cap, handler: Callable[[CapturedFrame], object], sample_every: int = 1,
+                 workers: int = 1, queue_size: int = 1, name: str = "FramePipeline",
+                 inference_slots: Optional[FairSemaphore] = None, frame_ring: bool = False, motion_gate=None):
+        self.cap = cap
+        self.handler = handler
+        self.sample_every = max(1, sample_every)
+        self.worker_count = max(1, workers)
+        self.queue = DropOldestQueue(queue_size)
+        self.name = name
+        self.inference_slots = inference_slots
+        self.use_frame_ring = frame_ring
+        self.ring: Optional[FrameRingBuffer] = None  # Created from the first frame's shape
+        self.motion_gate = motion_gate
+        self._last_sampled = 0  # Capture count of the last frame sent to inference
+        self.running = False
+        self.threads = []
+        self.timers = {stage: StageTimer() for stage in self.STAGES}
+        self.counters = {'captured': 0, 'enqueued': 0, 'processed': 0, 'results': 0,
+                         'read_failures': 0, 'handler_errors': 0, 'stale_frames': 0}
+        self.started_at = None
+        self._stats_lock = threading.Lock()  # Workers share the counters and timers
+
+    def start(self):
+        """Start the capture thread and the inference workers"""
+        if self.running:
+            return
+        self.running = True
+        self.started_at = time.time()
+        self.threads = [threading.Thread(target=self._capture_loop, daemon=True, name=f"{self.name}-capture")]
+        self.threads += [
+            threading.Thread(target=self._inference_loop, daemon=True, name=f"{self.name}-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        for thread in self.threads:
+            thread.start()
+        logging.info(f"{self.name} started: {self.worker_count} worker(s), every {self.sample_every} frame(s), "
+                     f"queue size {self.queue.maxsize}")
+
+    def stop(self, timeout: float = 2.0):
+        """Stop all threads; frames still queued are discarded"""
+        self.running = False
+        with self.queue._condition:
+            self.queue._condition.notify_all()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=timeout)
+        self.queue.clear()
+        logging.info(f"{self.name} stopped: {self.stats()}")
+        self.ring = None
+
+    def _capture_loop(self):
+        while self.running:
+            try:
+                if not self.cap or not self.cap.isOpened():
+                    logging.warning("Camera not available in capture thread")
+                    time.sleep(1)
+                    continue
+
+                # Keep reading every frame so the camera buffer stays drained; only every Nth goes to inference
+                # (with a motion gate, every frame is a candidate and the gate decides)
+                sampled = self.motion_gate is not None or (self.counters['captured'] + 1) % self.sample_every == 0
+                reservation = self.ring.begin_write() if sampled and self.ring is not None else None
+
+                read_start = time.perf_counter()
+                if reservation is not None:
+                    ret, image = self.cap.read(reservation[2])
+                else:
+                    ret, image = self.cap.read()
+                captured_at = time.perf_counter()
+                if not ret:
+                    if reservation is not None:
+                        self.ring.abort_write(reservation[0])
+                    self.counters['read_failures'] += 1
+                    time.sleep(0.1)
+                    continue
+
+                self.counters['captured'] += 1
+                with self._stats_lock:
+                    self.timers['capture'].record(captured_at - read_start)
+                if sampled and self.motion_gate is not None:
+                    sampled = self.motion_gate.should_process(image, self.counters['captured'] - self._last_sampled,
+                                                              self.sample_every)
+                if not sampled:
+                    if reservation is not None:
+                        self.ring.abort_write(reservation[0])
+                    continue
+                self._last_sampled = self.counters['captured']
+
+                timestamp = time.time()
+                if reservation is not None and image.shape != reservation[2].shape:
+                    # The resolution changed: pass this frame on as is, the next ones get a new ring
+                    self.ring.abort_write(reservation[0])
+                    reservation, self.ring = None, None
+                if reservation is not None:
+                    slot, ring_seq, view = reservation
+                    if image.ctypes.data != view.ctypes.data:
+                        view[...] = image  # The backend decoded into its own array
+                    self.ring.commit(slot, ring_seq, timestamp)
+                    frame = CapturedFrame(self.counters['captured'], view, captured_at, timestamp,
+                                          self.ring, slot, ring_seq)
+                else:
+                    if self.use_frame_ring and self.ring is None:
+                        # Slots for every queued frame, one per worker and the one being decoded
+                        self.ring = FrameRingBuffer.create(image.shape, self.queue.maxsize + self.worker_count + 1,
+                                                           shared=False)
+                    frame = CapturedFrame(self.counters['captured'], image, captured_at, timestamp)
+                self.queue.put(frame)
+                self.counters['enqueued'] += 1
+
+            except Exception as e:
+                logging.error(f"Error in capture thread: {e}")
+                time.sleep(1)
+
+    def _inference_loop(self):
+        while self.running:
+            slot_wait = 0.0
+            if self.inference_slots is None:
+                frame = self.queue.get(timeout=0.5)
+            else:
+                # Shared capacity: only hold a slot while there is a frame to process
+                if not self.queue.wait(timeout=0.5):
+                    continue
+                slot_start = time.perf_counter()
+                acquired = False
+                while self.running and not acquired:
+                    acquired = self.inference_slots.acquire(timeout=0.5)
+                if not acquired:
+                    continue
+                slot_wait = time.perf_counter() - slot_start
+                frame = self.queue.get(timeout=0)
+                if frame is None:
+                    self.inference_slots.release()
+                    continue
+            if frame is None:
+                continue
+
+            ring = frame.ring
+            if ring is not None and ring.acquire(frame.slot, frame.ring_seq) is None:
+                # The slot was reused for a newer frame while this one waited
+                self.counters['stale_frames'] += 1
+                if self.inference_slots is not None:
+                    self.inference_slots.release()
+                continue
+
+            started = time.perf_counter()
+            result, failed = None, False
+            try:
+                result = self.handler(frame)
+            except Exception as e:
+                failed = True
+                logging.error(f"Error in inference worker: {e}")
+            finally:
+                if ring is not None:
+                    ring.release(frame.slot, frame.ring_seq)
+                if self.inference_slots is not None:
+                    self.inference_slots.release()
+            finished = time.perf_counter()
+
+            with self._stats_lock:
+                if self.inference_slots is not None:
+                    self.timers['slot_wait'].record(slot_wait)
+                self.counters['processed'] += 1
+                self.counters['results'] += 1 if result else 0
+                self.counters['handler_errors'] += 1 if failed else 0
+                self.timers['queue_wait'].record(started - frame.captured_at)
+                self.timers['inference'].record(finished - started)
+                self.timers['end_to_end'].record(finished - frame.captured_at)
+
+    def stats(self) -> Dict:
+        """Per-stage timing, frame counters and drop counts"""
+        elapsed = time.time() - self.started_at if self.started_at else 0
+        with self._stats_lock:
+            stages = {stage: timer.summary() for stage, timer in self.timers.items()}
+        return {
+            'running': self.running,
+            'workers': self.worker_count,
+            'sample_every': self.sample_every,
+            'queue_size': self.queue.maxsize,
+            'queued': len(self.queue),
+            'dropped': self.queue.dropped,
+            'capture_fps': round(self.counters['captured'] / elapsed, 2) if elapsed else 0,
+            'inference_fps': round(self.counters['processed'] / elapsed, 2) if elapsed else 0,
+            **self.counters,
+            'frame_ring': self.ring.stats() if self.ring is not None else None,
+            'motion_gate': self.motion_gate.stats() if self.motion_gate is not None else None,
+            'stages': stages
+        }
@@ -1,13 +1,12 @@
 import threading
 import logging
-import os
-import time
 from typing import Optional, Tuple, List
 from datetime import datetime
-import cv2
-from keras.models import model_from_json
 from services.face_model_manager import FaceModelManager
 from services.model_refresh_service import get_model_refresh_service
+from services.model_registry import get_model_registry
+from services.service_container import get_service_container
+from config.settings import settings
 
 class ModelPreloaderService:
     """
@@ -24,11 +23,9 @@ class ModelPreloaderService:
         self.preload_start_time = None
         self.preload_end_time = None
         
-        # Cached models
-        self.face_model_cache = None
-        self.face_ids_cache = None
-        self.emotion_model_cache = None
-        self.face_cascade_cache = None
+        # Models live in the process-wide model registry; the face gallery in it is
+        # republished by the model refresh service as soldiers are enrolled or removed
+        self.model_registry = get_model_registry()
         
         # Thread safety
         self.load_lock = threading.RLock()
@@ -97,6 +94,11 @@ class ModelPreloaderService:
                 print(f"[MEMORY] Memory usage: ~{self._estimate_memory_usage():.1f}MB")
                 logging.info(f"Model preloading completed in {preload_duration:.2f} seconds")
                 
+                # Step 4: Construct the camera/recognition services (and their imports) before their first request
+                if settings.SERVICE_WARMUP:
+                    print("[PRELOADER] Warming up services...")
+                    get_service_container().warm()
+                
             except Exception as e:
                 logging.error(f"Model preloading failed: {e}")
                 print(f"[ERROR] Model preloading failed: {e}")
@@ -105,15 +107,7 @@ class ModelPreloaderService:
     def _load_face_cascade(self):
         """Load face detection cascade"""
         try:
-            current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            cascade_path = os.path.join(current_dir, 'haarcascades', 'haarcascade_frontalface_default.xml')
-            
-            self.face_cascade_cache = cv2.CascadeClassifier(cascade_path)
-            if self.face_cascade_cache.empty():
-                raise Exception("Failed to load face cascade classifier")
-                
-            logging.info("Face cascade loaded successfully")
-            
+            self.model_registry.load_static_models(emotion_model=False)
         except Exception as e:
             logging.error(f"Failed to load face cascade: {e}")
             raise
@@ -121,68 +115,48 @@ class ModelPreloaderService:
     def _load_emotion_model(self):
         """Load emotion detection model"""
         try:
-            current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            model_json_path = os.path.join(current_dir, 'model', 'emotion_model.json')
-            model_h5_path = os.path.join(current_dir, 'model', 'emotion_model.h5')
-            
-            # Load model architecture
-            with open(model_json_path, 'r') as json_file:
-                loaded_model_json = json_file.read()
-            
-            self.emotion_model_cache = model_from_json(loaded_model_json)
-            self.emotion_model_cache.load_weights(model_h5_path)
-            
-            logging.info("Emotion detection model loaded successfully")
-            
+            self.model_registry.load_static_models(face_cascade=False)
         except Exception as e:
             logging.error(f"Failed to load emotion model: {e}")
             raise
     
     def _load_face_recognition_model(self):
-        """Load face recognition model with all soldier encodings"""
+        """Make sure the model refresh service has loaded the face recognition model"""
         try:
-            # Use existing model refresh service to get current model
-            encodings, force_ids = self.model_refresh_service.get_current_model()
+            face_index = self.model_refresh_service.get_face_index()
             
-            if encodings is None or force_ids is None:
+            if face_index is None:
                 # Try to refresh the model
                 refresh_result = self.model_refresh_service.force_refresh()
                 logging.info(f"Face model refresh result: {refresh_result}")
-                
-                # Get model after refresh
-                encodings, force_ids = self.model_refresh_service.get_current_model()
+                face_index = self.model_refresh_service.get_face_index()
             
-            if encodings is not None and force_ids is not None:
-                self.face_model_cache = encodings
-                self.face_ids_cache = force_ids
-                logging.info(f"Face recognition model loaded with {len(force_ids)} soldiers")
+            if face_index is not None:
+                logging.info(f"Face recognition model loaded with {face_index.soldier_count} soldiers")
             else:
                 logging.warning("No face recognition model available - continuing without it")
-                self.face_model_cache = []
-                self.face_ids_cache = []
                 
         except Exception as e:
             logging.error(f"Failed to load face recognition model: {e}")
             # Don't fail completely - system can work without face recognition
-            self.face_model_cache = []
-            self.face_ids_cache = []
     
     def _estimate_memory_usage(self):
         """Estimate total memory usage of cached models"""
         memory_mb = 0
+        models = self.model_registry.current()
         
         # Emotion model: ~2-3MB
-        if self.emotion_model_cache:
+        if models.emotion_model is not None:
             memory_mb += 2.5
         
         # Face cascade: ~1MB
-        if self.face_cascade_cache:
+        if models.face_cascade is not None:
             memory_mb += 1.0
         
-        # Face recognition model: ~10KB per soldier
-        if self.face_model_cache:
-            soldiers_count = len(self.face_ids_cache) if self.face_ids_cache else 0
-            memory_mb += (soldiers_count * 10) / 1000  # Convert KB to MB
+        # Face recognition model: the gallery index arrays (memory-mapped, shared page cache)
+        face_index = models.face_index
+        if face_index is not None:
+            memory_mb += face_index.describe().get('memory_bytes', 0) / (1024 * 1024)
         
         return memory_mb
     
@@ -191,37 +165,43 @@ class ModelPreloaderService:
         if not self.models_ready:
             logging.warning("Models not ready yet - falling back to on-demand loading")
             return None
-        return self.face_cascade_cache
+        return self.model_registry.current().face_cascade
     
     def get_emotion_model(self):
         """Get preloaded emotion model - instant access"""
         if not self.models_ready:
             logging.warning("Models not ready yet - falling back to on-demand loading")
             return None
-        return self.emotion_model_cache
+        return self.model_registry.current().emotion_model
     
     def get_face_recognition_model(self) -> Tuple[Optional[List], Optional[List]]:
         """Get preloaded face recognition model - instant access"""
         if not self.models_ready:
             logging.warning("Models not ready yet - falling back to on-demand loading")
             return None, None
-        return self.face_model_cache, self.face_ids_cache
+        return self.model_refresh_service.get_current_model()
     
     def get_face_encodings(self) -> Optional[dict]:
-        """Get preloaded face encodings as dictionary - instant access"""
-        if not self.models_ready or not self.face_model_cache or not self.face_ids_cache:
+        """Get preloaded face encodings grouped by soldier (force_id -> list of encodings)"""
+        encodings, force_ids = self.get_face_recognition_model()
+        if encodings is None or not len(encodings) or not force_ids:
             logging.warning("Face encodings not ready yet - falling back to on-demand loading")
             return None
         
-        # Convert lists to dictionary format expected by enhanced emotion detection service
+        # Every soldier has several encodings; keep all of them
         face_encodings_dict = {}
-        if self.face_model_cache and self.face_ids_cache:
-            for i, force_id in enumerate(self.face_ids_cache):
-                if i < len(self.face_model_cache):
-                    face_encodings_dict[force_id] = self.face_model_cache[i]
+        for encoding, force_id in zip(encodings, force_ids):
+            face_encodings_dict.setdefault(force_id, []).append(encoding)
         
         return face_encodings_dict if face_encodings_dict else None
     
+    def get_face_index(self):
+        """Get preloaded FaceGalleryIndex - instant access"""
+        if not self.models_ready:
+            logging.warning("Face index not ready yet - falling back to on-demand loading")
+            return None
+        return self.model_registry.current().face_index
+    
     def is_ready(self) -> bool:
         """Check if all models are loaded and ready"""
         return self.models_ready
@@ -233,16 +213,21 @@ class ModelPreloaderService:
         else:
             load_time = None
         
+        models = self.model_registry.current()
+        face_index = models.face_index
+        
         return {
             "ready": self.models_ready,
-            "soldiers_loaded": len(self.face_ids_cache) if self.face_ids_cache else 0,
+            "soldiers_loaded": face_index.soldier_count if face_index is not None else 0,
             "estimated_memory_mb": self._estimate_memory_usage(),
             "load_time_seconds": load_time,
             "models": {
-                "face_cascade": self.face_cascade_cache is not None,
-                "emotion_model": self.emotion_model_cache is not None,
-                "face_recognition": self.face_model_cache is not None
-            }
+                "face_cascade": models.face_cascade is not None,
+                "emotion_model": models.emotion_model is not None,
+                "face_recognition": face_index is not None
+            },
+            "registry": self.model_registry.stats(),
+            "services": get_service_container().stats()
         }
     
     def refresh_face_model(self):
@@ -250,7 +235,9 @@ class ModelPreloaderService:
         with self.load_lock:
             try:
                 logging.info("Refreshing face recognition model...")
-                self._load_face_recognition_model()
+                result = self.model_refresh_service.refresh_model(force=True)
+                if result.get("error"):
+                    raise Exception(result["error"])
                 logging.info("Face recognition model refreshed successfully")
                 return True
             except Exception as e:
@@ -2,28 +2,44 @@ import threading
 import time
 import os
 import logging
+import numpy as np
 from datetime import datetime, timedelta
 from typing import Optional, List, Tuple, Dict
-from services.face_model_manager import FaceModelManager
+from config.settings import settings
+from services.face_model_manager import (FaceModelManager, add_model_listener, concatenate_segments,
+                                         get_model_change_watcher, get_segment_compactor, live_rows)
+from services.face_gallery_index import SegmentedGalleryIndex, build_gallery_index_grouped
+from services.model_registry import get_model_registry
 
 class ModelRefreshService:
     """
     Service to handle automatic model refreshing for real-time recognition
+    
+    The service listens for model changes (FaceModelManager writes in this
+    process, the ModelChangeWatcher for other processes) and applies them as
+    deltas: new segments are indexed, tombstoned soldiers are masked out of the
+    existing segment indexes, and everything else is reused.
     """
     
     def __init__(self):
         self.model_manager = FaceModelManager()
         self.current_model_version = None
+        self.current_generation = None  # Manifest generation the current model was loaded from
+        self.current_segments = None  # Live ModelSegments of the current model
         self.current_encodings = None
-        self.current_force_ids = None
+        self.current_row_force_ids = None
+        self.current_force_ids = None  # Soldiers in the current model
+        self.current_index = None  # SegmentedGalleryIndex for the current model version
+        self.segment_indexes = {}  # segment name -> index of all rows of that segment
         self.last_refresh_time = None
         self.refresh_lock = threading.RLock()
         self.auto_refresh_interval = 300  # 5 minutes default
         self.auto_refresh_thread = None
         self.auto_refresh_enabled = False
         
-        # Load initial model
+        # Load initial model and apply every later change as it is published
         self.refresh_model()
+        add_model_listener(self._on_model_change)
         
         logging.basicConfig(
             filename="model_refresh_service.log",
@@ -68,6 +84,11 @@ class ModelRefreshService:
                 logging.error(f"Error in auto refresh loop: {e}")
                 time.sleep(60)  # Wait 1 minute before retrying
     
+    def _on_model_change(self, manifest: Dict):
+        """Model listener: apply a published change right away"""
+        if manifest.get('generation') != self.current_generation:
+            self.refresh_model(auto_refresh=True)
+    
     def refresh_model(self, force: bool = False, auto_refresh: bool = False) -> Dict:
         """
         Refresh the in-memory model if needed
@@ -81,9 +102,9 @@ class ModelRefreshService:
         """
         with self.refresh_lock:
             try:
-                # Check if model file exists and get modification time
-                model_path = self.model_manager.model_filename
-                if not os.path.exists(model_path):
+                # Check if model manifest exists and get modification time
+                model_path = self.model_manager.manifest_filename
+                if not os.path.exists(model_path) and not self.model_manager.migrate_legacy_model():
                     logging.warning("Model file does not exist")
                     return {
                         "refreshed": False,
@@ -91,16 +112,14 @@ class ModelRefreshService:
                         "current_soldiers": 0
                     }
                 
-                # Get file modification time
-                model_mtime = os.path.getmtime(model_path)
-                model_modified = datetime.fromtimestamp(model_mtime)
+                # Every publish bumps the manifest generation
+                manifest = self.model_manager._load_metadata()
                 
                 # Check if refresh is needed
                 needs_refresh = (
                     force or 
-                    self.current_encodings is None or
-                    self.last_refresh_time is None or
-                    model_modified > self.last_refresh_time
+                    self.current_segments is None or
+                    manifest.get('generation') != self.current_generation
                 )
                 
                 if not needs_refresh:
@@ -113,11 +132,13 @@ class ModelRefreshService:
                         "last_refresh": self.last_refresh_time.isoformat() if self.last_refresh_time else None
                     }
                 
-                # Load model
+                # Memory-map the segments (O(1), shared page cache across processes); tombstoned
+                # rows stay mapped and are masked out of the index instead of copied out
                 logging.info("Refreshing face recognition model...")
-                encodings, force_ids = self.model_manager.load_model_with_validation()
+                start = time.time()
+                segments, manifest = self.model_manager.load_segments(include_hidden=True)
                 
-                if encodings is None or force_ids is None:
+                if segments is None:
                     logging.error("Failed to load model during refresh")
                     return {
                         "refreshed": False,
@@ -126,27 +147,51 @@ class ModelRefreshService:
                     }
                 
                 # Update current model
-                old_count = len(self.current_force_ids) if self.current_force_ids else 0
-                new_count = len(force_ids)
+                old_ids = set(self.current_force_ids or [])
+                
+                # Only segments that are new since the last refresh get indexed; removals
+                # become an O(soldiers) mask over the segment index that is already built
+                segment_indexes, parts, built = {}, [], 0
+                for segment in segments:
+                    base = self.segment_indexes.get(segment.name)
+                    if base is None:
+                        base = build_gallery_index_grouped(segment.encodings, segment.labels, segment.force_ids,
+                                                           segment.name, centroids=segment.centroids)
+                        if base is None:
+                            raise ValueError(f"Could not index model segment {segment.name}")
+                        built += 1
+                    segment_indexes[segment.name] = base
+                    parts.append(base.without(segment.hidden) if segment.hidden else base)
                 
-                self.current_encodings = encodings
-                self.current_force_ids = force_ids
+                self.segment_indexes = segment_indexes
+                self.current_segments = segments
+                self.current_encodings = None  # Concatenated on demand by get_current_model()
+                self.current_model_version = manifest.get('version', 'unknown')
+                self.current_generation = manifest.get('generation')
+                self.current_index = SegmentedGalleryIndex(parts, self.current_model_version)
+                self.current_force_ids = list(self.current_index.force_ids)
                 self.last_refresh_time = datetime.now()
                 
-                # Get model metadata for version info
-                metadata = self.model_manager._load_metadata()
-                if metadata:
-                    self.current_model_version = metadata.get('version', 'unknown')
+                # Readers switch to the new gallery on their next frame; the previous one is
+                # freed once the last frame holding it finishes
+                get_model_registry().publish(face_index=self.current_index,
+                                             face_model_generation=self.current_generation)
                 
+                new_ids = set(self.current_force_ids)
+                added, removed = len(new_ids - old_ids), len(old_ids - new_ids)
                 refresh_type = "auto" if auto_refresh else "manual"
-                logging.info(f"Model refreshed ({refresh_type}) - Soldiers: {old_count} -> {new_count}")
+                logging.info(f"Model refreshed ({refresh_type}) - Soldiers: {len(old_ids)} -> {len(new_ids)} "
+                             f"(+{added}/-{removed}, {built} segment(s) indexed in {(time.time() - start) * 1000:.1f}ms)")
                 
                 return {
                     "refreshed": True,
                     "reason": f"Model updated ({refresh_type})",
-                    "old_soldier_count": old_count,
-                    "new_soldier_count": new_count,
-                    "soldiers_added": new_count - old_count,
+                    "old_soldier_count": len(old_ids),
+                    "new_soldier_count": len(new_ids),
+                    "soldiers_added": added,
+                    "soldiers_removed": removed,
+                    "segments_indexed": built,
+                    "model_generation": self.current_generation,
                     "model_version": self.current_model_version,
                     "refresh_time": self.last_refresh_time.isoformat()
                 }
@@ -164,16 +209,33 @@ class ModelRefreshService:
         Get the current in-memory model
         
         Returns:
-            Tuple of (encodings, force_ids) or (None, None) if not loaded
+            Tuple of (encodings, force_ids) or (None, None) if not loaded, with
+            one force_id per row of the (N, 128) float32 encodings matrix.
+        """
+        with self.refresh_lock:
+            if self.current_segments is None:
+                return None, None
+            if self.current_encodings is None:
+                matrix, labels, soldier_ids = concatenate_segments([live_rows(s) for s in self.current_segments])
+                self.current_encodings = matrix
+                self.current_row_force_ids = np.asarray(soldier_ids, dtype=object)[labels].tolist() if len(labels) else []
+            return self.current_encodings, self.current_row_force_ids
+    
+    def get_face_index(self):
+        """
+        Get the FaceGalleryIndex built for the current model
+        
+        Returns:
+            FaceGalleryIndex or None if no model is loaded
         """
         with self.refresh_lock:
-            return self.current_encodings, self.current_force_ids
+            return self.current_index
     
     def get_model_status(self) -> Dict:
         """Get current model status and metadata"""
         with self.refresh_lock:
             return {
-                "model_loaded": self.current_encodings is not None,
+                "model_loaded": self.current_segments is not None,
                 "soldier_count": len(self.current_force_ids) if self.current_force_ids else 0,
                 "model_version": self.current_model_version,
                 "last_refresh": self.last_refresh_time.isoformat() if self.last_refresh_time else None,
@@ -213,7 +275,11 @@ def get_model_refresh_service() -> ModelRefreshService:
     with _service_lock:
         if _global_model_refresh_service is None:
             _global_model_refresh_service = ModelRefreshService()
-            # Start auto refresh by default
+            # Start auto refresh by default (a fallback - changes are normally applied as published)
             _global_model_refresh_service.start_auto_refresh(300)  # 5 minutes
+            # Pick up model changes written by other processes (e.g. a separate enrollment worker)
+            get_model_change_watcher().start(settings.FACE_MODEL_WATCH_MODE, settings.FACE_MODEL_WATCH_INTERVAL)
+            # Merge model segments in the background as enrollments/deletions accumulate
+            get_segment_compactor().start(settings.FACE_MODEL_COMPACTION_INTERVAL)
         
         return _global_model_refresh_service
@@ -0,0 +1,192 @@
+"""
+Process-wide registry of the loaded ML models.
+
+The emotion network, the Haar cascade and the face gallery index are held in
+one immutable, versioned ModelSnapshot. Readers take the current snapshot
+with a plain attribute read (no lock) and use it for a whole frame, so a
+refresh never changes the models under a running detection. Writers build a
+new snapshot and swap it in; the previous one is retired and freed as soon
+as its last reader drops its reference (RCU-style, with the interpreter's
+reference count as the reader count), so only the current version plus the
+versions still in use stay in memory.
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMOTION_MODEL_JSON = os.path.join(BASE_DIR, 'model', 'emotion_model.json')
+EMOTION_MODEL_WEIGHTS = os.path.join(BASE_DIR, 'model', 'emotion_model.h5')
+FACE_CASCADE_PATH = os.path.join(BASE_DIR, 'haarcascades', 'haarcascade_frontalface_default.xml')
+
+
+class ModelSnapshot:
+    """Immutable set of models published together under one version"""
+
+    __slots__ = (
+        'version', 'published_at', 'emotion_model', 'face_cascade', 'face_index', 'face_model_generation',
+        '__weakref__'
+    )
+
+    def __init__(self, version: int, emotion_model=None, face_cascade=None, face_index=None,
+                 face_model_generation: Optional[int] = None):
+        set_ = object.__setattr__
+        set_(self, 'version', version)
+        set_(self, 'published_at', time.time())
+        set_(self, 'emotion_model', emotion_model)
+        set_(self, 'face_cascade', face_cascade)
+        set_(self, 'face_index', face_index)
+        set_(self, 'face_model_generation', face_model_generation)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ModelSnapshot is read-only")
+
+    def replace(self, version: int, **changes) -> 'ModelSnapshot':
+        """New snapshot with some models replaced and the rest shared"""
+        fields = {
+            'emotion_model': self.emotion_model,
+            'face_cascade': self.face_cascade,
+            'face_index': self.face_index,
+            'face_model_generation': self.face_model_generation
+        }
+        fields.update(changes)
+        return ModelSnapshot(version, **fields)
+
+
+class ModelRegistry:
+    """Owns the current ModelSnapshot; see the module docstring"""
+
+    def __init__(self):
+        self._current = ModelSnapshot(0)
+        self._publish_lock = threading.Lock()  # Writers only
+        self._load_lock = threading.Lock()
+        self._retired = weakref.WeakValueDictionary()  # version -> retired snapshot still held by a reader
+        self._freed_count = 0
+
+    def current(self) -> ModelSnapshot:
+        """
+        The current snapshot. A plain attribute read, so it never blocks on a
+        refresh; keep the returned snapshot for the whole unit of work (one
+        frame, one request) instead of calling current() per model.
+        """
+        return self._current
+
+    def publish(self, **changes) -> ModelSnapshot:
+        """
+        Swap in a new snapshot with the given models replaced
+
+        Args:
+            **changes: emotion_model, face_cascade, face_index and/or face_model_generation
+
+        Returns:
+            ModelSnapshot: The published snapshot
+        """
+        with self._publish_lock:
+            previous = self._current
+            snapshot = previous.replace(previous.version + 1, **changes)
+            self._current = snapshot
+
+            self._retired[previous.version] = previous
+            weakref.finalize(previous, self._on_freed, previous.version)
+
+        logging.info(f"Model registry published version {snapshot.version} ({', '.join(sorted(changes))})")
+        return snapshot
+
+    def _on_freed(self, version: int):
+        self._freed_count += 1
+        logging.debug(f"Model registry version {version} freed")
+
+    def load_static_models(self, face_cascade: bool = True, emotion_model: bool = True) -> ModelSnapshot:
+        """
+        Load the face cascade and/or the emotion network once per process
+
+        Returns:
+            ModelSnapshot: The current snapshot with the requested models loaded
+        """
+        def missing(snapshot):
+            return {
+                name for name, wanted in (('face_cascade', face_cascade), ('emotion_model', emotion_model))
+                if wanted and getattr(snapshot, name) is None
+            }
+
+        snapshot = self._current
+        if not missing(snapshot):
+            return snapshot
+
+        with self._load_lock:
+            snapshot = self._current
+            changes = {}
+            if 'face_cascade' in missing(snapshot):
+                changes['face_cascade'] = load_face_cascade()
+            if 'emotion_model' in missing(snapshot):
+                changes['emotion_model'] = load_emotion_model()
+            return self.publish(**changes) if changes else snapshot
+
+    def stats(self) -> Dict:
+        """Current version and the retired versions still held by readers"""
+        current = self._current
+        return {
+            'version': current.version,
+            'published_at': current.published_at,
+            'face_model_generation': current.face_model_generation,
+            'emotion_model_loaded': current.emotion_model is not None,
+            'face_cascade_loaded': current.face_cascade is not None,
+            'face_index_loaded': current.face_index is not None,
+            'retired_versions_alive': sorted(self._retired.keys()),
+            'retired_versions_freed': self._freed_count
+        }
+
+
+def load_face_cascade():
+    """Load the Haar cascade used for face detection"""
+    import cv2
+
+    face_cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
+    if face_cascade.empty():
+        raise Exception("Failed to load face cascade classifier")
+    logging.info("Face cascade loaded successfully")
+    return face_cascade
+
+
+def load_emotion_model():
+    """
+    Load the emotion detection network with the configured engine: 'numpy'
+    (model/emotion_model.npz, no TensorFlow import), 'keras', or 'auto'
+    (numpy if the converted model exists)
+    """
+    from config.settings import settings
+    from services.emotion_numpy_engine import EMOTION_MODEL_NPZ, NumpyEmotionModel
+
+    engine = settings.EMOTION_ENGINE
+    if engine == 'numpy' or (engine == 'auto' and os.path.exists(EMOTION_MODEL_NPZ)):
+        return NumpyEmotionModel.load(EMOTION_MODEL_NPZ)
+    return load_keras_emotion_model()
+
+
+def load_keras_emotion_model():
+    """Load the emotion detection network with Keras"""
+    from keras.models import model_from_json
+
+    with open(EMOTION_MODEL_JSON, 'r') as json_file:
+        emotion_model = model_from_json(json_file.read())
+    emotion_model.load_weights(EMOTION_MODEL_WEIGHTS)
+    logging.info("Emotion detection model loaded successfully")
+    return emotion_model
+
+
+# Global instance for singleton pattern
+_global_model_registry = None
+_registry_lock = threading.Lock()
+
+def get_model_registry() -> ModelRegistry:
+    """Get the process-wide model registry (singleton)"""
+    global _global_model_registry
+
+    if _global_model_registry is None:
+        with _registry_lock:
+            if _global_model_registry is None:
+                _global_model_registry = ModelRegistry()
+    return _global_model_registry
@@ -0,0 +1,141 @@
+"""
+Motion / scene-change gating in front of face detection.
+
+Kiosk and barracks cameras see an empty scene most of the time. The gate
+compares a small blurred gray copy of each candidate frame (MOTION_GATE_WIDTH
+pixels wide, well under a millisecond) with a slowly adapting background
+and only lets a frame through to face detection when enough of the scene
+changed:
+
+- idle: nothing is detected, apart from one refresh frame every
+  MOTION_GATE_IDLE_REFRESH_SECONDS (catches someone who walked in and
+  stood still long enough to become background)
+- motion onset: the changed frame goes through at once, without waiting
+  for the next sampling interval
+- active (motion within the last MOTION_GATE_HOLD_SECONDS): frames are
+  sampled MOTION_GATE_SPEEDUP times as often as the configured interval
+
+Skipped and processed frames are counted per gate (see stats()).
+"""
+import threading
+import time
+from typing import Dict, Optional
+import cv2
+import numpy as np
+from config.settings import settings
+
+
+class MotionGate:
+    """
+    Decides per frame whether face detection should run
+
+    Args:
+        width: Width of the gray frame compared with the background
+        pixel_threshold: Gray-level difference (0-255) that counts a pixel as changed
+        min_area: Share of changed pixels that counts as motion
+        learning_rate: Background update weight per checked frame
+        hold_seconds: Stay active this long after the last motion
+        idle_refresh_seconds: Let one frame through this often while idle (0 = never)
+        speedup: Sampling interval divisor while active
+    """
+
+    def __init__(self, width: int = 80, pixel_threshold: int = 25, min_area: float = 0.01,
+                 learning_rate: float = 0.05, hold_seconds: float = 2.0, idle_refresh_seconds: float = 10.0,
+                 speedup: int = 2):
+        self.width = max(16, width)
+        self.pixel_threshold = pixel_threshold
+        self.min_area = min_area
+        self.learning_rate = learning_rate
+        self.hold_seconds = hold_seconds
+        self.idle_refresh_seconds = idle_refresh_seconds
+        self.speedup = max(1, speedup)
+        self._background: Optional[np.ndarray] = None
+        self._last_motion = None
+        self._last_passed = 0.0
+        self._lock = threading.Lock()  # Capture threads of one gate are serialised, stats() reads concurrently
+        self.last_changed_area = 0.0
+        self.check_seconds = 0.0
+        self.counters = {'checked': 0, 'motion_frames': 0, 'processed': 0, 'triggered': 0, 'refreshed': 0,
+                         'skipped_idle': 0, 'skipped_interval': 0}
+
+    @property
+    def active(self) -> bool:
+        return self._last_motion is not None and time.monotonic() - self._last_motion < self.hold_seconds
+
+    def _changed_area(self, frame: np.ndarray) -> float:
+        """Share of the scene that differs from the background (1.0 for the first frame)"""
+        height = max(1, int(round(frame.shape[0] * self.width / frame.shape[1])))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype(np.float32)
+            return 1.0
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+        return float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+
+    def should_process(self, frame: np.ndarray, frames_since_last: int = 1, sample_every: int = 1) -> bool:
+        """
+        Check a frame and decide whether it goes to face detection
+
+        Args:
+            frame: Captured BGR (or gray) frame
+            frames_since_last: Frames captured since the last one that went through
+            sample_every: Configured detection interval in frames
+        """
+        with self._lock:
+            started = time.perf_counter()
+            changed = self._changed_area(frame)
+            now = time.monotonic()
+            was_active = self.active
+            motion = changed >= self.min_area
+            if motion:
+                self._last_motion = now
+            self.last_changed_area = changed
+            self.counters['checked'] += 1
+            self.counters['motion_frames'] += 1 if motion else 0
+
+            if motion and not was_active:
+                passed, reason = True, 'triggered'
+            elif motion or was_active:
+                passed = frames_since_last >= max(1, sample_every // self.speedup)
+                reason = None if passed else 'skipped_interval'
+            elif self.idle_refresh_seconds and now - self._last_passed >= self.idle_refresh_seconds:
+                passed, reason = True, 'refreshed'
+            else:
+                passed, reason = False, 'skipped_idle'
+
+            if reason:
+                self.counters[reason] += 1
+            if passed:
+                self._last_passed = now
+                self.counters['processed'] += 1
+            self.check_seconds += time.perf_counter() - started
+            return passed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            checked = self.counters['checked']
+            return {
+                'active': self.active,
+                'changed_area': round(self.last_changed_area, 4),
+                **self.counters,
+                'skipped': self.counters['skipped_idle'] + self.counters['skipped_interval'],
+                'avg_check_ms': round(self.check_seconds / checked * 1000, 3) if checked else None
+            }
+
+
+def create_motion_gate() -> Optional[MotionGate]:
+    """Motion gate configured from settings, or None when MOTION_GATE_ENABLED is off"""
+    if not settings.MOTION_GATE_ENABLED:
+        return None
+    return MotionGate(
+        width=settings.MOTION_GATE_WIDTH,
+        pixel_threshold=settings.MOTION_GATE_PIXEL_THRESHOLD,
+        min_area=settings.MOTION_GATE_MIN_AREA,
+        hold_seconds=settings.MOTION_GATE_HOLD_SECONDS,
+        idle_refresh_seconds=settings.MOTION_GATE_IDLE_REFRESH_SECONDS,
+        speedup=settings.MOTION_GATE_SPEEDUP
+    )
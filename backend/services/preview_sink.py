@@ -0,0 +1,256 @@
+"""
+Optional live preview of the CCTV monitoring feed.
+
+Monitoring runs headless by default (CCTV_PREVIEW=none): detection works on
+the captured frame and nothing is copied, annotated, encoded or shown, so
+the server needs no display. With a preview sink the annotated frame is only
+rendered when someone is watching, and at most CCTV_PREVIEW_FPS times a
+second:
+
+    CCTV_PREVIEW=mjpeg   MJPEG stream at GET /api/image/monitoring-preview,
+                         rendered only while a client is connected
+    CCTV_PREVIEW=window  OpenCV debug window (needs a display)
+
+With CCTV_CAMERAS every camera is its own feed (?camera=<id>); its frames
+are annotated and JPEG-encoded by the camera farm worker that analysed
+them, and only when a preview frame of that camera was claimed.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+import cv2
+import numpy as np
+
+PREVIEW_MODES = ('none', 'mjpeg', 'window')
+DEFAULT_FEED = 'default'  # Feed of the single-camera pipeline; camera farm feeds are camera ids
+JPEG_QUALITY = 70
+BOX_COLOR = (0, 255, 0)
+
+
+def annotate_frame(frame: np.ndarray, detections: List, width: int = 0) -> np.ndarray:
+    """
+    Copy of the frame, downscaled to `width` (0 = native), with a box, the
+    force_id and the emotion drawn for every (force_id, emotion, score, face_coords)
+    """
+    scale = 1.0
+    if width and frame.shape[1] > width:
+        scale = width / frame.shape[1]
+        image = cv2.resize(frame, (width, int(round(frame.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+    else:
+        image = frame.copy()
+
+    for force_id, emotion, _, face_coords in detections:
+        x, y, w, h = (int(round(v * scale)) for v in face_coords)
+        cv2.rectangle(image, (x, y), (x + w, y + h), BOX_COLOR, 2)
+        cv2.putText(image, f"ID: {force_id}", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9 * max(scale, 0.5),
+                    BOX_COLOR, 2)
+        cv2.putText(image, f"Emotion: {emotion}", (x, y + h + 25), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.9 * max(scale, 0.5), BOX_COLOR, 2)
+    return image
+
+
+def encode_jpeg(image: np.ndarray) -> Optional[bytes]:
+    ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    return encoded.tobytes() if ok else None
+
+
+class PreviewSink:
+    """
+    Headless sink: never renders a frame
+
+    Frames are either rendered here (offer, single-camera pipeline) or by a
+    camera farm worker that was asked for one (claim, then publish_jpeg).
+    """
+
+    mode = 'none'
+
+    def __init__(self, fps: float = 5.0, width: int = 640):
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.width = width
+        self._lock = threading.Lock()
+        self._last_rendered: Dict[str, float] = {}
+        self.rendered = 0
+        self.rendered_here = 0  # Rendered by offer (the rest came from camera farm workers)
+        self.render_seconds = 0.0
+
+    def viewers(self, feed: Optional[str] = None) -> int:
+        """Viewers of one feed (all feeds if None)"""
+        return 0
+
+    def claim(self, feed: str = DEFAULT_FEED) -> bool:
+        """True if a frame of `feed` should be rendered now: a viewer is attached and one is due"""
+        if not self.viewers(feed):
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_rendered.get(feed, 0.0) < self.interval:
+                return False
+            self._last_rendered[feed] = now
+            return True
+
+    def offer(self, frame: np.ndarray, detections: List, feed: str = DEFAULT_FEED) -> bool:
+        """
+        Render a processed frame if a viewer is attached and one is due
+
+        Called from the inference workers for every processed frame; returns
+        right away (no copy, no drawing) when the frame is not needed.
+        """
+        if not self.claim(feed):
+            return False
+
+        started = time.perf_counter()
+        try:
+            self._show(feed, annotate_frame(frame, detections, self.width))
+        except Exception as e:
+            logging.error(f"Error rendering {self.mode} preview: {e}")
+            return False
+        self.rendered += 1
+        self.rendered_here += 1
+        self.render_seconds += time.perf_counter() - started
+        return True
+
+    def publish_jpeg(self, feed: str, jpeg: bytes):
+        """Show a frame rendered elsewhere (a camera farm worker, after claim)"""
+        try:
+            self._show_jpeg(feed, jpeg)
+        except Exception as e:
+            logging.error(f"Error showing {self.mode} preview: {e}")
+            return
+        self.rendered += 1
+
+    def _show(self, feed: str, image: np.ndarray):
+        pass
+
+    def _show_jpeg(self, feed: str, jpeg: bytes):
+        pass
+
+    def open(self):
+        """Monitoring started"""
+
+    def close(self):
+        """Monitoring stopped: release display resources and end open streams"""
+
+    def stats(self) -> Dict:
+        return {
+            'mode': self.mode,
+            'viewers': self.viewers(),
+            'max_fps': round(1.0 / self.interval, 2) if self.interval else None,
+            'rendered': self.rendered,
+            'avg_render_ms': round(self.render_seconds / self.rendered_here * 1000, 2) if self.rendered_here else None
+        }
+
+
+class MjpegPreviewSink(PreviewSink):
+    """Serves the latest annotated frame of each feed as a multipart/x-mixed-replace JPEG stream"""
+
+    mode = 'mjpeg'
+    BOUNDARY = 'frame'
+
+    def __init__(self, fps: float = 5.0, width: int = 640):
+        super().__init__(fps, width)
+        self._condition = threading.Condition()
+        self._frames: Dict[str, tuple] = {}  # feed -> (frame id, jpeg)
+        self._viewers: Dict[str, int] = {}
+        self._frame_id = 0
+        self._closed = False
+
+    def viewers(self, feed: Optional[str] = None) -> int:
+        if feed is None:
+            return sum(self._viewers.values())
+        return self._viewers.get(feed, 0)
+
+    def _show(self, feed: str, image: np.ndarray):
+        jpeg = encode_jpeg(image)
+        if jpeg is not None:
+            self._show_jpeg(feed, jpeg)
+
+    def _show_jpeg(self, feed: str, jpeg: bytes):
+        with self._condition:
+            self._frame_id += 1
+            self._frames[feed] = (self._frame_id, jpeg)
+            self._condition.notify_all()
+
+    def stream(self, feed: str = DEFAULT_FEED) -> Iterator[bytes]:
+        """
+        Generator for a streaming HTTP response; the client counts as a viewer
+        of `feed` while it is connected. Ends when monitoring stops (close).
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._viewers[feed] = self._viewers.get(feed, 0) + 1
+        try:
+            last_id = 0
+            while True:
+                with self._condition:
+                    while not self._closed and self._frames.get(feed, (0, None))[0] == last_id:
+                        self._condition.wait(timeout=1.0)
+                    if self._closed:
+                        return
+                    last_id, jpeg = self._frames[feed]
+                yield (f"--{self.BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                       f"Content-Length: {len(jpeg)}\r\n\r\n").encode() + jpeg + b"\r\n"
+        finally:
+            # Monitoring stopped or the client disconnected (the server closes the generator)
+            with self._condition:
+                self._viewers[feed] -= 1
+
+    def open(self):
+        with self._condition:
+            self._closed = False
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._frames.clear()
+            self._condition.notify_all()
+
+    @property
+    def mimetype(self) -> str:
+        return f"multipart/x-mixed-replace; boundary={self.BOUNDARY}"
+
+
+class WindowPreviewSink(PreviewSink):
+    """Shows annotated frames in OpenCV windows, one per feed (debugging on a machine with a display)"""
+
+    mode = 'window'
+    WINDOW_NAME = 'CCTV Monitoring'
+
+    def __init__(self, fps: float = 5.0, width: int = 640):
+        super().__init__(fps, width)
+        self._windows = set()
+
+    def viewers(self, feed: Optional[str] = None) -> int:
+        return 1
+
+    def _show(self, feed: str, image: np.ndarray):
+        name = self.WINDOW_NAME if feed == DEFAULT_FEED else f"{self.WINDOW_NAME} - {feed}"
+        cv2.imshow(name, image)
+        cv2.waitKey(1)  # Pump the GUI events so the window updates
+        self._windows.add(name)
+
+    def _show_jpeg(self, feed: str, jpeg: bytes):
+        image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is not None:
+            self._show(feed, image)
+
+    def close(self):
+        for name in list(self._windows):
+            try:
+                cv2.destroyWindow(name)
+            except cv2.error:
+                pass
+        self._windows.clear()
+
+
+def create_preview_sink(mode: str, fps: float = 5.0, width: int = 640) -> PreviewSink:
+    """Preview sink for a CCTV_PREVIEW mode; unknown modes run headless"""
+    mode = (mode or 'none').lower()
+    if mode == 'mjpeg':
+        return MjpegPreviewSink(fps, width)
+    if mode == 'window':
+        return WindowPreviewSink(fps, width)
+    if mode != 'none':
+        logging.warning(f"Unknown CCTV_PREVIEW mode '{mode}' (expected one of {PREVIEW_MODES}), running headless")
+    return PreviewSink(fps, width)
@@ -1,13 +1,23 @@
 import logging
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 import statistics
+import threading
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Initialize sentiment analyzer
-vader_analyzer = SentimentIntensityAnalyzer()
+# Sentiment analyzer, created on first use (loading the VADER lexicon slows app startup)
+_vader_analyzer = None
+_vader_lock = threading.Lock()
+
+def get_vader_analyzer():
+    global _vader_analyzer
+    if _vader_analyzer is None:
+        with _vader_lock:
+            if _vader_analyzer is None:
+                from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+                _vader_analyzer = SentimentIntensityAnalyzer()
+    return _vader_analyzer
 
 def analyze_sentiment(text):
     """
@@ -29,7 +39,7 @@ def analyze_sentiment(text):
         return 0.5, "NEUTRAL"  # Neutral score for empty text
     
     # Analyze sentiment using VADER
-    sentiment_scores = vader_analyzer.polarity_scores(text)
+    sentiment_scores = get_vader_analyzer().polarity_scores(text)
     logger.info(f"Sentiment scores for text: {sentiment_scores}")
     
     # Get compound score
@@ -0,0 +1,131 @@
+"""
+Lazy container for the heavy, process-wide services.
+
+Route modules used to import the camera/ML services (cv2, face_recognition,
+dlib, Keras) and construct them at import time, so Flask could not answer
+anything until the whole ML stack was loaded. Services are now registered
+here as factories that import their module and construct the instance on
+first use (or when the background preloader warms them), and route modules
+hold LazyService proxies that resolve on first attribute access.
+"""
+import importlib
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+
+class ServiceContainer:
+    """Constructs each registered service once, on first use"""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable] = {}
+        self._instances: Dict[str, object] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+        self.construct_seconds: Dict[str, float] = {}
+        self.constructed_by: Dict[str, str] = {}
+
+    def register(self, name: str, factory: Callable):
+        """Register a zero-argument factory; it runs on the first get(name)"""
+        with self._registry_lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+
+    def register_class(self, name: str, module: str, class_name: str):
+        """Register a service class whose module is only imported on first use"""
+        self.register(name, lambda: getattr(importlib.import_module(module), class_name)())
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        if name not in self._factories:
+            raise KeyError(f"Unknown service: {name}")
+
+        # One lock per service: constructing the CCTV service must not block the recognition service
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                start = time.perf_counter()
+                instance = self._factories[name]()
+                self.construct_seconds[name] = round(time.perf_counter() - start, 3)
+                self.constructed_by[name] = threading.current_thread().name
+                self._instances[name] = instance
+                logging.info(f"Service '{name}' constructed in {self.construct_seconds[name]:.3f}s")
+        return instance
+
+    def is_constructed(self, name: str) -> bool:
+        return name in self._instances
+
+    def warm(self, names: Optional[Iterable[str]] = None):
+        """Construct services ahead of their first request (called from the preloader thread)"""
+        for name in list(names if names is not None else self._factories):
+            try:
+                self.get(name)
+            except Exception as e:
+                logging.error(f"Failed to warm service '{name}': {e}")
+
+    def stats(self) -> Dict:
+        return {
+            name: {
+                'constructed': name in self._instances,
+                'construct_seconds': self.construct_seconds.get(name),
+                'constructed_by': self.constructed_by.get(name)
+            }
+            for name in self._factories
+        }
+
+
+class LazyService:
+    """Module-level stand-in for a container service; resolves on first attribute access"""
+
+    __slots__ = ('_name',)
+
+    def __init__(self, name: str):
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attribute):
+        return getattr(get_service_container().get(self._name), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(get_service_container().get(self._name), attribute, value)
+
+    def __repr__(self):
+        return f"<LazyService {self._name}>"
+
+
+def _register_default_services(container: ServiceContainer):
+    container.register_class('image_collection', 'services.image_collection', 'ImageCollectionService')
+    container.register_class('face_recognition', 'services.enhanced_face_recognition_service',
+                             'EnhancedFaceRecognitionService')
+    container.register_class('emotion_detection', 'services.enhanced_emotion_detection_service',
+                             'EnhancedEmotionDetectionService')
+    container.register_class('cctv_monitoring', 'services.cctv_monitoring_service', 'CCTVMonitoringService')
+
+
+# Global instance for singleton pattern
+_global_service_container = None
+_container_lock = threading.Lock()
+
+def get_service_container() -> ServiceContainer:
+    """Get the process-wide service container (singleton)"""
+    global _global_service_container
+
+    if _global_service_container is None:
+        with _container_lock:
+            if _global_service_container is None:
+                container = ServiceContainer()
+                _register_default_services(container)
+                _global_service_container = container
+    return _global_service_container
+
+
+def get_service(name: str):
+    """Shortcut for get_service_container().get(name)"""
+    return get_service_container().get(name)
+
+
+def lazy_service(name: str) -> LazyService:
+    return LazyService(name)
@@ -0,0 +1,212 @@
+"""
+Cached, typed view of the system_settings table.
+
+Settings are loaded once into an immutable snapshot and served from memory.
+Admin writes call bump_settings_version(), which invalidates the snapshot in
+this process immediately and, through a shared version stamp file, in every
+other worker on its next version check.
+"""
+import fcntl
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from config.settings import settings
+from db.connection import get_connection
+
+
+class SettingsSnapshot:
+    """Immutable, typed system settings with config defaults applied"""
+
+    __slots__ = (
+        'version', 'loaded_at', 'nlp_weight', 'emotion_weight', 'session_timeout',
+        'camera_width', 'camera_height', 'detection_interval', 'webcam_enabled',
+        'risk_thresholds', 'default_page_size', 'raw'
+    )
+
+    def __init__(self, version: int, raw_settings: dict):
+        raw = dict(raw_settings)
+        set_ = object.__setattr__
+        set_(self, 'version', version)
+        set_(self, 'loaded_at', time.time())
+        set_(self, 'raw', MappingProxyType(raw))
+        set_(self, 'nlp_weight', _parse(raw, 'nlp_weight', float, settings.NLP_WEIGHT))
+        set_(self, 'emotion_weight', _parse(raw, 'emotion_weight', float, settings.EMOTION_WEIGHT))
+        set_(self, 'session_timeout', _parse(raw, 'session_timeout', int, settings.SESSION_TIMEOUT))
+        set_(self, 'camera_width', _parse(raw, 'camera_width', int, 640))
+        set_(self, 'camera_height', _parse(raw, 'camera_height', int, 480))
+        set_(self, 'detection_interval', _parse(raw, 'detection_interval', int, 30))
+        set_(self, 'webcam_enabled', _parse(raw, 'webcam_enabled', _parse_bool, True))
+        set_(self, 'default_page_size', _parse(raw, 'default_page_size', int, settings.DEFAULT_PAGE_SIZE))
+        set_(self, 'risk_thresholds', MappingProxyType({
+            'LOW': _parse(raw, 'risk_low_threshold', float, settings.RISK_THRESHOLDS['LOW']),
+            'MEDIUM': _parse(raw, 'risk_medium_threshold', float, settings.RISK_THRESHOLDS['MEDIUM']),
+            'HIGH': _parse(raw, 'risk_high_threshold', float, settings.RISK_THRESHOLDS['HIGH']),
+            'CRITICAL': _parse(raw, 'risk_critical_threshold', float, settings.RISK_THRESHOLDS['CRITICAL'])
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SettingsSnapshot is read-only")
+
+    def camera_settings(self) -> dict:
+        """Camera settings in the shape used by the CCTV service"""
+        return {
+            'width': self.camera_width,
+            'height': self.camera_height,
+            'detection_interval': self.detection_interval
+        }
+
+
+def _parse_bool(value) -> bool:
+    return str(value).strip().lower() == 'true'
+
+
+def _parse(raw: dict, name: str, cast, default):
+    """Convert a stored setting, falling back to the config default if missing or invalid"""
+    if name not in raw or raw[name] is None:
+        return default
+    try:
+        return cast(raw[name])
+    except (TypeError, ValueError):
+        logging.warning(f"Invalid value {raw[name]!r} for setting '{name}', using default {default!r}")
+        return default
+
+
+class SettingsStore:
+    """Process-wide cache of system settings, invalidated by version bumps"""
+
+    def __init__(self, version_file: str = None, check_interval: float = None):
+        self.version_file = version_file or settings.SETTINGS_VERSION_FILE
+        self.check_interval = settings.SETTINGS_VERSION_CHECK_INTERVAL if check_interval is None else check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._local_version = 0
+        self._shared_version = self._read_shared_version()
+        self._last_check = time.monotonic()
+        self._stats = {'hits': 0, 'loads': 0, 'load_errors': 0, 'invalidations': 0}
+
+    def _read_shared_version(self) -> int:
+        try:
+            with open(self.version_file, 'r') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_shared_version(self, version: int):
+        directory = os.path.dirname(self.version_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.version_file}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(str(version))
+        os.replace(temp_path, self.version_file)
+
+    def _bump_shared_version(self) -> int:
+        """Increment the shared stamp; an exclusive lock keeps concurrent bumps from writing the same version"""
+        directory = os.path.dirname(self.version_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.version_file}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                shared = self._read_shared_version() + 1
+                self._write_shared_version(shared)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return shared
+
+    def _current_version(self) -> int:
+        """Combined version; the shared stamp is re-read at most once per check interval"""
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            shared = self._read_shared_version()
+            if shared != self._shared_version:
+                self._shared_version = shared
+                self._stats['invalidations'] += 1
+        return self._shared_version * 1000000 + self._local_version
+
+    def _load(self, version: int) -> SettingsSnapshot:
+        # Read on a dedicated connection so the snapshot reflects committed data,
+        # not the (possibly older) view of an in-flight request transaction
+        conn = get_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT setting_name, setting_value FROM system_settings")
+            raw = {name: value for name, value in cursor.fetchall()}
+        finally:
+            if cursor:
+                cursor.close()
+            conn.close()
+        return SettingsSnapshot(version, raw)
+
+    def get_snapshot(self) -> SettingsSnapshot:
+        """Return the cached snapshot, reloading it only when the version has changed"""
+        snapshot = self._snapshot
+        version = self._current_version()
+        if snapshot is not None and snapshot.version == version:
+            self._stats['hits'] += 1
+            return snapshot
+
+        with self._lock:
+            version = self._current_version()
+            if self._snapshot is not None and self._snapshot.version == version:
+                return self._snapshot
+            try:
+                snapshot = self._load(version)
+            except Exception as e:
+                self._stats['load_errors'] += 1
+                logging.error(f"Error loading system settings: {e}")
+                if self._snapshot is not None:
+                    # Keep serving the last known good settings
+                    return self._snapshot
+                # Config defaults, not cached so the next call retries the database
+                return SettingsSnapshot(-1, {})
+            self._snapshot = snapshot
+            self._stats['loads'] += 1
+            logging.info(f"System settings loaded (version {version})")
+            return snapshot
+
+    def bump_version(self):
+        """Invalidate cached settings in this and every other worker after a write"""
+        with self._lock:
+            self._local_version += 1
+            self._snapshot = None
+            try:
+                shared = self._bump_shared_version()
+                self._shared_version = shared
+            except OSError as e:
+                logging.error(f"Error updating settings version file: {e}")
+
+    def get_stats(self) -> dict:
+        snapshot = self._snapshot
+        stats = dict(self._stats)
+        stats['version'] = snapshot.version if snapshot is not None else None
+        stats['loaded_at'] = snapshot.loaded_at if snapshot is not None else None
+        return stats
+
+
+_settings_store = None
+_settings_store_lock = threading.Lock()
+
+
+def get_settings_store() -> SettingsStore:
+    """Get the process-wide settings store"""
+    global _settings_store
+    if _settings_store is None:
+        with _settings_store_lock:
+            if _settings_store is None:
+                _settings_store = SettingsStore()
+    return _settings_store
+
+
+def get_settings_snapshot() -> SettingsSnapshot:
+    """Current system settings (served from memory)"""
+    return get_settings_store().get_snapshot()
+
+
+def bump_settings_version():
+    """Call after committing any change to system_settings"""
+    get_settings_store().bump_version()
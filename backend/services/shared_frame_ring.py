@@ -0,0 +1,234 @@
+"""
+Fixed-slot frame ring buffer in shared memory.
+
+Capture writers decode frames straight into a slot and commit it under a
+sequence number; readers (threads or other processes) address a frame by
+(slot, seq). Each slot has a small header:
+
+    seq       sequence number of the committed frame (0 = empty, -1 = being written)
+    pinned    seq a reader is currently using (0 = none); the writer skips pinned slots
+    consumed  last seq a reader finished with; overwriting an unconsumed frame is a drop
+    timestamp capture time (time.time()) of the frame
+
+Readers pin a slot, check that it still holds their seq, use the frame in
+place and re-check the seq when they are done (seqlock style), so an
+overwrite - e.g. a reader that lost a race with the writer - is always
+detected instead of a torn frame being analysed silently. The writer never
+blocks: it reuses the slot of the oldest unpinned frame, which gives drop-oldest
+semantics, and counts the unread frames it overwrote.
+
+The block is self-describing (slot count and frame shape are in its header),
+so a reader process only needs its name: FrameRingBuffer.attach(name). The
+ring can also live in ordinary memory (shared=False) for in-process
+pipelines, where it saves allocating a new frame per read.
+"""
+import threading
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+RING_MAGIC = 0x46524D52  # 'FRMR'
+RING_VERSION = 1
+
+# Global header fields (int64)
+_MAGIC, _VERSION, _SLOTS, _HEIGHT, _WIDTH, _CHANNELS, _NEXT_SEQ, _WRITTEN, _DROPPED, _SKIPPED_PINNED = range(10)
+_GLOBAL_FIELDS = 16
+# Per-slot header fields (int64, timestamp stored as float64 bits)
+_SEQ, _PINNED, _CONSUMED, _TIMESTAMP = range(4)
+_SLOT_FIELDS = 4
+_ALIGN = 64
+
+
+def _data_offset(slots: int) -> int:
+    header = (_GLOBAL_FIELDS + slots * _SLOT_FIELDS) * 8
+    return (header + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class FrameRingBuffer:
+    """
+    Ring of `slots` uint8 frames of one shape
+
+    Use FrameRingBuffer.create(shape, slots) in the writer and
+    FrameRingBuffer.attach(name) in reader processes.
+    """
+
+    def __init__(self, buffer, shm: Optional[SharedMemory] = None, owner: bool = False):
+        self._shm = shm
+        self.owner = owner
+        self._buffer = buffer
+        header = np.ndarray((_GLOBAL_FIELDS,), dtype=np.int64, buffer=buffer)
+        if header[_MAGIC] != RING_MAGIC or header[_VERSION] != RING_VERSION:
+            raise ValueError("Not a frame ring buffer (bad magic/version)")
+        self.slots = int(header[_SLOTS])
+        self.shape = (int(header[_HEIGHT]), int(header[_WIDTH]), int(header[_CHANNELS]))
+        if self.shape[2] == 0:
+            self.shape = self.shape[:2]
+        self.frame_bytes = int(np.prod(self.shape))
+        self._header = header
+        self._slot_header = np.ndarray((self.slots, _SLOT_FIELDS), dtype=np.int64, buffer=buffer,
+                                       offset=_GLOBAL_FIELDS * 8)
+        self._timestamps = self._slot_header[:, _TIMESTAMP].view(np.float64)
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=buffer,
+                                  offset=_data_offset(self.slots))
+        self._write_lock = threading.Lock()  # Several writer threads in one process
+        self.stale_reads = 0  # Overwrites detected by readers using this handle
+
+    @classmethod
+    def create(cls, shape, slots: int, shared: bool = True) -> 'FrameRingBuffer':
+        """New ring for frames of `shape` (h, w) or (h, w, c)"""
+        shape = tuple(int(v) for v in shape)
+        if len(shape) not in (2, 3) or slots < 2:
+            raise ValueError("Frame ring needs a (h, w[, c]) shape and at least 2 slots")
+        size = _data_offset(slots) + int(np.prod(shape)) * slots
+        shm = SharedMemory(create=True, size=size) if shared else None
+        buffer = shm.buf if shared else bytearray(size)
+
+        header = np.ndarray((_GLOBAL_FIELDS,), dtype=np.int64, buffer=buffer)
+        header[:] = 0
+        header[_SLOTS] = slots
+        header[_HEIGHT], header[_WIDTH] = shape[0], shape[1]
+        header[_CHANNELS] = shape[2] if len(shape) == 3 else 0
+        header[_NEXT_SEQ] = 1
+        np.ndarray((slots * _SLOT_FIELDS,), dtype=np.int64, buffer=buffer, offset=_GLOBAL_FIELDS * 8)[:] = 0
+        header[_VERSION] = RING_VERSION
+        header[_MAGIC] = RING_MAGIC
+        return cls(buffer, shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> 'FrameRingBuffer':
+        """Open a ring created by another process"""
+        shm = SharedMemory(name=name)
+        # Attaching registers the block with this process's resource tracker, which
+        # would unlink it when the process exits; only the creator may unlink it
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm.buf, shm, owner=False)
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._shm.name if self._shm is not None else None
+
+    # Writer side
+
+    def begin_write(self) -> Optional[Tuple[int, int, np.ndarray]]:
+        """
+        Reserve the slot of the oldest unpinned frame (or an empty one) for the next frame
+
+        Returns:
+            (slot, seq, view) to decode into, then commit(slot, seq); None if every slot is pinned
+        """
+        with self._write_lock:
+            seq = int(self._header[_NEXT_SEQ])
+            # Empty slots first, then the oldest frames; slots still being written (-1) are skipped
+            for slot in np.argsort(self._slot_header[:, _SEQ], kind='stable'):
+                slot = int(slot)
+                slot_header = self._slot_header[slot]
+                previous = int(slot_header[_SEQ])
+                if previous < 0:
+                    continue
+                if slot_header[_PINNED]:
+                    self._header[_SKIPPED_PINNED] += 1
+                    continue
+
+                slot_header[_SEQ] = -1
+                if slot_header[_PINNED]:
+                    # A reader pinned it in the meantime; it will see -1 and give up, keep its frame
+                    slot_header[_SEQ] = previous
+                    continue
+
+                if previous > 0 and slot_header[_CONSUMED] != previous:
+                    self._header[_DROPPED] += 1
+                self._header[_NEXT_SEQ] = seq + 1
+                return slot, seq, self._frames[slot]
+            return None
+
+    def commit(self, slot: int, seq: int, timestamp: float):
+        """Publish a frame written into a slot reserved by begin_write"""
+        self._timestamps[slot] = timestamp
+        self._slot_header[slot, _SEQ] = seq
+        self._header[_WRITTEN] += 1
+
+    def abort_write(self, slot: int):
+        """Give up a slot reserved by begin_write (e.g. the read failed); it is left empty"""
+        self._slot_header[slot, _SEQ] = 0
+
+    def write(self, frame: np.ndarray, timestamp: float) -> Optional[Tuple[int, int]]:
+        """Copy a frame into the ring; returns (slot, seq), or None if every slot is pinned"""
+        reservation = self.begin_write()
+        if reservation is None:
+            return None
+        slot, seq, view = reservation
+        view[...] = frame
+        self.commit(slot, seq, timestamp)
+        return slot, seq
+
+    # Reader side
+
+    def acquire(self, slot: int, seq: int) -> Optional[np.ndarray]:
+        """Pin a slot and return the frame in place, or None if it no longer holds seq"""
+        slot_header = self._slot_header[slot]
+        slot_header[_PINNED] = seq
+        if slot_header[_SEQ] != seq:
+            slot_header[_PINNED] = 0
+            self.stale_reads += 1
+            return None
+        return self._frames[slot]
+
+    def release(self, slot: int, seq: int, consumed: bool = True) -> bool:
+        """
+        Unpin a slot after using its frame
+
+        Returns:
+            True if the frame was intact for the whole time it was pinned
+        """
+        slot_header = self._slot_header[slot]
+        intact = slot_header[_SEQ] == seq
+        if consumed and intact:
+            slot_header[_CONSUMED] = seq
+        slot_header[_PINNED] = 0
+        if not intact:
+            self.stale_reads += 1
+        return bool(intact)
+
+    def read(self, slot: int, seq: int) -> Optional[np.ndarray]:
+        """Copy of a frame, or None if it was overwritten"""
+        view = self.acquire(slot, seq)
+        if view is None:
+            return None
+        frame = view.copy()
+        return frame if self.release(slot, seq) else None
+
+    def latest(self) -> Optional[Tuple[int, int, float]]:
+        """(slot, seq, timestamp) of the newest committed frame not yet consumed"""
+        seqs = self._slot_header[:, _SEQ].copy()
+        unread = (seqs > 0) & (self._slot_header[:, _CONSUMED] != seqs)
+        if not unread.any():
+            return None
+        slot = int(np.argmax(np.where(unread, seqs, 0)))
+        return slot, int(seqs[slot]), float(self._timestamps[slot])
+
+    def stats(self) -> Dict:
+        seqs = self._slot_header[:, _SEQ]
+        committed = seqs > 0
+        return {
+            'slots': self.slots,
+            'frame_shape': list(self.shape),
+            'written': int(self._header[_WRITTEN]),
+            'dropped_unread': int(self._header[_DROPPED]),
+            'skipped_pinned': int(self._header[_SKIPPED_PINNED]),
+            'occupied': int((committed & (self._slot_header[:, _CONSUMED] != seqs)).sum()),
+            'pinned': int((self._slot_header[:, _PINNED] != 0).sum()),
+            'stale_reads': self.stale_reads
+        }
+
+    def close(self):
+        """Detach (and free the block, in the creating process)"""
+        # Drop the numpy views first: SharedMemory cannot close while they export its buffer
+        self._header = self._slot_header = self._timestamps = self._frames = None
+        if self._shm is not None:
+            self._shm.close()
+            if self.owner:
+                try:
+                    self._shm.unlink()
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,251 @@
+"""
+Concurrent survey monitoring for several kiosks on one server.
+
+Each kiosk gets a SurveyMonitor with its own camera handle, capture /
+inference pipeline and face tracker, feeding the soldier's SurveySession.
+All monitors share the one emotion detection service (model registry,
+gallery index and emotion batcher) and a bounded pool of inference slots
+(SURVEY_INFERENCE_WORKERS), so adding a kiosk adds a capture thread, not
+another copy of the models. Admission control rejects a new survey session
+when SURVEY_MAX_SESSIONS are already running, when its camera is in use by
+another kiosk, or when the running monitors already wait too long for an
+inference slot.
+
+Kiosk cameras are configured as SURVEY_KIOSK_CAMERAS="kiosk1=0,kiosk2=2,
+gate=rtsp://..."; kiosks without an entry use the local webcam probe.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import cv2
+from config.settings import settings
+from services.frame_pipeline import CapturedFrame, FairSemaphore, FramePipeline
+from services.motion_gate import create_motion_gate
+from services.survey_sessions import SurveyAdmissionError, SurveySession, get_survey_session_registry
+
+AUTO_CAMERA = 'auto'  # Camera source of kiosks without a configured camera
+
+
+def parse_kiosk_cameras(spec: str) -> Dict[str, object]:
+    """'kiosk1=0,kiosk2=rtsp://host/stream' -> {'kiosk1': 0, 'kiosk2': 'rtsp://host/stream'}"""
+    cameras = {}
+    for entry in filter(None, (part.strip() for part in (spec or '').split(','))):
+        kiosk_id, _, source = entry.partition('=')
+        source = source.strip()
+        cameras[kiosk_id.strip()] = int(source) if source.isdigit() else source
+    return cameras
+
+
+class SurveyMonitor:
+    """Camera, pipeline and face tracker of one kiosk, feeding one survey session"""
+
+    def __init__(self, kiosk_id: str, camera_source, session: SurveySession, emotion_service,
+                 inference_slots: FairSemaphore):
+        self.kiosk_id = kiosk_id
+        self.camera_source = camera_source
+        self.session = session
+        self.emotion_service = emotion_service
+        self.inference_slots = inference_slots
+        self.face_tracker = emotion_service.create_face_tracker()
+        self.cap = None
+        self.pipeline = None
+        self.started_at = None
+
+    def start(self, open_camera: Callable, camera_settings: Dict):
+        """Open the kiosk camera and start capture plus inference"""
+        self.cap = open_camera(self.camera_source)
+        if not self.cap:
+            raise Exception(f"No camera available for kiosk {self.kiosk_id}")
+
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, camera_settings['width'])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, camera_settings['height'])
+        self.cap.set(cv2.CAP_PROP_FPS, 10)  # Keep FPS at 10 for performance
+
+        self.pipeline = FramePipeline(
+            self.cap,
+            self._handle_frame,
+            sample_every=camera_settings['detection_interval'],
+            workers=settings.CCTV_INFERENCE_WORKERS,
+            queue_size=settings.CCTV_FRAME_QUEUE_SIZE,
+            name=f"Survey-{self.kiosk_id}",
+            inference_slots=self.inference_slots,
+            frame_ring=settings.CCTV_FRAME_RING,
+            motion_gate=create_motion_gate()
+        )
+        self.pipeline.start()
+        self.started_at = time.time()
+
+    def _handle_frame(self, frame: CapturedFrame) -> Optional[Dict]:
+        """Inference worker callback: keep detections of the soldier taking this kiosk's survey"""
+        session = self.session
+        if not session.active:
+            return None
+
+        result = self.emotion_service.detect_face_and_emotion(frame.image, tracker=self.face_tracker)
+        if not result:
+            return None
+
+        detected_force_id, emotion, score, face_coords = result
+        if detected_force_id != session.force_id:
+            return None
+
+        detection_data = {
+            'timestamp': datetime.fromtimestamp(frame.timestamp).isoformat(),  # When the frame was captured
+            'emotion': emotion,
+            'score': score,
+            'force_id': session.force_id
+        }
+        session.add_detection(detection_data)
+        logging.info(f"Survey detection [{self.kiosk_id}]: {session.force_id} - {emotion} ({score:.2f})")
+        return detection_data
+
+    def stop(self):
+        """Stop the pipeline (waiting for the frame in flight) and release the camera"""
+        if self.pipeline:
+            self.pipeline.stop()
+        if self.cap is not None:
+            try:
+                if self.cap.isOpened():
+                    self.cap.release()
+            except Exception as e:
+                logging.error(f"Error releasing camera of kiosk {self.kiosk_id}: {e}")
+            self.cap = None
+        logging.info(f"Survey monitor of kiosk {self.kiosk_id} stopped")
+
+    def slot_wait_p95_ms(self) -> float:
+        if not self.pipeline:
+            return 0.0
+        return self.pipeline.stats()['stages']['slot_wait'].get('p95_ms', 0.0)
+
+    def stats(self) -> Dict:
+        return {
+            'kiosk_id': self.kiosk_id,
+            'camera': str(self.camera_source),
+            'session': self.session.summary(),
+            'pipeline': self.pipeline.stats() if self.pipeline else None,
+            'face_tracking': self.face_tracker.stats()
+        }
+
+
+class SurveyMonitorManager:
+    """
+    Runs one SurveyMonitor per kiosk with admission control
+
+    Args:
+        emotion_service: Shared EnhancedEmotionDetectionService
+        default_camera: Opens the local webcam for kiosks without a configured camera
+        max_sessions: Concurrent survey sessions admitted
+        inference_workers: Frames analysed at the same time across all kiosks
+        kiosk_cameras: kiosk_id -> camera index or stream URL
+        max_slot_wait_ms: Reject new sessions while running ones wait longer (p95) for inference (0 = off)
+    """
+
+    def __init__(self, emotion_service, default_camera: Callable, max_sessions: int = 4,
+                 inference_workers: int = 2, kiosk_cameras: Optional[Dict[str, object]] = None,
+                 max_slot_wait_ms: float = 500.0):
+        self.emotion_service = emotion_service
+        self.default_camera = default_camera
+        self.max_sessions = max(1, max_sessions)
+        self.inference_workers = max(1, inference_workers)
+        self.inference_slots = FairSemaphore(self.inference_workers)
+        self.kiosk_cameras = kiosk_cameras or {}
+        self.max_slot_wait_ms = max_slot_wait_ms
+        self.sessions = get_survey_session_registry()
+        self.monitors: Dict[str, SurveyMonitor] = {}
+        self._lock = threading.Lock()
+        self.counters = {'admitted': 0, 'rejected_capacity': 0, 'rejected_camera': 0, 'rejected_overload': 0,
+                         'start_failures': 0}
+
+    def camera_source(self, kiosk_id: str):
+        return self.kiosk_cameras.get(kiosk_id, AUTO_CAMERA)
+
+    def _open_camera(self, source):
+        if source == AUTO_CAMERA:
+            return self.default_camera()
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            cap.release()
+            logging.error(f"Could not open survey camera {source}")
+            return None
+        return cap
+
+    def start(self, force_id: str, kiosk_id: str, camera_settings: Dict) -> SurveyMonitor:
+        """
+        Admit and start monitoring a soldier's survey on a kiosk
+
+        A session still running on the same kiosk (abandoned survey) or for
+        the same soldier on another kiosk is replaced.
+
+        Raises:
+            SurveyAdmissionError: the session was not admitted
+        """
+        source = self.camera_source(kiosk_id)
+        with self._lock:
+            replaced = [m for m in self.monitors.values() if m.kiosk_id == kiosk_id or m.session.force_id == force_id]
+            remaining = [m for m in self.monitors.values() if m not in replaced]
+
+            if len(remaining) >= self.max_sessions:
+                self.counters['rejected_capacity'] += 1
+                raise SurveyAdmissionError(f"All {self.max_sessions} survey monitoring slots are in use")
+            if any(m.camera_source == source for m in remaining):
+                self.counters['rejected_camera'] += 1
+                raise SurveyAdmissionError(f"Camera {source} is already monitoring another kiosk")
+            if self.max_slot_wait_ms and remaining:
+                worst_wait = max(m.slot_wait_p95_ms() for m in remaining)
+                if worst_wait > self.max_slot_wait_ms:
+                    self.counters['rejected_overload'] += 1
+                    raise SurveyAdmissionError(f"Survey inference is saturated (p95 wait {worst_wait:.0f}ms)")
+
+            for monitor in replaced:
+                del self.monitors[monitor.kiosk_id]
+            # Also ends the replaced sessions in the registry
+            session = self.sessions.start(force_id, kiosk_id)
+            monitor = SurveyMonitor(kiosk_id, source, session, self.emotion_service, self.inference_slots)
+            self.monitors[kiosk_id] = monitor  # Reserve the kiosk while its camera opens
+            self.counters['admitted'] += 1
+
+        for old in replaced:
+            old.stop()
+
+        try:
+            monitor.start(self._open_camera, camera_settings)
+        except Exception:
+            self.counters['start_failures'] += 1
+            self.release(session)
+            self.sessions.end(force_id)
+            raise
+        return monitor
+
+    def release(self, session: SurveySession):
+        """Stop the monitor feeding a session (call after the session was ended)"""
+        with self._lock:
+            monitor = self.monitors.get(session.kiosk_id)
+            if monitor is None or monitor.session is not session:
+                return
+            del self.monitors[session.kiosk_id]
+        monitor.stop()
+
+    def stop_all(self):
+        with self._lock:
+            monitors = list(self.monitors.values())
+            self.monitors.clear()
+        for monitor in monitors:
+            self.sessions.end(monitor.session.force_id)
+            monitor.stop()
+
+    def active_monitors(self) -> List[SurveyMonitor]:
+        with self._lock:
+            return list(self.monitors.values())
+
+    def stats(self) -> Dict:
+        monitors = self.active_monitors()
+        return {
+            'max_sessions': self.max_sessions,
+            'inference_workers': self.inference_workers,
+            'waiting_for_inference': self.inference_slots.waiting(),
+            'active_sessions': len(monitors),
+            **self.counters,
+            'kiosks': {monitor.kiosk_id: monitor.stats() for monitor in monitors}
+        }
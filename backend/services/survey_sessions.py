@@ -0,0 +1,148 @@
+"""
+Process-wide registry of survey emotion-monitoring sessions.
+
+A session holds everything collected for one soldier's survey at one kiosk:
+emotion detections, question markers and its timing. The monitoring service
+writes to it from its inference workers; the survey submission and
+question-timing routes look it up by force_id in O(1), without touching (or
+constructing) the camera/ML services. Before this, those routes built their
+own CCTVMonitoringService and never saw the detections that had been
+collected.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+DEFAULT_KIOSK_ID = 'default'
+
+
+class SurveyAdmissionError(Exception):
+    """Raised when a survey session cannot be admitted (capacity, camera in use, overload)"""
+
+
+class SurveySession:
+    """Monitoring state of one soldier's survey"""
+
+    def __init__(self, force_id: str, kiosk_id: str = DEFAULT_KIOSK_ID):
+        self.force_id = force_id
+        self.kiosk_id = kiosk_id
+        self.started_at = datetime.now()
+        self.active = True
+        self.detections: List[Dict] = []
+        self.question_markers: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def add_detection(self, detection: Dict):
+        with self._lock:
+            self.detections.append(detection)
+
+    def mark_question(self, question_id, answered_at: Optional[datetime] = None) -> Dict:
+        """Record when a question was answered, to correlate it with the detections around it"""
+        marker = {
+            'timestamp': (answered_at or datetime.now()).isoformat(),
+            'type': 'question_marker',
+            'question_id': question_id,
+            'force_id': self.force_id
+        }
+        with self._lock:
+            self.question_markers.append(marker)
+        return marker
+
+    def snapshot(self) -> List[Dict]:
+        """Copy of the detections (workers may still be appending)"""
+        with self._lock:
+            return list(self.detections)
+
+    def emotion_score_between(self, start_seconds: float, end_seconds: float) -> float:
+        """Average emotion score of the detections in a time range relative to the survey start"""
+        start_time = self.started_at + timedelta(seconds=start_seconds)
+        end_time = self.started_at + timedelta(seconds=end_seconds)
+        scores = [
+            d['score'] for d in self.snapshot()
+            if start_time <= datetime.fromisoformat(d['timestamp']) <= end_time
+        ]
+        return sum(scores) / len(scores) if scores else 0.0
+
+    def summary(self) -> Dict:
+        with self._lock:
+            detections, markers = len(self.detections), len(self.question_markers)
+        return {
+            'force_id': self.force_id,
+            'kiosk_id': self.kiosk_id,
+            'started_at': self.started_at.isoformat(),
+            'active': self.active,
+            'detections': detections,
+            'questions_marked': markers
+        }
+
+
+class SurveySessionRegistry:
+    """Active survey sessions by force_id; one session per soldier and per kiosk"""
+
+    def __init__(self):
+        self._sessions: Dict[str, SurveySession] = {}
+        self._lock = threading.Lock()
+        self.sessions_started = 0
+        self.sessions_ended = 0
+
+    def start(self, force_id: str, kiosk_id: str = DEFAULT_KIOSK_ID) -> SurveySession:
+        """
+        Open a new session, replacing the soldier's previous one and any other
+        session still open on the same kiosk (an abandoned survey)
+        """
+        session = SurveySession(force_id, kiosk_id)
+        with self._lock:
+            replaced = [s for s in self._sessions.values() if s.force_id == force_id or s.kiosk_id == kiosk_id]
+            for old in replaced:
+                old.active = False
+                del self._sessions[old.force_id]
+            self._sessions[force_id] = session
+            self.sessions_started += 1
+        for old in replaced:
+            logging.info(f"Survey session of {old.force_id} on kiosk {old.kiosk_id} replaced by {force_id}")
+        return session
+
+    def get(self, force_id: str) -> Optional[SurveySession]:
+        return self._sessions.get(force_id)
+
+    def for_kiosk(self, kiosk_id: str) -> Optional[SurveySession]:
+        with self._lock:
+            return next((s for s in self._sessions.values() if s.kiosk_id == kiosk_id), None)
+
+    def end(self, force_id: str) -> Optional[SurveySession]:
+        """Close and remove a soldier's session; returns it (None if there was none)"""
+        with self._lock:
+            session = self._sessions.pop(force_id, None)
+            if session is not None:
+                session.active = False
+                self.sessions_ended += 1
+        return session
+
+    def active(self) -> List[SurveySession]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def stats(self) -> Dict:
+        sessions = self.active()
+        return {
+            'active_sessions': len(sessions),
+            'sessions_started': self.sessions_started,
+            'sessions_ended': self.sessions_ended,
+            'sessions': [s.summary() for s in sessions]
+        }
+
+
+# Global instance for singleton pattern
+_global_survey_session_registry = None
+_registry_lock = threading.Lock()
+
+def get_survey_session_registry() -> SurveySessionRegistry:
+    """Get the process-wide survey session registry (singleton)"""
+    global _global_survey_session_registry
+
+    if _global_survey_session_registry is None:
+        with _registry_lock:
+            if _global_survey_session_registry is None:
+                _global_survey_session_registry = SurveySessionRegistry()
+    return _global_survey_session_registry
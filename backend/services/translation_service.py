@@ -1,4 +1,3 @@
-from googletrans import Translator
 import asyncio
 import logging
 
@@ -7,6 +6,7 @@ logger = logging.getLogger(__name__)
 def translate_to_hindi(text: str) -> str:
     """Translate English text to Hindi using googletrans."""
     try:
+        from googletrans import Translator  # Imported on first translation, not at app startup
         translator = Translator()
         result = translator.translate(text, src='en', dest='hi')
         
@@ -39,6 +39,7 @@ def translate_to_hindi(text: str) -> str:
 def translate_to_english(text: str) -> str:
     """Translate Hindi text to English using googletrans."""
     try:
+        from googletrans import Translator
         translator = Translator()
         result = translator.translate(text, src='hi', dest='en')
         
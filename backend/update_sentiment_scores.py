@@ -7,6 +7,8 @@ import logging
 import sys
 import os
 from db.connection import get_connection
+from db.assessment_summary import upsert_latest_assessment
+from db.queries import SESSION_NLP_SCORES
 from services.sentiment_analysis_service import analyze_sentiment, calculate_average_score
 
 # Set up logging
@@ -51,11 +53,7 @@ def update_session_scores(session_id):
     
     try:
         # Get all nlp scores for this session
-        cursor.execute("""
-            SELECT nlp_depression_score
-            FROM question_responses
-            WHERE session_id = %s AND nlp_depression_score IS NOT NULL
-        """, (session_id,))
+        cursor.execute(SESSION_NLP_SCORES, (session_id,))
         
         scores = [row[0] for row in cursor.fetchall()]
         
@@ -72,6 +70,7 @@ def update_session_scores(session_id):
             SET nlp_avg_score = %s, combined_avg_score = %s
             WHERE session_id = %s
         """, (avg_score, avg_score, session_id))
+        upsert_latest_assessment(cursor, session_id)
         
         db.commit()
         logger.info(f"Updated session {session_id} with average score {avg_score:.2f}")
@@ -0,0 +1,70 @@
+"""
+Startup timing report: per-module import time and time to first response.
+
+app.py imports its blueprints through StartupReport.import_module so the
+cost of each one is recorded, and the first served request closes the
+report. The report also lists which heavy ML modules were already loaded at
+that point - with lazy services none of them should be. For a full import
+tree run `python -X importtime app.py`.
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+from typing import Dict
+
+PROCESS_START = time.time()  # Import time of this module, the first thing app.py imports
+
+HEAVY_MODULES = ('tensorflow', 'keras', 'cv2', 'dlib', 'face_recognition', 'googletrans', 'fpdf', 'vaderSentiment')
+
+
+class StartupReport:
+    def __init__(self, started_at: float = PROCESS_START):
+        self.started_at = started_at
+        self.import_seconds: Dict[str, float] = {}
+        self.app_ready_seconds = None
+        self.first_response_seconds = None
+        self.first_response_path = None
+        self.heavy_modules_at_first_response = None
+        self._lock = threading.Lock()
+
+    def import_module(self, name: str):
+        """Import a module, recording its (inclusive) import time"""
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        self.import_seconds[name] = round(time.perf_counter() - start, 3)
+        return module
+
+    def mark_app_ready(self):
+        self.app_ready_seconds = round(time.time() - self.started_at, 3)
+
+    def record_response(self, path: str):
+        """Called for every response; only the first one is recorded"""
+        if self.first_response_seconds is not None:
+            return
+        with self._lock:
+            if self.first_response_seconds is not None:
+                return
+            self.first_response_seconds = round(time.time() - self.started_at, 3)
+            self.first_response_path = path
+            self.heavy_modules_at_first_response = loaded_heavy_modules()
+        logging.info(f"Startup report: {self.report()}")
+
+    def report(self) -> Dict:
+        return {
+            'import_seconds': dict(sorted(self.import_seconds.items(), key=lambda item: -item[1])),
+            'app_ready_seconds': self.app_ready_seconds,
+            'first_response_seconds': self.first_response_seconds,
+            'first_response_path': self.first_response_path,
+            'heavy_modules_at_first_response': self.heavy_modules_at_first_response,
+            'heavy_modules_loaded': loaded_heavy_modules(),
+            'uptime_seconds': round(time.time() - self.started_at, 1)
+        }
+
+
+def loaded_heavy_modules():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+startup_report = StartupReport()
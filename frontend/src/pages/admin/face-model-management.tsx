@@ -197,7 +197,7 @@ const FaceModelManagement: React.FC = () => {
         const url = window.URL.createObjectURL(blob);
         const a = document.createElement('a');
         a.href = url;
-        a.download = `face_model_export_${new Date().toISOString().split('T')[0]}.pkl`;
+        a.download = `face_model_export_${new Date().toISOString().split('T')[0]}.npz`;
         a.click();
         window.URL.revokeObjectURL(url);
       } else {